@@ -13,6 +13,11 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # MCP配置文件路径
 MCP_CONFIG_PATH = os.path.join(BASE_DIR, 'RosAi', 'mcp_config.json')
 
+# 本地工具扫描路径（带 @mcp_tool 装饰器的函数）
+MCP_TOOL_PATHS = [os.path.join(BASE_DIR, 'RosAi', 'tools')]
+# 工具索引缓存文件，None 表示使用用户缓存目录（~/.cache/aiframework/mcp_tool_index.json）
+MCP_TOOL_INDEX = None
+
 from RosAi.client import *
 
 # 从环境变量获取API密钥，如果没有则设置为空字符串
@@ -30,5 +35,33 @@ AIFRAMEWORK_DEFAULTS = {
     'SYSTEM_PROMPT': """
     """,
     'INPUT_TYPE': 'text',  # 可选类型  text/audio/image
+    # 输入处理器选项
+    'INPUT_OPTIONS': {
+        'timeout': 5.0,  # 语音输入每次等待识别结果的秒数，None 表示一直等待
+        'max_pending': 8,  # 处理指令期间最多缓存的语音指令数
+    },
+    # LLM 客户端选项
+    'LLM_OPTIONS': {
+        'tool_token_budget': None,  # 工具定义最多占用的 token 数，None 表示不限制
+        'tool_top_k': None,  # 每次请求按相关性最多携带的工具数，None 表示携带全部工具
+        'response_cache_size': 0,  # 响应缓存条数，0 表示不缓存
+        'response_cache_ttl': 3600,  # 响应缓存过期时间（秒）
+        'response_cache_similarity': None,  # 相似指令命中阈值（0~1），None 表示只做精确匹配
+        'cascade_models': [],  # 先尝试的便宜模型，如 ['qwen-turbo']，为空表示不启用级联
+        'cascade_logprob_threshold': None,  # 平均 logprob 低于该值时升级，None 表示不检查
+        'metrics_port': None,  # Prometheus 指标接口端口（/metrics），None 表示不启动
+        'metrics_file': None,  # 定期写出 Prometheus 指标文件的路径
+        'history_backend': None,  # 对话历史持久化 jsonl/sqlite，None 表示只保存在内存中
+        'history_path': os.path.join(BASE_DIR, 'history'),  # jsonl 为目录，sqlite 为数据库文件
+        'history_session': 'default',  # 会话名
+        'session_max_resident': 256,  # 多会话（with_session）时最多常驻内存的会话数
+        'session_max_memory_mb': 256,  # 常驻会话的消息总大小上限（MB）
+        'session_idle_timeout': None,  # 会话空闲多久（秒）后移出内存，None 表示不按时间移出
+        'compaction_max_chars': None,  # 消息总字符数超过该值时把旧的工具输出移出上下文，None 表示不压缩
+        'compaction_keep_recent': 6,  # 最近的多少条消息不压缩
+        'blob_path': os.path.join(BASE_DIR, 'blobs'),  # 被移出上下文的内容（截断的工具输出、截图等）保存目录
+        'tool_result_max_chars': 20000,  # 单个工具结果的最大字符数，超出部分保留开头和结尾
+        'tool_result_turn_budget': 60000,  # 每轮对话所有工具结果的总字符数
+    },
     'MCP_CONFIG_PATH': "G:\desktop\RosAi\RosAi\mcp_config.json"
 }
@@ -0,0 +1,5 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/9/29 21:40
+# @Author  : afish
+# @File    : __init__.py
@@ -0,0 +1,17 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/9/29 21:40
+# @Author  : afish
+# @File    : system.py
+from datetime import datetime
+
+from aiframework.core.mcp.discovery import mcp_tool
+
+
+@mcp_tool
+def current_time(fmt: str = "%Y-%m-%d %H:%M:%S") -> str:
+    """获取当前本地时间
+
+    :param fmt: 时间格式，遵循 strftime 语法
+    """
+    return datetime.now().strftime(fmt)
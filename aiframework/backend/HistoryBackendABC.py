@@ -0,0 +1,55 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/13 10:05
+# @Author  : afish
+# @File    : HistoryBackendABC.py
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+
+class HistoryBackend(ABC):
+    """
+    对话历史持久化的抽象接口
+
+    每个会话（session）保存一组有序的消息，消息为可 JSON 序列化的字典。
+    """
+
+    @abstractmethod
+    def load(self, session: str) -> List[Dict[str, Any]]:
+        """
+        读取会话的全部消息，会话不存在时返回空列表
+        """
+
+    @abstractmethod
+    def append(self, session: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        追加消息（增量写入）
+        """
+
+    @abstractmethod
+    def replace(self, session: str, messages: List[Dict[str, Any]]) -> None:
+        """
+        用给定消息整体替换会话内容（修改或删除已有消息时使用）
+        """
+
+    @abstractmethod
+    def delete(self, session: str) -> None:
+        """
+        删除会话
+        """
+
+    @abstractmethod
+    def sessions(self) -> List[str]:
+        """
+        返回所有会话名
+        """
+
+    def release(self, session: str) -> None:
+        """
+        会话暂时不再使用时释放其占用的资源（如打开的文件）
+        """
+
+    def close(self) -> None:
+        """
+        释放文件句柄、数据库连接等资源
+        """
@@ -0,0 +1,129 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/14 09:30
+# @Author  : afish
+# @File    : blob_store.py
+"""
+按内容寻址的大对象存储
+
+用于存放不适合留在对话上下文中的大块内容（完整工具输出、截图等），
+对话中只保留一个简短的 blob_id，需要时再按 ID 取回。
+blob_id 是内容 sha256 的前 24 位十六进制字符，相同内容只保存一份。
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+_BLOB_ID = re.compile(r"^[0-9a-f]{24}$")
+
+FETCH_BLOB_DESCRIPTION = "获取已移出对话上下文的内容（如被压缩或截断的工具输出），按字符分段返回"
+FETCH_BLOB_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "blob_id": {"type": "string", "description": "内容 ID"},
+        "offset": {"type": "integer", "description": "起始字符位置", "default": 0},
+        "limit": {"type": "integer", "description": "最多返回的字符数", "default": 4000},
+    },
+    "required": ["blob_id"],
+}
+
+
+class FileBlobStore:
+    """
+    :param root: 存储目录，文件按 blob_id 前两位分目录保存
+    """
+
+    def __init__(self, root: Union[str, Path] = "blobs"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def blob_id(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()[:24]
+
+    def _dir(self, blob_id: str) -> Path:
+        return self.root / blob_id[:2]
+
+    def _find(self, blob_id: str) -> Optional[Path]:
+        if not _BLOB_ID.match(blob_id or ""):
+            return None
+        directory = self._dir(blob_id)
+        if not directory.exists():
+            return None
+        for path in directory.glob(f"{blob_id}.*"):
+            return path
+        return None
+
+    def put(self, data: Union[bytes, str], media_type: str = "text/plain") -> str:
+        """保存内容并返回 blob_id，内容已存在时直接返回"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        blob_id = self.blob_id(data)
+        with self._lock:
+            if self._find(blob_id) is not None:
+                return blob_id
+            extension = mimetypes.guess_extension(media_type) or ".bin"
+            directory = self._dir(blob_id)
+            directory.mkdir(exist_ok=True)
+            path = directory / f"{blob_id}{extension}"
+            tmp = path.with_name(path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return blob_id
+
+    def get(self, blob_id: str) -> bytes:
+        """按 blob_id 读取内容，不存在时抛出 KeyError"""
+        path = self._find(blob_id)
+        if path is None:
+            raise KeyError(blob_id)
+        return path.read_bytes()
+
+    def get_text(self, blob_id: str, offset: int = 0, limit: Optional[int] = None) -> str:
+        """以文本形式读取内容的一段（按字符计）"""
+        text = self.get(blob_id).decode("utf-8", errors="replace")
+        end = None if limit is None else offset + limit
+        return text[offset:end]
+
+    def media_type(self, blob_id: str) -> Optional[str]:
+        path = self._find(blob_id)
+        if path is None:
+            return None
+        return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+    def exists(self, blob_id: str) -> bool:
+        return self._find(blob_id) is not None
+
+    def size(self, blob_id: str) -> int:
+        path = self._find(blob_id)
+        if path is None:
+            raise KeyError(blob_id)
+        return path.stat().st_size
+
+    def delete(self, blob_id: str) -> None:
+        path = self._find(blob_id)
+        if path is not None:
+            path.unlink(missing_ok=True)
+
+
+def fetch_blob(store: FileBlobStore, arguments: Dict[str, Any]) -> str:
+    """fetch_blob 工具的实现"""
+    blob_id = arguments.get("blob_id", "")
+    offset = int(arguments.get("offset") or 0)
+    limit = int(arguments.get("limit") or 4000)
+    media_type = store.media_type(blob_id)
+    if media_type is None:
+        return f"未找到 blob: {blob_id}"
+    if not media_type.startswith("text/") and media_type != "application/json":
+        return f"blob {blob_id} 是 {media_type} 类型，无法以文本返回"
+    text = store.get_text(blob_id)
+    chunk = text[offset:offset + limit]
+    end = offset + len(chunk)
+    if end < len(text):
+        chunk += f"\n...（还有 {len(text) - end} 字符，使用 offset={end} 继续获取）"
+    return chunk
@@ -0,0 +1,19 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/13 11:40
+# @Author  : afish
+# @File    : history_factory.py
+from aiframework.backend.HistoryBackendABC import HistoryBackend
+
+
+class HistoryBackendFactory:
+    @staticmethod
+    def get_backend(backend_type: str, path: str, **kwargs) -> HistoryBackend:
+        if backend_type == "jsonl":
+            from aiframework.backend.jsonl_history import JsonlHistoryBackend
+            return JsonlHistoryBackend(path, **kwargs)
+        elif backend_type == "sqlite":
+            from aiframework.backend.sqlite_history import SqliteHistoryBackend
+            return SqliteHistoryBackend(path, **kwargs)
+        else:
+            raise ValueError(f"不支持的历史存储类型: {backend_type}")
@@ -0,0 +1,196 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/13 10:20
+# @Author  : afish
+# @File    : jsonl_history.py
+"""
+基于文件的对话历史存储
+
+每个会话由两个文件组成：
+- {session}.snapshot.json：快照，保存代号（generation）和截至快照时的全部消息
+- {session}.{generation}.jsonl：快照之后追加的消息，每行一条
+
+追加只写日志文件的末尾；日志超过 compact_every 行时把全部消息写成新快照（代号加一）并删除旧日志。
+恢复会话时只需读取一次快照和少量日志行。快照先写临时文件再替换，进程中途退出也不会损坏。
+"""
+import glob
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO, Tuple, Union
+from urllib.parse import quote, unquote
+
+from aiframework.backend.HistoryBackendABC import HistoryBackend
+from aiframework.logger import logger
+
+SNAPSHOT_SUFFIX = ".snapshot.json"
+
+
+@dataclass
+class _SessionLog:
+    generation: int
+    lines: int  # 日志中的消息数
+    file: Optional[TextIO] = None
+
+
+class JsonlHistoryBackend(HistoryBackend):
+    """
+    :param root: 存储目录
+    :param compact_every: 日志累计多少条消息后生成新快照
+    :param fsync: 每次追加后是否调用 fsync（更可靠，但更慢）
+    """
+
+    def __init__(self, root: Union[str, Path] = "history", compact_every: int = 500, fsync: bool = False):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._logs: Dict[str, _SessionLog] = {}
+        self._lock = threading.RLock()
+
+    def _name(self, session: str) -> str:
+        return quote(session, safe="-_")
+
+    def _snapshot_path(self, session: str) -> Path:
+        return self.root / f"{self._name(session)}{SNAPSHOT_SUFFIX}"
+
+    def _log_path(self, session: str, generation: int) -> Path:
+        return self.root / f"{self._name(session)}.{generation}.jsonl"
+
+    @staticmethod
+    def _dumps(message: Dict[str, Any]) -> str:
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def _read_snapshot(self, session: str) -> Tuple[int, List[Dict[str, Any]]]:
+        path = self._snapshot_path(session)
+        if not path.exists():
+            return 0, []
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("generation", 0), data.get("messages", [])
+
+    def _read_log(self, path: Path) -> List[Dict[str, Any]]:
+        if not path.exists():
+            return []
+        messages = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    # 写入中途退出留下的半行，打开日志追加时会被截掉
+                    break
+                messages.append(json.loads(line))
+        return messages
+
+    def _read_all(self, session: str) -> Tuple[int, List[Dict[str, Any]], int]:
+        """返回代号、全部消息和其中来自日志的条数"""
+        generation, messages = self._read_snapshot(session)
+        tail = self._read_log(self._log_path(session, generation))
+        messages.extend(tail)
+        return generation, messages, len(tail)
+
+    def load(self, session: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            generation, messages, tail = self._read_all(session)
+            state = self._logs.get(session)
+            if state is None or state.generation != generation:
+                self._close_log(session)
+                self._logs[session] = _SessionLog(generation, tail)
+                self._remove_stale_logs(session, generation)
+            if tail >= self.compact_every:
+                self._write_snapshot(session, messages)
+            return messages
+
+    def append(self, session: str, messages: List[Dict[str, Any]]) -> None:
+        if not messages:
+            return
+        with self._lock:
+            state = self._logs.get(session)
+            if state is None:
+                self.load(session)
+                state = self._logs[session]
+            if state.file is None:
+                state.file = self._open_log(self._log_path(session, state.generation))
+            state.file.write("".join(self._dumps(message) + "\n" for message in messages))
+            state.file.flush()
+            if self.fsync:
+                os.fsync(state.file.fileno())
+            state.lines += len(messages)
+            if state.lines >= self.compact_every:
+                self._write_snapshot(session, self._read_all(session)[1])
+
+    def replace(self, session: str, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            if session not in self._logs:
+                generation, _ = self._read_snapshot(session)
+                self._logs[session] = _SessionLog(generation, 0)
+            self._write_snapshot(session, messages)
+
+    def delete(self, session: str) -> None:
+        with self._lock:
+            self._close_log(session)
+            self._logs.pop(session, None)
+            self._snapshot_path(session).unlink(missing_ok=True)
+            self._remove_stale_logs(session, None)
+
+    def sessions(self) -> List[str]:
+        names = set()
+        for path in self.root.iterdir():
+            if path.name.endswith(SNAPSHOT_SUFFIX):
+                names.add(path.name[:-len(SNAPSHOT_SUFFIX)])
+            elif path.suffix == ".jsonl":
+                names.add(path.stem.rsplit(".", 1)[0])
+        return sorted(unquote(name) for name in names)
+
+    def release(self, session: str) -> None:
+        with self._lock:
+            self._close_log(session)
+            self._logs.pop(session, None)
+
+    def close(self) -> None:
+        with self._lock:
+            for session in list(self._logs):
+                self._close_log(session)
+
+    def _open_log(self, path: Path) -> TextIO:
+        """以追加方式打开日志，截掉末尾不完整的行"""
+        if path.exists():
+            with open(path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    f.truncate(data.rfind(b"\n") + 1)
+                    logger.warning(f"对话历史日志 {path.name} 末尾不完整，已截断")
+        return open(path, "a", encoding="utf-8")
+
+    def _write_snapshot(self, session: str, messages: List[Dict[str, Any]]):
+        """写入新快照并切换到新的日志文件"""
+        state = self._logs[session]
+        generation = state.generation + 1
+        path = self._snapshot_path(session)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f'{{"generation":{generation},"messages":[')
+            f.write(",".join(self._dumps(message) for message in messages))
+            f.write("]}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._close_log(session)
+        self._logs[session] = _SessionLog(generation, 0)
+        self._remove_stale_logs(session, generation)
+
+    def _remove_stale_logs(self, session: str, generation: Optional[int]):
+        """删除早于当前代号的日志（generation 为 None 时删除全部）"""
+        prefix = f"{self._name(session)}."
+        for path in self.root.glob(f"{glob.escape(prefix)}*.jsonl"):
+            suffix = path.name[len(prefix):-len(".jsonl")]
+            if suffix.isdigit() and (generation is None or int(suffix) < generation):
+                path.unlink(missing_ok=True)
+
+    def _close_log(self, session: str):
+        state = self._logs.get(session)
+        if state is not None and state.file is not None:
+            state.file.close()
+            state.file = None
+
@@ -0,0 +1,95 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/13 11:05
+# @Author  : afish
+# @File    : sqlite_history.py
+"""
+基于 SQLite 的对话历史存储
+
+所有会话保存在同一个数据库文件中，每条消息一行，主键为 (session, seq)。
+使用 WAL 模式，追加只插入新行；恢复会话时按主键顺序读取并一次性解析。
+"""
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Union
+
+from aiframework.backend.HistoryBackendABC import HistoryBackend
+
+
+class SqliteHistoryBackend(HistoryBackend):
+    """
+    :param path: 数据库文件路径
+    """
+
+    def __init__(self, path: Union[str, Path] = "history.db"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            "session TEXT NOT NULL, seq INTEGER NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (session, seq)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._next_seq: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _dumps(message: Dict[str, Any]) -> str:
+        return json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def load(self, session: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, data FROM messages WHERE session = ? ORDER BY seq", (session,)
+            ).fetchall()
+            self._next_seq[session] = rows[-1][0] + 1 if rows else 0
+        # 拼成一个 JSON 数组一次解析，比逐行解析快
+        return json.loads("[" + ",".join(row[1] for row in rows) + "]")
+
+    def _seq(self, session: str) -> int:
+        if session not in self._next_seq:
+            row = self._conn.execute("SELECT MAX(seq) FROM messages WHERE session = ?", (session,)).fetchone()
+            self._next_seq[session] = row[0] + 1 if row[0] is not None else 0
+        return self._next_seq[session]
+
+    def append(self, session: str, messages: List[Dict[str, Any]]) -> None:
+        if not messages:
+            return
+        with self._lock:
+            start = self._seq(session)
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO messages (session, seq, data) VALUES (?, ?, ?)",
+                    [(session, start + index, self._dumps(message)) for index, message in enumerate(messages)]
+                )
+            self._next_seq[session] = start + len(messages)
+
+    def replace(self, session: str, messages: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM messages WHERE session = ?", (session,))
+                self._conn.executemany(
+                    "INSERT INTO messages (session, seq, data) VALUES (?, ?, ?)",
+                    [(session, index, self._dumps(message)) for index, message in enumerate(messages)]
+                )
+            self._next_seq[session] = len(messages)
+
+    def delete(self, session: str) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM messages WHERE session = ?", (session,))
+            self._next_seq.pop(session, None)
+
+    def sessions(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT session FROM messages ORDER BY session").fetchall()
+        return [row[0] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -40,18 +40,26 @@ def create_controller(settings: SettingsLoader):
     input_type = getattr(defaults, 'INPUT_TYPE')
     api_key = getattr(settings, 'API_KEY', None)
     
+    # 输入处理器的额外选项（如语音输入的 timeout、max_pending）
+    input_options = defaults.to_dict().get('INPUT_OPTIONS') or {}
+
     input_handler = InputFactory.get_handler(
         input_type=input_type,
-        api_key=api_key
+        api_key=api_key,
+        **input_options
     )
 
+    # LLM 客户端的额外选项（如 tool_token_budget）
+    llm_options = defaults.to_dict().get('LLM_OPTIONS') or {}
+
     # 创建主控制器
     controller = MainController(
         settings=settings,
         input_handler=input_handler,
         llm_client=getattr(defaults, 'LLM')(
             system_prompt=getattr(defaults, 'SYSTEM_PROMPT'),
-            MessageManager=getattr(defaults, 'MESSAGE_MANAGER')()
+            MessageManager=getattr(defaults, 'MESSAGE_MANAGER')(),
+            **llm_options
         )
     )
 
@@ -4,7 +4,7 @@
 # @Author  : afish
 # @File    : ListenABC.py
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
 
 class SpeechRecognition(ABC):
@@ -29,6 +29,8 @@ class SpeechRecognition(ABC):
         self.language = language
         self.is_active = False
         self.is_paused = False
+        # 采集到的音频在识别前经过的过滤函数，返回需要识别的部分（可为空），如播报期间屏蔽回声
+        self.audio_filter: Optional[Callable[[bytes], bytes]] = None
 
     @abstractmethod
     def start_recognition(self):
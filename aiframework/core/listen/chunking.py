@@ -0,0 +1,183 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/16 16:40
+# @Author  : afish
+# @File    : chunking.py
+"""
+分段并发转写
+
+整句录完再识别时，识别耗时全部叠加在用户说完话之后。ChunkedTranscriber 边录边切：
+- 用 VAD 找到句中的停顿，在停顿处把已录的语音切成窗口（最短 min_window_ms），
+  一直没有停顿时在 max_window_ms 处强制切分
+- 每个窗口向前多带 overlap_ms 的音频，避免切点处的字被截断
+- 窗口提交到线程池并发识别，说完话时通常只剩最后一个窗口还在识别
+- 各窗口的结果按顺序拼接，重叠部分重复识别出的字用 merge_transcripts 去掉
+静音超过 end_silence_ms 视为一句话结束，所有窗口识别完成后通过 on_text 回调给出整句文本。
+"""
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from aiframework.core.listen.ring_buffer import PCMRingBuffer
+from aiframework.core.listen.vad import VoiceActivityDetector
+from aiframework.logger import logger
+
+
+def _comparable(text: str):
+    """去掉标点和空白后的 (字符, 原位置) 列表，用于比较重叠部分"""
+    return [(char.lower(), index) for index, char in enumerate(text)
+            if not char.isspace() and not unicodedata.category(char).startswith("P")]
+
+
+def merge_transcripts(left: str, right: str, max_overlap: int = 12, min_overlap: int = 2) -> str:
+    """拼接相邻窗口的识别结果：left 的结尾与 right 的开头重复时（忽略标点和空白）只保留一份"""
+    if not left:
+        return right
+    if not right:
+        return left
+    tail = _comparable(left)[-max_overlap:]
+    head = _comparable(right)[:max_overlap]
+    for size in range(min(len(tail), len(head)), min_overlap - 1, -1):
+        if [char for char, _ in tail[-size:]] == [char for char, _ in head[:size]]:
+            right = right[head[size - 1][1] + 1:]
+            # 重复部分之后的标点也已在 left 中
+            while right and (right[0].isspace() or unicodedata.category(right[0]).startswith("P")):
+                right = right[1:]
+            break
+    if not right:
+        return left
+    # 英文等以空格分词的文本补一个空格
+    if left[-1].isascii() and not left[-1].isspace() and right[0].isascii() and right[0].isalnum():
+        return f"{left} {right}"
+    return left + right
+
+
+class _Utterance:
+    """一句话的各窗口识别任务"""
+
+    def __init__(self):
+        self.futures: List[Future] = []
+        self.closed = False
+        self.emitted = False
+        self.speech_end = 0.0
+        self.lock = threading.Lock()
+
+
+class ChunkedTranscriber:
+    """
+    :param transcribe: 识别一个窗口的函数，输入 16 位单声道 PCM，返回文本
+    :param on_text: 一句话识别完成的回调
+    :param sample_rate: 采样率
+    :param vad: 用于寻找停顿的检测器，拖尾应短于句中停顿（默认 150ms）
+    :param overlap_ms: 每个窗口向前多带的音频时长
+    :param min_window_ms: 窗口的最短时长，停顿前的语音不足该时长时继续累积
+    :param max_window_ms: 窗口的最长时长，超过时不等停顿直接切分
+    :param end_silence_ms: 静音超过该时长视为一句话结束
+    :param max_workers: 并发识别的窗口数
+    """
+
+    def __init__(self, transcribe: Callable[[bytes], str], on_text: Callable[[str], None],
+                 sample_rate: int = 16000, vad: Optional[VoiceActivityDetector] = None,
+                 overlap_ms: int = 300, min_window_ms: int = 1500, max_window_ms: int = 8000,
+                 end_silence_ms: int = 700, max_workers: int = 4):
+        self.transcribe = transcribe
+        self.on_text = on_text
+        self.sample_rate = sample_rate
+        self.vad = vad or VoiceActivityDetector(sample_rate=sample_rate, hangover_ms=150)
+        self.vad.on_speech_end = self._on_pause
+        self.overlap_bytes = sample_rate * overlap_ms // 1000 * 2
+        self.min_window_bytes = sample_rate * min_window_ms // 1000 * 2
+        self.max_window_bytes = sample_rate * max_window_ms // 1000 * 2
+        self.end_silence_bytes = sample_rate * end_silence_ms // 1000 * 2
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="transcribe")
+        self._window = PCMRingBuffer((max_window_ms + overlap_ms) / 1000 + 1, sample_rate)
+        self._overlap = b""
+        self._paused = False  # 本次 feed 中检测到停顿
+        self._silence = 0  # 上次停顿后的静音字节数
+        self._utterance: Optional[_Utterance] = None
+        self.windows = 0  # 已提交的窗口数
+
+    def feed(self, data: bytes):
+        """输入一段录音"""
+        speech = self.vad.process(data)
+        if speech:
+            if self._utterance is None:
+                self._utterance = _Utterance()
+            self._window.write(speech)
+            self._silence = 0
+        elif self._utterance is not None and not self.vad.in_speech:
+            self._silence += len(data)
+
+        if self._paused:
+            # 停顿处切分，语音太短时继续累积
+            self._paused = False
+            if len(self._window) >= self.min_window_bytes:
+                self._cut()
+        elif len(self._window) >= self.max_window_bytes:
+            self._cut()
+
+        if self._utterance is not None and self._silence >= self.end_silence_bytes:
+            self._finish()
+
+    def flush(self):
+        """输入结束：识别剩余的语音"""
+        tail = self.vad.flush()
+        if tail and self._utterance is not None:
+            self._window.write(tail)
+        if self._utterance is not None:
+            self._finish()
+
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def _on_pause(self):
+        self._paused = True
+
+    def _cut(self):
+        if not self._window:
+            return
+        window = self._window.tobytes()
+        self._window.clear()
+        pcm = self._overlap + window
+        self._overlap = window[-self.overlap_bytes:] if self.overlap_bytes else b""
+        index = self.windows
+        self.windows += 1
+        utterance = self._utterance
+        future = self._executor.submit(self._transcribe, index, pcm)
+        with utterance.lock:
+            utterance.futures.append(future)
+        future.add_done_callback(lambda _: self._check(utterance))
+
+    def _finish(self):
+        """一句话结束：提交最后一个窗口，等所有窗口完成后拼接"""
+        utterance = self._utterance
+        self._cut()
+        self._utterance = None
+        self._overlap = b""
+        self._silence = 0
+        with utterance.lock:
+            utterance.closed = True
+            utterance.speech_end = time.perf_counter()
+        self._check(utterance)
+
+    def _transcribe(self, index: int, pcm: bytes) -> str:
+        try:
+            return self.transcribe(pcm) or ""
+        except Exception as e:
+            logger.error(f"第 {index} 个窗口识别失败: {e}")
+            return ""
+
+    def _check(self, utterance: _Utterance):
+        with utterance.lock:
+            if utterance.emitted or not utterance.closed or not all(f.done() for f in utterance.futures):
+                return
+            utterance.emitted = True
+            futures = list(utterance.futures)
+        text = ""
+        for future in futures:
+            text = merge_transcripts(text, future.result().strip())
+        logger.debug(f"{len(futures)} 个窗口识别完成，句末后 {time.perf_counter() - utterance.speech_end:.3f}s")
+        if text:
+            self.on_text(text)
@@ -0,0 +1,192 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/17 14:10
+# @Author  : afish
+# @File    : coordinator.py
+"""
+播报与识别的协调
+
+助手播报时麦克风会录到扬声器的声音，继续上传既浪费识别调用，又会把助手自己的话当成指令。
+AudioSessionCoordinator 挂在识别器的 audio_filter 上：
+- 播放期间（以及结束后的 tail_ms 内）不把录音交给识别
+- 以播放器送出的音频为参考估计回声的强度：麦克风能量持续明显高于回声估计时判为用户插话（barge-in），
+  立即取消合成、停止播放，并把插话开头（preroll_ms）连同之后的录音交给识别
+回声强度（麦克风能量 - 参考能量的上包络）在没有插话时持续学习，适应不同的扬声器音量和摆放位置。
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Optional, Tuple
+
+import numpy as np
+
+from aiframework.core.listen.ListenABC import SpeechRecognition
+from aiframework.core.listen.vad import frame_features
+from aiframework.core.speek.player import AudioPlayer
+from aiframework.logger import logger
+
+
+@dataclass
+class CoordinatorStats:
+    gated_bytes: int = 0  # 播放期间未交给识别的录音
+    passed_bytes: int = 0
+    barge_ins: int = 0
+    last_barge_in_delay: float = 0.0  # 最近一次插话从开始到被确认的时长（秒）
+
+
+class AudioSessionCoordinator:
+    """
+    :param recognizer: 语音识别器（使用其 audio_filter，录音的采样率取自其输入源）
+    :param player: 播报使用的播放器
+    :param synthesizer: 语音合成器，插话时调用其 cancel()
+    :param barge_in: 是否允许插话打断播报，为 False 时播放期间只屏蔽录音
+    :param barge_in_ms: 判为用户语音的帧累计达到该时长才打断（非语音帧逐帧抵消）
+    :param echo_margin_db: 麦克风能量超过回声估计多少 dB 判为用户语音
+    :param echo_coupling_db: 回声强度的初始估计（麦克风能量 - 播放能量），宜偏高，播放开始后会自动向实际值衰减
+    :param echo_window_ms: 播放到录到回声的最大延迟（声卡缓冲 + 声学路径）
+    :param min_energy_db: 用户语音的最低能量（dBFS）
+    :param tail_ms: 播放结束后继续屏蔽的时长（声卡缓冲与混响）
+    :param preroll_ms: 插话时一并交给识别的之前的录音
+    :param frame_ms: 分析帧长
+    """
+
+    def __init__(self, recognizer: SpeechRecognition, player: AudioPlayer, synthesizer=None,
+                 barge_in: bool = True, barge_in_ms: int = 200, echo_margin_db: float = 6.0,
+                 echo_coupling_db: float = 0.0, echo_window_ms: int = 300, min_energy_db: float = -45.0,
+                 tail_ms: int = 300, preroll_ms: int = 400, frame_ms: int = 20):
+        self.recognizer = recognizer
+        self.player = player
+        self.synthesizer = synthesizer
+        self.barge_in = barge_in
+        self.echo_margin_db = echo_margin_db
+        self.coupling_db = echo_coupling_db
+        self.echo_window = echo_window_ms / 1000
+        self.min_energy_db = min_energy_db
+        self.tail = tail_ms / 1000
+        # audio_filter 收到的是输入源的原始录音
+        source = getattr(recognizer, 'source', None)
+        sample_rate = getattr(source, 'sample_rate', None) or recognizer.sample_rate
+        self.frame_length = sample_rate * frame_ms // 1000
+        self.barge_in_frames = max(1, barge_in_ms // frame_ms)
+        self.preroll_bytes = sample_rate * preroll_ms // 1000 * 2
+        self.on_barge_in: Optional[Callable[[], None]] = None
+        self.stats = CoordinatorStats()
+
+        self._lock = threading.Lock()
+        self._playing = False
+        self._gate_until = 0.0
+        self._barged = False
+        self._reference: Deque[Tuple[float, float]] = deque()  # (播放时刻, 能量 dBFS)
+        self._preroll: Deque[bytes] = deque()
+        self._preroll_size = 0
+        self._remainder = b""
+        self._candidate = 0
+        self._candidate_start = 0.0
+        self._hold = 0  # 暂停学习回声强度的剩余帧数
+
+        recognizer.audio_filter = self.filter
+        player.on_start = self._on_play_start
+        player.on_end = self._on_play_end
+        player.on_chunk = self._on_play_chunk
+
+    @property
+    def gating(self) -> bool:
+        return self._playing or time.monotonic() < self._gate_until
+
+    def filter(self, data: bytes) -> bytes:
+        """识别器的 audio_filter：返回应交给识别的录音"""
+        with self._lock:
+            if not self.gating:
+                self._reset_detection()
+                self.stats.passed_bytes += len(data)
+                return data
+            self._remember(data)
+            if not self.barge_in or not self._detect(data):
+                self.stats.gated_bytes += len(data)
+                return b""
+            speech = b"".join(self._preroll)
+            self._reset_detection()
+        self._barge_in()
+        self.stats.passed_bytes += len(speech)
+        return speech
+
+    def _detect(self, data: bytes) -> bool:
+        """逐帧比较麦克风能量与回声估计，超出的帧累计达到 barge_in_ms 时返回 True"""
+        data = self._remainder + data
+        usable = len(data) - len(data) % (self.frame_length * 2)
+        self._remainder = data[usable:]
+        if not usable:
+            return False
+        energy_db, _ = frame_features(np.frombuffer(data[:usable], dtype="<i2"), self.frame_length)
+        now = time.monotonic()
+        while self._reference and self._reference[0][0] < now - self.echo_window - 1.0:
+            self._reference.popleft()
+        recent = [level for played, level in self._reference if played >= now - self.echo_window]
+        reference_db = max(recent) if recent else -100.0
+        for level in energy_db.tolist():
+            excess = level - reference_db
+            if level > self.min_energy_db and excess > self.coupling_db + self.echo_margin_db:
+                if self._candidate == 0:
+                    self._candidate_start = now
+                self._candidate += 1
+                # 疑似双方同时说话，暂停学习，避免用户语音中较弱的帧把回声估计抬高
+                self._hold = self.barge_in_frames * 2
+                if self._candidate >= self.barge_in_frames:
+                    return True
+                continue
+            # 语音中的音节间隙不直接清零，逐帧递减
+            self._candidate = max(self._candidate - 1, 0)
+            if self._hold:
+                self._hold -= 1
+            elif reference_db > self.min_energy_db and level > self.min_energy_db:
+                # 回声强度取上包络：变大时快速跟随，变小时缓慢衰减（词间停顿时参考信号仍在窗口内，差值偏小）
+                rate = 0.5 if excess > self.coupling_db else 0.05
+                self.coupling_db += rate * (excess - self.coupling_db)
+        return False
+
+    def _barge_in(self):
+        delay = time.monotonic() - self._candidate_start
+        self.stats.barge_ins += 1
+        self.stats.last_barge_in_delay = delay
+        logger.info(f"检测到用户插话，停止播报（判定耗时 {delay * 1000:.0f}ms）")
+        self._barged = True
+        self._playing = False
+        self._gate_until = 0.0
+        if self.synthesizer is not None:
+            self.synthesizer.cancel()
+        else:
+            self.player.stop()
+        if self.on_barge_in:
+            self.on_barge_in()
+
+    def _remember(self, data: bytes):
+        """保留最近 preroll_ms 的录音，插话时一并交给识别"""
+        self._preroll.append(data)
+        self._preroll_size += len(data)
+        while self._preroll_size - len(self._preroll[0]) >= self.preroll_bytes:
+            self._preroll_size -= len(self._preroll.popleft())
+
+    def _reset_detection(self):
+        self._preroll.clear()
+        self._preroll_size = 0
+        self._remainder = b""
+        self._candidate = 0
+        self._hold = 0
+
+    def _on_play_start(self):
+        with self._lock:
+            self._playing = True
+            self._barged = False
+
+    def _on_play_end(self, interrupted: bool):
+        with self._lock:
+            self._playing = self.player.is_playing
+            if not self._barged:
+                self._gate_until = time.monotonic() + self.tail
+
+    def _on_play_chunk(self, chunk: bytes):
+        samples = np.frombuffer(chunk, dtype="<i2").astype(np.float32) / 32768.0
+        level = 10.0 * np.log10(float(np.mean(samples * samples)) + 1e-10) if samples.size else -100.0
+        with self._lock:
+            self._reference.append((time.monotonic(), level))
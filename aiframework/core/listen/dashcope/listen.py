@@ -2,14 +2,16 @@ from __future__ import annotations
 
 import queue
 import threading
-from typing import Any, Callable, Optional
+import time
+from typing import Any, Callable, Optional, Union
 
 import dashscope
-import pyaudio
 from dashscope.audio.asr import Recognition, RecognitionResult
 from dashscope.common.error import InvalidParameter
 
 from aiframework.core.listen.ListenABC import SpeechRecognition
+from aiframework.core.listen.source import AudioSource, MicrophoneSource
+from aiframework.core.listen.vad import VoiceActivityDetector
 from aiframework.logger import logger
 
 
@@ -19,7 +21,9 @@ class RealTimeSpeechRecognition(SpeechRecognition):
     """
 
     def __init__(self, api_key: str, model: str = 'paraformer-realtime-v2',
-                 sample_rate: int = 16000, language: str = 'zh-CN'):
+                 sample_rate: int = 16000, language: str = 'zh-CN',
+                 vad: Union[bool, VoiceActivityDetector] = True, keepalive_interval: float = 10.0,
+                 source: Optional[AudioSource] = None, silence_tail_ms: int = 800):
         """
         初始化实时语音识别器
 
@@ -27,16 +31,40 @@ class RealTimeSpeechRecognition(SpeechRecognition):
         :param model: 识别模型 (默认: 'paraformer-realtime-v2')
         :param sample_rate: 音频采样率 (默认: 16000Hz)
         :param language: 识别语言 (默认: 'zh-CN')
+        :param vad: 是否在本地做语音活动检测，只发送语音段（也可以传入配置好的检测器）
+        :param keepalive_interval: 启用 VAD 时，静音超过该时长（秒）发送一小段静音，避免服务端因长时间无音频断开
+        :param source: 音频输入源 (默认: 麦克风)
+        :param silence_tail_ms: 启用 VAD 时每段语音结束后补发的静音时长，服务端按静音断句，
+            应不短于服务端的断句静音时长（Paraformer 默认 800ms），否则句末要等下一段语音才能确定
         """
         super().__init__(api_key, model, sample_rate, language)
 
+        # 本地语音活动检测
+        if vad is True:
+            vad = VoiceActivityDetector(sample_rate=sample_rate)
+        self.vad: Optional[VoiceActivityDetector] = vad or None
+        self.keepalive_interval = keepalive_interval
+        self.silence_tail_bytes = sample_rate * silence_tail_ms // 1000 * 2
+        self._last_sent = 0.0
+        self._speech_ended = False
+        if self.vad is not None:
+            previous = self.vad.on_speech_end
+
+            def on_speech_end():
+                # 在 process 返回后、这段语音的拖尾发出之后再补发静音
+                self._speech_ended = True
+                if previous:
+                    previous()
+
+            self.vad.on_speech_end = on_speech_end
+
         # 设置API密钥
         dashscope.api_key = api_key
 
         # 识别组件
         self.recognition: Optional[Recognition] = None
-        self.mic: Optional[pyaudio.PyAudio] = None
-        self.stream: Optional[pyaudio.Stream] = None
+        self.source: AudioSource = source or MicrophoneSource(sample_rate, 3200)
+        self._source_opened = False
 
         # 回调函数
         self._result_callback: Optional[Callable[[str], None]] = None
@@ -88,12 +116,10 @@ class RealTimeSpeechRecognition(SpeechRecognition):
         logger.info("停止语音识别服务...")
 
         # 停止音频采集
-        if self.stream:
-            try:
-                self.stream.stop_stream()
-                self.stream.close()
-            except Exception as e:
-                logger.error(f"关闭音频流失败: {str(e)}")
+        self.is_active = False
+        if self._source_opened:
+            self.source.close()
+            self._source_opened = False
 
         # 停止DashScope识别
         if self.recognition:
@@ -104,15 +130,7 @@ class RealTimeSpeechRecognition(SpeechRecognition):
             except Exception as e:
                 logger.error(f"停止识别失败: {str(e)}")
 
-        # 清理资源
-        if self.mic:
-            try:
-                self.mic.terminate()
-            except Exception as e:
-                logger.error(f"终止PyAudio失败: {str(e)}")
-
         # 重置状态
-        self.is_active = False
         self.is_paused = False
         logger.info("语音识别服务已停止")
 
@@ -148,8 +166,6 @@ class RealTimeSpeechRecognition(SpeechRecognition):
 
         # 确保所有资源释放
         self.recognition = None
-        self.mic = None
-        self.stream = None
         self._result_callback = None
         self._error_callback = None
         logger.info("语音识别资源已清理")
@@ -165,16 +181,9 @@ class RealTimeSpeechRecognition(SpeechRecognition):
                 """识别服务打开时的回调"""
                 logger.info("DashScope识别服务已连接")
 
-                # 初始化音频输入设备
-                self.parent.mic = pyaudio.PyAudio()
-                self.parent.stream = self.parent.mic.open(
-                    format=pyaudio.paInt16,
-                    channels=1,
-                    rate=self.parent.sample_rate,
-                    input=True,
-                    frames_per_buffer=3200
-                )
-                logger.info("麦克风已就绪")
+                # 打开音频输入源
+                self.parent.source.open()
+                self.parent._source_opened = True
 
             def on_close(self):
                 """识别服务关闭时的回调"""
@@ -236,15 +245,24 @@ class RealTimeSpeechRecognition(SpeechRecognition):
                 threading.Event().wait(0.1)
                 continue
 
-            if not self.stream:
-                logger.error("音频流未初始化")
-                self._handle_error("音频流未初始化")
-                break
+            if not self._source_opened:
+                # 等待识别服务连接后打开输入源
+                threading.Event().wait(0.05)
+                continue
 
             try:
-                # 从麦克风读取音频数据
-                data = self.stream.read(3200, exception_on_overflow=False)
-                self.send_audio_frame(data)
+                # 从输入源读取音频数据
+                data = self.source.read()
+                if not data:
+                    logger.info("音频输入已结束")
+                    tail = self.vad.flush() if self.vad is not None else b""
+                    if tail:
+                        self.send_audio_frame(tail)
+                    self.stop_recognition()
+                    break
+                if self.audio_filter is not None:
+                    data = self.audio_filter(data)
+                self._forward(data)
 
             except Exception as e:
                 logger.error(f"音频采集错误: {str(e)}")
@@ -253,6 +271,28 @@ class RealTimeSpeechRecognition(SpeechRecognition):
 
         logger.info("音频采集已停止")
 
+    def _forward(self, data: bytes):
+        """经过 VAD 后发送音频，静音段只定期发送保活数据"""
+        if self.vad is None:
+            if data:
+                self.send_audio_frame(data)
+            return
+        speech = self.vad.process(data)
+        now = time.monotonic()
+        if speech:
+            self.send_audio_frame(speech)
+            self._last_sent = now
+        if self._speech_ended:
+            # VAD 只送出了 hangover_ms 的静音，补足服务端断句所需的静音，让这句话及时结束
+            self._speech_ended = False
+            if self.silence_tail_bytes:
+                self.send_audio_frame(bytes(self.silence_tail_bytes))
+                self._last_sent = now
+        elif not speech and now - self._last_sent >= self.keepalive_interval:
+            # 100ms 静音
+            self.send_audio_frame(bytes(self.sample_rate // 10 * 2))
+            self._last_sent = now
+
     def _signal_handler(self, sig, frame):
         """处理中断信号"""
         logger.info('收到中断信号，准备停止语音识别...')
@@ -0,0 +1,76 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/16 14:20
+# @Author  : afish
+# @File    : encoding.py
+"""
+上传前的音频封装与压缩
+
+录音直接在内存中封装成 WAV（按数据长度预先算好 44 字节的文件头），不写临时文件。
+网络较慢时可以压缩为 FLAC（无损，约为 WAV 的一半）或 Opus（有损，约为 WAV 的十分之一）再上传，
+压缩需要安装 soundfile（pip install soundfile），未安装或编码失败时退回 WAV。
+"""
+import io
+import struct
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from aiframework.logger import logger
+
+# 编码 -> (文件扩展名, 媒体类型, soundfile 的格式和子类型)
+ENCODINGS = {
+    "wav": (".wav", "audio/wav", None),
+    "flac": (".flac", "audio/flac", ("FLAC", "PCM_16")),
+    "opus": (".ogg", "audio/ogg", ("OGG", "OPUS")),
+}
+
+
+def wav_header(data_size: int, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
+    """PCM WAV 文件头"""
+    block_align = channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * block_align, block_align, sample_width * 8,
+        b"data", data_size,
+    )
+
+
+def wav_file(chunks: Sequence, sample_rate: int, channels: int = 1, sample_width: int = 2) -> io.BytesIO:
+    """把若干段 PCM（bytes 或 memoryview）封装为内存中的 WAV 文件"""
+    data_size = sum(len(chunk) for chunk in chunks)
+    buffer = io.BytesIO()
+    buffer.write(wav_header(data_size, sample_rate, channels, sample_width))
+    for chunk in chunks:
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
+def encode_audio(chunks: Sequence, sample_rate: int, encoding: str = "wav",
+                 name: str = "speech") -> Tuple[str, io.BytesIO, str]:
+    """
+    把 16 位单声道 PCM 编码为上传用的文件
+
+    返回 (文件名, 文件对象, 媒体类型)，可直接作为 OpenAI 接口的 file 参数
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError(f"不支持的音频编码: {encoding}，可选 {', '.join(ENCODINGS)}")
+    extension, media_type, sound_format = ENCODINGS[encoding]
+    if sound_format is not None:
+        try:
+            import soundfile
+        except ImportError:
+            logger.warning(f"未安装 soundfile，无法压缩为 {encoding}，使用 WAV 上传（pip install soundfile）")
+        else:
+            try:
+                samples = np.frombuffer(b"".join(chunks), dtype="<i2")
+                buffer = io.BytesIO()
+                soundfile.write(buffer, samples, sample_rate, format=sound_format[0], subtype=sound_format[1])
+                buffer.seek(0)
+                return f"{name}{extension}", buffer, media_type
+            except Exception as e:
+                logger.warning(f"音频压缩为 {encoding} 失败，使用 WAV 上传: {e}")
+    extension, media_type, _ = ENCODINGS["wav"]
+    return f"{name}{extension}", wav_file(chunks, sample_rate), media_type
@@ -0,0 +1,162 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/15 20:10
+# @Author  : afish
+# @File    : LocalSpeechRecognition.py
+"""
+本地的替身语音识别
+
+不调用任何云端服务：用 VAD 从输入源中切出语音段，每段结束后等待 latency 秒（模拟识别耗时），
+再给出一条识别结果。结果来自预先给定的文本列表，或 transcribe(pcm) 函数，都没有时返回语音时长描述。
+配合 WavFileSource / SignalSource 可以在 CI 中测量“说完话 → 识别结果 → 大模型响应”的端到端延迟。
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+from aiframework.core.listen.ListenABC import SpeechRecognition
+from aiframework.core.listen.ring_buffer import PCMRingBuffer
+from aiframework.core.listen.source import AudioSource
+from aiframework.core.listen.vad import VoiceActivityDetector
+from aiframework.logger import logger
+
+
+@dataclass
+class Utterance:
+    """一段语音的识别记录，时间均为 time.perf_counter()"""
+    text: str
+    audio_seconds: float
+    speech_end: float  # 检测到语音结束的时刻
+    result_time: float = 0.0  # 给出识别结果的时刻
+
+    @property
+    def asr_latency(self) -> float:
+        return self.result_time - self.speech_end
+
+
+class LocalSpeechRecognition(SpeechRecognition):
+    """
+    :param source: 音频输入源
+    :param transcripts: 依次作为各段语音的识别结果
+    :param transcribe: 由语音段 PCM 得到文本的函数，优先于 transcripts
+    :param latency: 模拟的识别耗时（秒）
+    :param vad: 语音活动检测器，默认按输入源采样率创建
+    :param max_seconds: 单段语音最多保留的时长（秒）
+    """
+
+    def __init__(self, source: AudioSource, transcripts: Optional[Sequence[str]] = None,
+                 transcribe: Optional[Callable[[bytes], str]] = None, latency: float = 0.0,
+                 vad: Optional[VoiceActivityDetector] = None, max_seconds: float = 60.0):
+        super().__init__(None, 'local', source.sample_rate)
+        self.source = source
+        self.transcripts = list(transcripts or [])
+        self.transcribe = transcribe
+        self.latency = latency
+        self.vad = vad or VoiceActivityDetector(sample_rate=source.sample_rate)
+        self.vad.on_speech_end = self._on_speech_end
+        self.utterances: List[Utterance] = []
+        self.text = ''
+
+        self._speech = PCMRingBuffer(max_seconds, source.sample_rate)
+        self._speech_end: Optional[float] = None  # VAD 判定语音结束的时刻，这段语音写入后再识别
+        self._result_callback: Optional[Callable[[str], None]] = None
+        self._error_callback: Optional[Callable[[str], None]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._finished = threading.Event()
+
+    def start_recognition(self):
+        """在后台线程中读取输入源并识别"""
+        if self.is_active:
+            return
+        self.is_active = True
+        self.is_paused = False
+        self._finished.clear()
+        self.source.open()
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+    def stop_recognition(self):
+        if not self.is_active:
+            return
+        self.is_active = False
+        self.is_paused = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+        self.source.close()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待输入源读完、所有语音段识别完成"""
+        return self._finished.wait(timeout)
+
+    def send_audio_frame(self, data: bytes):
+        """输入一段 PCM（暂停时丢弃）"""
+        if self.is_paused:
+            return
+        speech = self.vad.process(data)
+        if speech:
+            self._speech.write(speech)
+        self._finish_utterance()
+
+    def get_text(self) -> str:
+        return self.text
+
+    def on_result(self, callback: Callable[[str], None]):
+        self._result_callback = callback
+
+    def on_error(self, callback: Callable[[str], None]):
+        self._error_callback = callback
+
+    def cleanup(self):
+        self.stop_recognition()
+        self._result_callback = None
+        self._error_callback = None
+
+    def _capture_loop(self):
+        try:
+            while self.is_active:
+                data = self.source.read()
+                if not data:
+                    tail = self.vad.flush()
+                    if tail:
+                        self._speech.write(tail)
+                    self._finish_utterance()
+                    break
+                if self.audio_filter is not None:
+                    data = self.audio_filter(data)
+                self.send_audio_frame(data)
+        except Exception as e:
+            logger.error(f"本地语音识别出错: {str(e)}")
+            if self._error_callback:
+                self._error_callback(str(e))
+        finally:
+            self.is_active = False
+            self._finished.set()
+
+    def _on_speech_end(self):
+        # 回调在 vad.process 返回之前触发，此时语音的拖尾还没有写入，只记录时刻
+        self._speech_end = time.perf_counter()
+
+    def _finish_utterance(self):
+        """VAD 判定语音结束后，识别已写入的整段语音"""
+        if self._speech_end is None:
+            return
+        speech_end, self._speech_end = self._speech_end, None
+        audio_seconds = self._speech.duration
+        if self.transcribe is not None:
+            text = self.transcribe(self._speech.tobytes())
+        elif self.transcripts:
+            text = self.transcripts[len(self.utterances) % len(self.transcripts)]
+        else:
+            text = f"<语音 {audio_seconds:.1f}s>"
+        self._speech.clear()
+        utterance = Utterance(text, audio_seconds, speech_end)
+        self.utterances.append(utterance)
+        if self.latency > 0:
+            time.sleep(self.latency)
+        utterance.result_time = time.perf_counter()
+        self.text = text
+        logger.info(f"识别到完整句子: {text}")
+        if self._result_callback:
+            self._result_callback(text)
@@ -0,0 +1,5 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/15 20:10
+# @Author  : afish
+# @File    : __init__.py
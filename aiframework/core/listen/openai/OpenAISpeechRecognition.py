@@ -4,15 +4,15 @@
 # @Author  : afish
 # @File    : OpenAISpeechRecognition.py
 import os
-import tempfile
-import wave
-from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Optional
 
 import openai
-import pyaudio
 
 from aiframework.core.listen.ListenABC import SpeechRecognition
+from aiframework.core.listen.chunking import ChunkedTranscriber
+from aiframework.core.listen.encoding import ENCODINGS, encode_audio
+from aiframework.core.listen.ring_buffer import PCMRingBuffer
+from aiframework.core.listen.source import AudioSource, MicrophoneSource
 from aiframework.logger import logger
 
 
@@ -21,14 +21,29 @@ class OpenAISpeechRecognition(SpeechRecognition):
     使用 OpenAI Whisper 模型进行语音识别
     """
 
-    def __init__(self, api_key=None, model='whisper-1', format_pcm='pcm', sample_rate=16000):
-        super().__init__(api_key, model, format_pcm, sample_rate)
+    def __init__(self, api_key=None, model='whisper-1', format_pcm='pcm', sample_rate=16000,
+                 source: Optional[AudioSource] = None, max_seconds: float = 60.0,
+                 upload_format: str = 'wav', incremental: bool = False,
+                 chunk_options: Optional[Dict[str, Any]] = None):
+        if upload_format not in ENCODINGS:
+            raise ValueError(f"不支持的上传格式: {upload_format}，可选 {', '.join(ENCODINGS)}")
+        super().__init__(api_key, model, sample_rate)
+        self.format_pcm = format_pcm
         self.client = openai.OpenAI(api_key=self.api_key)
-        self.mic = None
-        self.stream = None
+        self.source: AudioSource = source or MicrophoneSource(sample_rate, 1024)
         self.text = ''
         self.func = None
-        self.audio_frames = []
+        # 上传格式：wav / flac / opus，网络较慢时压缩可减少上传耗时
+        self.upload_format = upload_format
+        # 一句话的录音，超过 max_seconds 时只保留最后的部分
+        self.audio_frames = PCMRingBuffer(max_seconds, self.source.sample_rate)
+        self.running = False
+        self.pause_flag = False
+        # 增量模式：边录边在停顿处切窗口并发识别，说完话后只需等待最后一个窗口
+        self.chunker: Optional[ChunkedTranscriber] = None
+        if incremental:
+            self.chunker = ChunkedTranscriber(self._transcribe, self._on_transcript,
+                                              sample_rate=self.source.sample_rate, **(chunk_options or {}))
 
     def _set_api_key(self, api_key: str):
         """设置 OpenAI API 密钥"""
@@ -38,6 +53,8 @@ class OpenAISpeechRecognition(SpeechRecognition):
         """启动录音并发送音频到 OpenAI Whisper 进行识别"""
         logger.info('OpenAI 语音初始化中 ...')
         self._init_audio_stream()
+        self.running = True
+        self.is_active = True
         logger.info("开始聆听... (按 Ctrl+C 停止)")
         try:
             while self.running:
@@ -53,8 +70,17 @@ class OpenAISpeechRecognition(SpeechRecognition):
         """停止录音并清理资源"""
         logger.info("完全停止 OpenAI 语音识别...")
         self.running = False
+        self.is_active = False
         self.cleanup()
 
+    def start_recognition(self):
+        """启动语音识别（阻塞，直到 stop 或输入源结束）"""
+        self.start()
+
+    def stop_recognition(self):
+        """停止语音识别"""
+        self.stop()
+
     def pause(self):
         """暂停录音"""
         self.pause_flag = True
@@ -67,8 +93,14 @@ class OpenAISpeechRecognition(SpeechRecognition):
         logger.info("录音已恢复")
 
     def send_audio_frame(self, data: bytes):
-        """添加音频帧到缓冲区"""
-        self.audio_frames.append(data)
+        """添加音频帧到缓冲区（增量模式下交给分段识别）"""
+        if self.chunker is not None:
+            self.chunker.feed(data)
+            return
+        overwritten = self.audio_frames.write(data)
+        if overwritten and overwritten == self.audio_frames.dropped:
+            # 本句第一次写满时提示
+            logger.warning(f"录音超过 {self.audio_frames.duration:.0f} 秒，较早的部分将被丢弃")
 
     def get_text(self) -> str:
         """获取当前识别文本"""
@@ -76,11 +108,9 @@ class OpenAISpeechRecognition(SpeechRecognition):
 
     def cleanup(self):
         """清理音频流和资源"""
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-        if self.mic:
-            self.mic.terminate()
+        self.source.close()
+        if self.chunker is not None:
+            self.chunker.close(wait=False)
         self.audio_frames.clear()
 
     def on_result(self, result: Any):
@@ -94,42 +124,51 @@ class OpenAISpeechRecognition(SpeechRecognition):
         logger.error(f"识别出错: {error}")
 
     def _init_audio_stream(self):
-        """初始化麦克风输入流"""
-        self.mic = pyaudio.PyAudio()
-        self.stream = self.mic.open(
-            format=pyaudio.paInt16,
-            channels=1,
-            rate=self.sample_rate,
-            input=True,
-            frames_per_buffer=1024
-        )
+        """打开音频输入源"""
+        self.source.open()
 
     def _record_audio(self):
         """持续录制音频"""
-        data = self.stream.read(1024, exception_on_overflow=False)
+        data = self.source.read()
+        if not data:
+            # 输入源结束（如 WAV 文件读完），识别剩余音频后退出
+            if self.chunker is not None:
+                self.chunker.flush()
+                self.chunker.close()
+            elif self.audio_frames:
+                self._process_audio()
+                self.process_text_and_resume(self.func)
+            self.running = False
+            return
+        if self.audio_filter is not None:
+            data = self.audio_filter(data)
         self.send_audio_frame(data)
 
     def _process_audio(self):
-        """将音频保存为临时文件并调用 OpenAI Whisper"""
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmpfile:
-            wf = wave.open(tmpfile.name, 'wb')
-            wf.setnchannels(1)
-            wf.setsampwidth(self.mic.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(self.sample_rate)
-            wf.writeframes(b''.join(self.audio_frames))
-            wf.close()
-
-            try:
-                with open(tmpfile.name, "rb") as audio_file:
-                    result = self.client.audio.transcriptions.create(
-                        model=self.model,
-                        file=audio_file
-                    )
-                self.on_result(result)
-            except Exception as e:
-                self.on_error(e)
-            finally:
-                Path(tmpfile.name).unlink(missing_ok=True)
+        """在内存中封装录音（可选压缩）并调用 OpenAI Whisper"""
+        upload = encode_audio(self.audio_frames.views(), self.source.sample_rate, self.upload_format)
+        try:
+            result = self.client.audio.transcriptions.create(
+                model=self.model,
+                file=upload
+            )
+            self.on_result(result)
+        except Exception as e:
+            self.on_error(e)
+
+    def _transcribe(self, pcm: bytes) -> str:
+        """识别增量模式下的一个窗口（在线程池中调用）"""
+        upload = encode_audio([pcm], self.source.sample_rate, self.upload_format)
+        result = self.client.audio.transcriptions.create(model=self.model, file=upload)
+        return getattr(result, 'text', '') or ''
+
+    def _on_transcript(self, text: str):
+        """增量模式下一句话的各窗口识别完成"""
+        self.text = text
+        logger.info(f"识别结果: {self.text}")
+        if self.func:
+            logger.info(f"处理指令: {self.text}")
+            self.func(text)
 
     def process_text_and_resume(self, fun, *args, **kwargs):
         """处理识别到的文本并恢复监听"""
@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/16 10:15
+# @Author  : afish
+# @File    : ring_buffer.py
+"""
+PCM 环形缓冲区
+
+预先分配固定大小的 bytearray，写入时直接拷贝到缓冲区中，不再为每块音频保留一个 bytes 对象，
+也不需要在识别前 b"".join。缓冲区写满后覆盖最早的数据，长语音占用的内存有上限。
+views() 返回指向缓冲区内部的 memoryview（最多两段，数据绕回开头时分成两段），不发生拷贝；
+这些视图在下一次 write/clear 之前有效，需要长期保存时使用 tobytes()。
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+class PCMRingBuffer:
+    """
+    :param max_seconds: 最多保留的音频时长（秒）
+    :param sample_rate: 采样率
+    :param sample_width: 每个采样的字节数
+    """
+
+    def __init__(self, max_seconds: float = 30.0, sample_rate: int = 16000, sample_width: int = 2):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.capacity = int(max_seconds * sample_rate) * sample_width
+        if self.capacity <= 0:
+            raise ValueError("缓冲区容量必须大于 0")
+        self._buffer = bytearray(self.capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0  # 最早数据的位置
+        self._size = 0
+        self.dropped = 0  # 因写满被覆盖的字节数（clear 时清零）
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __bool__(self) -> bool:
+        return self._size > 0
+
+    @property
+    def duration(self) -> float:
+        """缓冲区中音频的时长（秒）"""
+        return self._size / self.sample_width / self.sample_rate
+
+    @property
+    def full(self) -> bool:
+        return self._size == self.capacity
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+        self.dropped = 0
+
+    def write(self, data) -> int:
+        """写入一段 PCM（bytes、bytearray 或 memoryview），返回被覆盖的旧数据字节数"""
+        data = memoryview(data)
+        if data.format != "B":
+            data = data.cast("B")
+        length = len(data)
+        if not length:
+            return 0
+        if length >= self.capacity:
+            # 超过容量时只保留最后 capacity 字节
+            overwritten = self._size + length - self.capacity
+            self._view[:] = data[length - self.capacity:]
+            self._start = 0
+            self._size = self.capacity
+            self.dropped += overwritten
+            return overwritten
+
+        end = (self._start + self._size) % self.capacity
+        first = min(length, self.capacity - end)
+        self._view[end:end + first] = data[:first]
+        if first < length:
+            self._view[:length - first] = data[first:]
+
+        overwritten = max(self._size + length - self.capacity, 0)
+        if overwritten:
+            self._start = (self._start + overwritten) % self.capacity
+        self._size = min(self._size + length, self.capacity)
+        self.dropped += overwritten
+        return overwritten
+
+    def views(self) -> Tuple[memoryview, ...]:
+        """按时间顺序返回缓冲区内容的零拷贝视图"""
+        if not self._size:
+            return ()
+        end = self._start + self._size
+        if end <= self.capacity:
+            return (self._view[self._start:end],)
+        return self._view[self._start:], self._view[:end - self.capacity]
+
+    def tobytes(self) -> bytes:
+        return b"".join(self.views())
+
+    def samples(self) -> np.ndarray:
+        """以 int16 数组返回内容，数据未绕回时不拷贝"""
+        views = self.views()
+        if len(views) == 1:
+            return np.frombuffer(views[0], dtype="<i2")
+        return np.frombuffer(self.tobytes(), dtype="<i2")
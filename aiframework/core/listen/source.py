@@ -0,0 +1,229 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/15 19:30
+# @Author  : afish
+# @File    : source.py
+"""
+音频输入源
+
+语音识别只依赖 AudioSource 接口读取 16 位单声道 PCM，麦克风、WAV 文件和合成信号可以互相替换，
+没有声卡的环境（CI、服务器）也能运行和评估完整的语音链路。
+文件和合成信号支持两种节奏：realtime=True 按实际时长输出（模拟麦克风），False 时尽快输出。
+"""
+import time
+import wave
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from aiframework.logger import logger
+
+
+class AudioSource(ABC):
+    """音频输入源，read 每次返回 chunk_samples 个采样（最后一块可能更短），结束时返回空字节"""
+
+    def __init__(self, sample_rate: int = 16000, chunk_samples: int = 3200):
+        self.sample_rate = sample_rate
+        self.chunk_samples = chunk_samples
+
+    @abstractmethod
+    def open(self):
+        """打开输入源"""
+
+    @abstractmethod
+    def read(self) -> bytes:
+        """读取一块 PCM"""
+
+    @abstractmethod
+    def close(self):
+        """关闭输入源"""
+
+    @property
+    def chunk_seconds(self) -> float:
+        return self.chunk_samples / self.sample_rate
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            data = self.read()
+            if not data:
+                return
+            yield data
+
+
+class MicrophoneSource(AudioSource):
+    """麦克风输入（pyaudio）"""
+
+    def __init__(self, sample_rate: int = 16000, chunk_samples: int = 3200, device_index: Optional[int] = None):
+        super().__init__(sample_rate, chunk_samples)
+        self.device_index = device_index
+        self.mic = None
+        self.stream = None
+
+    def open(self):
+        import pyaudio
+
+        self.mic = pyaudio.PyAudio()
+        self.stream = self.mic.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=self.device_index,
+            frames_per_buffer=self.chunk_samples
+        )
+        logger.info("麦克风已就绪")
+
+    def read(self) -> bytes:
+        if self.stream is None:
+            raise RuntimeError("音频流未初始化")
+        return self.stream.read(self.chunk_samples, exception_on_overflow=False)
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.stop_stream()
+                self.stream.close()
+            except Exception as e:
+                logger.error(f"关闭音频流失败: {str(e)}")
+            self.stream = None
+        if self.mic is not None:
+            try:
+                self.mic.terminate()
+            except Exception as e:
+                logger.error(f"终止PyAudio失败: {str(e)}")
+            self.mic = None
+
+
+class BufferSource(AudioSource):
+    """
+    内存中的 PCM 数据
+
+    :param data: 16 位单声道 PCM
+    :param realtime: 是否按实际时长输出
+    :param loop: 读完后是否从头开始
+    """
+
+    def __init__(self, data: bytes, sample_rate: int = 16000, chunk_samples: int = 3200,
+                 realtime: bool = True, loop: bool = False):
+        super().__init__(sample_rate, chunk_samples)
+        self.data = data
+        self.realtime = realtime
+        self.loop = loop
+        self._offset = 0
+        self._started: Optional[float] = None
+        self._emitted = 0  # 已输出的采样数，用于实时节奏
+
+    @property
+    def duration(self) -> float:
+        return len(self.data) / 2 / self.sample_rate
+
+    @property
+    def position(self) -> float:
+        """已输出音频的时长（秒）"""
+        return self._emitted / self.sample_rate
+
+    def open(self):
+        self._offset = 0
+        self._emitted = 0
+        self._started = time.monotonic()
+
+    def read(self) -> bytes:
+        if self._started is None:
+            self.open()
+        if self._offset >= len(self.data):
+            if not self.loop or not self.data:
+                return b""
+            self._offset = 0
+        chunk = self.data[self._offset:self._offset + self.chunk_samples * 2]
+        self._offset += len(chunk)
+        self._emitted += len(chunk) // 2
+        if self.realtime:
+            # 模拟麦克风：这块数据采集完成的时刻才返回
+            delay = self._started + self._emitted / self.sample_rate - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return chunk
+
+    def close(self):
+        self._started = None
+
+
+class WavFileSource(BufferSource):
+    """WAV 文件（16 位 PCM），多声道时取平均转为单声道"""
+
+    def __init__(self, path: Union[str, Path], chunk_samples: int = 3200, realtime: bool = True, loop: bool = False):
+        self.path = Path(path)
+        data, sample_rate = read_wav(self.path)
+        super().__init__(data, sample_rate, chunk_samples, realtime, loop)
+
+
+class SignalSource(BufferSource):
+    """
+    合成的测试信号：背景噪声中穿插带音节起伏的谐波（近似浊音），语音区间已知
+
+    :param layout: [(时长秒, 是否语音), ...]
+    :param noise_level: 背景噪声幅度（满幅为 1）
+    :param speech_level: 语音幅度
+    """
+
+    DEFAULT_LAYOUT = ((2.0, False), (1.5, True), (1.0, False), (2.5, True), (0.6, False), (1.2, True), (3.0, False))
+
+    def __init__(self, layout: Sequence[Tuple[float, bool]] = DEFAULT_LAYOUT, sample_rate: int = 16000,
+                 chunk_samples: int = 3200, realtime: bool = True, noise_level: float = 0.003,
+                 speech_level: float = 0.15, seed: int = 0):
+        data, self.segments = synthesize_speech(layout, sample_rate, noise_level, speech_level, seed)
+        super().__init__(data, sample_rate, chunk_samples, realtime)
+
+
+def synthesize_speech(layout: Sequence[Tuple[float, bool]], sample_rate: int = 16000, noise_level: float = 0.003,
+                      speech_level: float = 0.15, seed: int = 0) -> Tuple[bytes, List[Tuple[float, float]]]:
+    """生成测试音频，返回 (PCM, [(开始秒, 结束秒), ...])"""
+    rng = np.random.default_rng(seed)
+    pieces, segments, position = [], [], 0.0
+    for duration, is_speech in layout:
+        count = int(duration * sample_rate)
+        signal = rng.normal(0, noise_level, count)
+        if is_speech:
+            t = np.arange(count) / sample_rate
+            pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+            phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+            voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+            syllables = 0.55 + 0.45 * np.sin(2 * np.pi * 4 * t) ** 2
+            signal = signal + speech_level * voice * syllables
+            segments.append((position, position + duration))
+        pieces.append(signal)
+        position += duration
+    signal = np.clip(np.concatenate(pieces), -1, 1)
+    return (signal * 32767).astype("<i2").tobytes(), segments
+
+
+def read_wav(path: Union[str, Path]) -> Tuple[bytes, int]:
+    """读取 WAV 文件，返回 (单声道 PCM, 采样率)"""
+    with wave.open(str(path), "rb") as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: 只支持 16 位 PCM")
+        data = wf.readframes(wf.getnframes())
+        channels, sample_rate = wf.getnchannels(), wf.getframerate()
+    if channels > 1:
+        samples = np.frombuffer(data, dtype="<i2").reshape(-1, channels).mean(axis=1)
+        data = samples.astype("<i2").tobytes()
+    return data, sample_rate
+
+
+def create_source(spec: Optional[str] = None, sample_rate: int = 16000, chunk_samples: int = 3200,
+                  realtime: bool = True) -> AudioSource:
+    """按描述创建输入源：None/'mic' 为麦克风，'synthetic' 为合成信号，其他视为 WAV 文件路径"""
+    if spec in (None, "", "mic"):
+        return MicrophoneSource(sample_rate, chunk_samples)
+    if spec == "synthetic":
+        return SignalSource(sample_rate=sample_rate, chunk_samples=chunk_samples, realtime=realtime)
+    return WavFileSource(spec, chunk_samples, realtime)
@@ -0,0 +1,176 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/15 10:20
+# @Author  : afish
+# @File    : vad.py
+"""
+本地语音活动检测（VAD）
+
+按帧计算短时能量和过零率（NumPy 向量化），能量高于自适应噪声底且过零率不像白噪声的帧判为语音。
+- 预录（pre-roll）：确认语音开始前的若干帧会一并送出，避免吞掉开头的辅音
+- 拖尾（hangover）：语音结束后继续送出若干帧，避免句中停顿被截断
+- 连续 min_speech_ms 的语音帧才算语音开始，过滤按键声等短促噪声
+
+输入为 16 位单声道小端 PCM，输出只包含语音段的 PCM。
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+
+def frame_features(samples: np.ndarray, frame_length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """返回每帧的能量（dBFS）和过零率，不足一帧的尾部忽略"""
+    count = len(samples) // frame_length
+    frames = samples[:count * frame_length].reshape(count, frame_length).astype(np.float32) / 32768.0
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_length - 1)
+    return energy_db, zcr
+
+
+@dataclass
+class VADStats:
+    bytes_in: int = 0
+    bytes_out: int = 0
+    frames: int = 0
+    speech_frames: int = 0
+    segments: int = 0
+    process_time: float = 0.0  # 累计处理耗时（秒）
+
+    @property
+    def saved_ratio(self) -> float:
+        return 1.0 - self.bytes_out / self.bytes_in if self.bytes_in else 0.0
+
+
+class VoiceActivityDetector:
+    """
+    :param sample_rate: 采样率
+    :param frame_ms: 帧长（毫秒）
+    :param margin_db: 能量高于噪声底多少 dB 判为语音
+    :param min_energy_db: 语音的最低能量（dBFS），避免安静环境下噪声底过低导致误判
+    :param energy_threshold_db: 固定的能量阈值，设置后不再自适应
+    :param max_zcr: 过零率高于该值的帧视为噪声（能量明显更高时除外）
+    :param min_speech_ms: 连续语音达到该时长才算语音开始
+    :param hangover_ms: 语音结束后继续送出的时长
+    :param preroll_ms: 语音开始前一并送出的时长
+    """
+
+    def __init__(self, sample_rate: int = 16000, frame_ms: int = 20, margin_db: float = 10.0,
+                 min_energy_db: float = -50.0, energy_threshold_db: Optional[float] = None,
+                 max_zcr: float = 0.35, min_speech_ms: int = 60, hangover_ms: int = 300,
+                 preroll_ms: int = 200):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_length = sample_rate * frame_ms // 1000
+        self.frame_bytes = self.frame_length * 2
+        self.margin_db = margin_db
+        self.min_energy_db = min_energy_db
+        self.energy_threshold_db = energy_threshold_db
+        self.max_zcr = max_zcr
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.hangover_frames = max(0, hangover_ms // frame_ms)
+        self.preroll_frames = max(self.min_speech_frames, preroll_ms // frame_ms)
+        self.on_speech_start: Optional[Callable[[], None]] = None
+        self.on_speech_end: Optional[Callable[[], None]] = None
+        self.stats = VADStats()
+        self.noise_floor_db: Optional[float] = None
+        self.reset()
+
+    def reset(self):
+        """清空状态（噪声底保留）"""
+        self.in_speech = False
+        self._remainder = b""
+        self._preroll: deque = deque(maxlen=self.preroll_frames)
+        self._candidate = 0  # 连续语音帧数（尚未确认语音开始）
+        self._silence = 0  # 语音中连续的非语音帧数
+
+    @property
+    def threshold_db(self) -> float:
+        if self.energy_threshold_db is not None:
+            return self.energy_threshold_db
+        if self.noise_floor_db is None:
+            return self.min_energy_db
+        return max(self.noise_floor_db + self.margin_db, self.min_energy_db)
+
+    def classify(self, samples: np.ndarray) -> np.ndarray:
+        """逐帧判断是否为语音，并更新噪声底"""
+        energy_db, zcr = frame_features(samples, self.frame_length)
+        if energy_db.size == 0:
+            return np.zeros(0, dtype=bool)
+        if self.noise_floor_db is None:
+            self.noise_floor_db = float(np.percentile(energy_db, 20))
+        threshold = self.threshold_db
+        speech = (energy_db > threshold) & ((zcr <= self.max_zcr) | (energy_db > threshold + self.margin_db))
+        quiet = energy_db[~speech]
+        if quiet.size:
+            level = float(np.mean(quiet))
+            # 噪声变小时快速跟随，变大时缓慢跟随，避免语音把噪声底抬高
+            rate = 0.5 if level < self.noise_floor_db else 0.05
+            self.noise_floor_db += rate * (level - self.noise_floor_db)
+        return speech
+
+    def process(self, data: bytes) -> bytes:
+        """输入一段 PCM，返回其中需要发送的部分（可能为空）"""
+        start = time.perf_counter()
+        self.stats.bytes_in += len(data)
+        if self._remainder:
+            data = self._remainder + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self._remainder = data[usable:]
+        if not usable:
+            self.stats.process_time += time.perf_counter() - start
+            return b""
+
+        view = memoryview(data)[:usable]
+        speech = self.classify(np.frombuffer(view, dtype="<i2"))
+        output: List[bytes] = []
+        for index, is_speech in enumerate(speech.tolist()):
+            frame = view[index * self.frame_bytes:(index + 1) * self.frame_bytes]
+            self._step(frame, is_speech, output)
+        self.stats.frames += len(speech)
+        self.stats.speech_frames += int(np.count_nonzero(speech))
+        result = b"".join(output)
+        self.stats.bytes_out += len(result)
+        self.stats.process_time += time.perf_counter() - start
+        return result
+
+    def _step(self, frame: memoryview, is_speech: bool, output: List[bytes]):
+        if self.in_speech:
+            output.append(frame)
+            if is_speech:
+                self._silence = 0
+                return
+            self._silence += 1
+            if self._silence > self.hangover_frames:
+                self._end_speech()
+            return
+
+        self._preroll.append(frame)
+        self._candidate = self._candidate + 1 if is_speech else 0
+        if self._candidate >= self.min_speech_frames:
+            # 确认语音开始，送出预录缓冲（包含触发的语音帧）
+            output.extend(self._preroll)
+            self._preroll.clear()
+            self.in_speech = True
+            self._silence = 0
+            self._candidate = 0
+            self.stats.segments += 1
+            if self.on_speech_start:
+                self.on_speech_start()
+
+    def _end_speech(self):
+        self.in_speech = False
+        self._silence = 0
+        if self.on_speech_end:
+            self.on_speech_end()
+
+    def flush(self) -> bytes:
+        """输入结束时调用：语音未结束则结束它，返回剩余的不足一帧的数据"""
+        remainder, self._remainder = self._remainder, b""
+        if self.in_speech:
+            self._end_speech()
+            return bytes(remainder)
+        return b""
@@ -2,12 +2,13 @@ import asyncio
 import json
 import threading
 from contextlib import AsyncExitStack
-from typing import Dict, Any, Optional, Callable, Union
+from typing import Dict, Any, List, Optional, Callable, Union
 
 from mcp import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 
 from aiframework.conf.PackageSettingsLoader import FrozenJSON
+from aiframework.core.mcp.schema import DEFAULT_MAX_DESCRIPTION, to_openai_tool, count_tokens, limit_tools
 from aiframework.logger import logger
 
 
@@ -16,15 +17,17 @@ class MCPClient:
     MCP客户端
     """
 
-    def __init__(self, mcp_name: str, server_url: str):
+    def __init__(self, mcp_name: str, server_url: str, max_description: int = DEFAULT_MAX_DESCRIPTION):
         self.name = mcp_name
         self._server_url = server_url
+        self.max_description = max_description
         self._streams = None
         self.read_stream = None
         self.write_stream = None
         self.session_id = None
         self.session: Optional[ClientSession] = None
         self._tools = None
+        self._tool_defs: Optional[List[Dict[str, Any]]] = None  # 缓存规范化后的函数定义
         self._connected = False
         self._exit_stack: Optional[AsyncExitStack] = None
         self._lock = asyncio.Lock()  # 保证 connect/initialize/disconnect 不被并发调用
@@ -94,26 +97,36 @@ class MCPClient:
             await self.session.initialize()
             self._connected = True
             self._tools = await self.session.list_tools()
-            logger.info(f"{self.name} 已初始化，工具数量: {len(self._tools.tools)}")
+            self._tool_defs = None
+            logger.info(f"{self.name} 已初始化，工具数量: {len(self._tools.tools)}，"
+                        f"工具定义约 {sum(self.tool_token_counts().values())} token")
 
     def list_tools(self) -> Dict[str, Any]:
         if not self._tools:
             return {}
         return {tool.name: tool for tool in self._tools.tools}
 
-    def to_tool_list(self):
-        result = []
-        for tool in self._tools.tools:
-            openai_tool = {
-                "type": "function",
-                "function": {
-                    "name": tool.name,  # 自动提取名称
-                    "description": tool.description,  # 自动提取描述
-                    "parameters": tool.inputSchema.get("properties", {})
-                }
-            }
-            result.append(openai_tool)
-        return result
+    def get_input_schema(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        """获取工具规范化后（已展开 $ref）的输入 schema"""
+        for tool_def in self.to_tool_list():
+            if tool_def["function"]["name"] == tool_name:
+                return tool_def["function"]["parameters"]
+        return None
+
+    def to_tool_list(self) -> List[Dict[str, Any]]:
+        """生成完整的 OpenAI 函数定义（保留 required 和嵌套结构），结果会被缓存"""
+        if self._tool_defs is None:
+            if not self._tools:
+                return []
+            self._tool_defs = [
+                to_openai_tool(tool.name, tool.description, tool.inputSchema, self.max_description)
+                for tool in self._tools.tools
+            ]
+        return self._tool_defs
+
+    def tool_token_counts(self) -> Dict[str, int]:
+        """每个工具定义占用的 token 数"""
+        return {tool["function"]["name"]: count_tokens(tool) for tool in self.to_tool_list()}
 
     async def call_tool(self, tool_name, **kwargs):
         return await self.session.call_tool(tool_name, kwargs)
@@ -138,6 +151,7 @@ class MCPClient:
         self.session_id = None
         self.session = None
         self._tools = None
+        self._tool_defs = None
         self._exit_stack = None
         self._connected = False
         logger.info(f"{self.name} 已断开连接并清理资源")
@@ -247,6 +261,13 @@ class MCPClientManager:
         result = await client.call_tool(tool_name=tool_name, **kwargs)
         return result
 
+    def get_input_schema(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        """获取工具的输入 schema，未知工具返回 None"""
+        server_name = self.tool_server_mapping.get(tool_name)
+        if server_name is None or server_name not in self.clients:
+            return None
+        return self.clients[server_name].get_input_schema(tool_name)
+
     def tool_list(self) -> Dict[str, str]:
         """获取所有工具列表"""
         if self.tools:
@@ -258,13 +279,20 @@ class MCPClientManager:
             self.tools.update({name: tool.description for name, tool in tools.items()})
         return self.tools
 
-    def to_json(self):
-        """将工具列表转换为JSON格式"""
+    def to_json(self, max_tokens: Optional[int] = None):
+        """将工具列表转换为JSON格式，max_tokens 限制工具定义的总 token 数"""
         result = []
         for server_name, client in self.clients.items():
             tools = client.to_tool_list()
             result.extend(tools)
-        return result
+        return limit_tools(result, max_tokens)
+
+    def tool_token_counts(self) -> Dict[str, int]:
+        """每个工具定义占用的 token 数"""
+        counts = {}
+        for client in self.clients.values():
+            counts.update(client.tool_token_counts())
+        return counts
 
 
 def main():
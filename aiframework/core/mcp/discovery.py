@@ -0,0 +1,431 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/9/29 20:12
+# @Author  : afish
+# @File    : discovery.py
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import re
+import sys
+import threading
+import typing
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from aiframework.logger import logger
+
+# 索引缓存格式版本，修改解析逻辑时需要递增
+INDEX_VERSION = 1
+
+# Python 类型名称到 JSON Schema 类型的映射
+_TYPE_NAMES = {
+    "str": "string",
+    "int": "integer",
+    "float": "number",
+    "bool": "boolean",
+    "list": "array",
+    "List": "array",
+    "Sequence": "array",
+    "Iterable": "array",
+    "tuple": "array",
+    "Tuple": "array",
+    "set": "array",
+    "Set": "array",
+    "dict": "object",
+    "Dict": "object",
+    "Mapping": "object",
+}
+
+# 已通过 import 注册的工具（装饰器在模块导入时写入）
+_REGISTERED: Dict[str, Callable] = {}
+
+
+def mcp_tool(func: Callable = None, *, name: str = None, description: str = None):
+    """
+    本地 MCP 工具装饰器
+
+    被装饰的函数以关键字参数接收工具参数，输入 schema 由类型注解生成，
+    参数说明取自文档字符串中的 ``:param name: 说明``。
+
+    示例：
+        @mcp_tool
+        def open_app(name: str, timeout: int = 5):
+            '''打开应用程序
+
+            :param name: 应用名称
+            :param timeout: 超时时间（秒）
+            '''
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        doc = inspect.getdoc(fn) or ""
+        tool_name = name or fn.__name__
+        fn.__mcp_tool__ = {
+            "name": tool_name,
+            "description": description or _summary(doc) or f"Local tool: {tool_name}",
+            "input_schema": build_input_schema(fn),
+        }
+        _REGISTERED[tool_name] = fn
+        return fn
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_registered_tools() -> Dict[str, Callable]:
+    """获取已导入模块中通过 @mcp_tool 注册的函数"""
+    return dict(_REGISTERED)
+
+
+def build_input_schema(func: Callable) -> Dict[str, Any]:
+    """根据函数签名和类型注解生成输入 schema"""
+    try:
+        hints = typing.get_type_hints(func)
+    except Exception:
+        hints = getattr(func, "__annotations__", {})
+    param_docs = _param_docs(inspect.getdoc(func) or "")
+
+    properties, required = {}, []
+    for param in inspect.signature(func).parameters.values():
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD) or param.name in ("self", "cls"):
+            continue
+        schema, optional = _type_to_schema(hints.get(param.name, Any))
+        if param.name in param_docs:
+            schema["description"] = param_docs[param.name]
+        if param.default is not param.empty:
+            if _is_json_value(param.default):
+                schema["default"] = param.default
+        elif not optional:
+            required.append(param.name)
+        properties[param.name] = schema
+    return _object_schema(properties, required)
+
+
+def _object_schema(properties: Dict[str, Any], required: List[str]) -> Dict[str, Any]:
+    schema = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = required
+    return schema
+
+
+def _type_to_schema(tp) -> Tuple[Dict[str, Any], bool]:
+    """运行时类型转换为 schema，返回 (schema, 是否可为 None)"""
+    if tp is Any or tp is inspect.Parameter.empty:
+        return {}, False
+    if tp is type(None):
+        return {"type": "null"}, True
+
+    origin = typing.get_origin(tp)
+    args = typing.get_args(tp)
+    if origin is Union or (origin is not None and getattr(origin, "__name__", "") == "UnionType"):
+        members = [a for a in args if a is not type(None)]
+        optional = len(members) != len(args)
+        if len(members) == 1:
+            return _type_to_schema(members[0])[0], optional
+        return {"anyOf": [_type_to_schema(a)[0] for a in members]}, optional
+    if origin is typing.Literal:
+        return _enum_schema(list(args)), False
+    if origin is not None:
+        schema = _name_schema(getattr(origin, "__name__", ""))
+        if schema.get("type") == "array" and args and args[-1] is not Ellipsis:
+            schema["items"] = _type_to_schema(args[0])[0]
+        return schema, False
+    return _name_schema(getattr(tp, "__name__", "")), False
+
+
+def _name_schema(type_name: str) -> Dict[str, Any]:
+    json_type = _TYPE_NAMES.get(type_name)
+    return {"type": json_type} if json_type else {}
+
+
+def _enum_schema(values: List[Any]) -> Dict[str, Any]:
+    schema = {"enum": values}
+    types = {_TYPE_NAMES.get(type(v).__name__) for v in values}
+    if len(types) == 1 and None not in types:
+        schema["type"] = types.pop()
+    return schema
+
+
+def _is_json_value(value) -> bool:
+    # None 作为默认值仅表示参数可选，不写入 schema
+    return isinstance(value, (str, int, float, bool, list, dict))
+
+
+def _summary(doc: str) -> str:
+    """文档字符串的第一段作为工具描述"""
+    summary = []
+    for line in doc.strip().splitlines():
+        if not line.strip() or line.strip().startswith(":"):
+            break
+        summary.append(line.strip())
+    return " ".join(summary)
+
+
+def _param_docs(doc: str) -> Dict[str, str]:
+    """解析 ``:param name: 说明`` 形式的参数说明"""
+    return {m.group(1): m.group(2).strip() for m in re.finditer(r":param\s+(\w+)\s*:\s*(.+)", doc)}
+
+
+class _AnnotationParser:
+    """不导入模块，直接从 AST 注解生成 schema"""
+
+    def parse(self, node: Optional[ast.AST]) -> Tuple[Dict[str, Any], bool]:
+        if node is None:
+            return {}, False
+        if isinstance(node, ast.Constant):
+            if node.value is None:
+                return {"type": "null"}, True
+            if isinstance(node.value, str):
+                # 字符串形式的前向引用
+                try:
+                    return self.parse(ast.parse(node.value, mode="eval").body)
+                except SyntaxError:
+                    return {}, False
+        if isinstance(node, ast.Name):
+            return _name_schema(node.id), False
+        if isinstance(node, ast.Attribute):
+            return _name_schema(node.attr), False
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.BitOr):
+            return self._union([node.left, node.right])
+        if isinstance(node, ast.Subscript):
+            base = node.value.attr if isinstance(node.value, ast.Attribute) else getattr(node.value, "id", "")
+            elts = node.slice.elts if isinstance(node.slice, ast.Tuple) else [node.slice]
+            if base == "Optional":
+                return self.parse(elts[0])[0], True
+            if base == "Union":
+                return self._union(elts)
+            if base == "Literal":
+                return _enum_schema([e.value for e in elts if isinstance(e, ast.Constant)]), False
+            schema = _name_schema(base)
+            if schema.get("type") == "array" and elts:
+                schema["items"] = self.parse(elts[0])[0]
+            return schema, False
+        return {}, False
+
+    def _union(self, nodes: List[ast.AST]) -> Tuple[Dict[str, Any], bool]:
+        schemas, optional = [], False
+        for node in nodes:
+            schema, member_optional = self.parse(node)
+            if schema.get("type") == "null":
+                optional = True
+                continue
+            optional = optional or member_optional
+            schemas.append(schema)
+        if len(schemas) == 1:
+            return schemas[0], optional
+        return {"anyOf": schemas}, optional
+
+
+def _is_mcp_tool_decorator(node: ast.AST) -> Optional[ast.AST]:
+    """判断装饰器是否为 @mcp_tool / @mcp_tool(...)，返回装饰器节点"""
+    target = node.func if isinstance(node, ast.Call) else node
+    name = target.attr if isinstance(target, ast.Attribute) else getattr(target, "id", None)
+    return node if name == "mcp_tool" else None
+
+
+def _decorator_options(node: ast.AST) -> Dict[str, Any]:
+    if not isinstance(node, ast.Call):
+        return {}
+    options = {}
+    for keyword in node.keywords:
+        if keyword.arg in ("name", "description") and isinstance(keyword.value, ast.Constant):
+            options[keyword.arg] = keyword.value.value
+    return options
+
+
+def scan_source(path: Path) -> List[Dict[str, Any]]:
+    """解析单个源文件中带 @mcp_tool 装饰器的顶层函数"""
+    try:
+        tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+    except (SyntaxError, UnicodeDecodeError) as e:
+        logger.warning(f"解析工具文件失败 {path}: {e}")
+        return []
+
+    parser = _AnnotationParser()
+    tools = []
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        decorator = next(filter(None, map(_is_mcp_tool_decorator, node.decorator_list)), None)
+        if decorator is None:
+            continue
+
+        options = _decorator_options(decorator)
+        doc = ast.get_docstring(node) or ""
+        param_docs = _param_docs(doc)
+        args = node.args
+        positional = args.posonlyargs + args.args
+        defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+        params = list(zip(positional, defaults)) + list(zip(args.kwonlyargs, args.kw_defaults))
+
+        properties, required = {}, []
+        for arg, default in params:
+            if arg.arg in ("self", "cls"):
+                continue
+            schema, optional = parser.parse(arg.annotation)
+            if arg.arg in param_docs:
+                schema["description"] = param_docs[arg.arg]
+            if default is not None:
+                try:
+                    value = ast.literal_eval(default)
+                    if _is_json_value(value):
+                        schema["default"] = value
+                except ValueError:
+                    pass
+            elif not optional:
+                required.append(arg.arg)
+            properties[arg.arg] = schema
+
+        tool_name = options.get("name") or node.name
+        tools.append({
+            "name": tool_name,
+            "function": node.name,
+            "description": options.get("description") or _summary(doc) or f"Local tool: {tool_name}",
+            "input_schema": _object_schema(properties, required),
+        })
+    return tools
+
+
+class LazyToolExecutor:
+    """延迟导入的工具执行器：首次调用时才导入工具所在模块"""
+
+    def __init__(self, module_path: str, function_name: str):
+        self.module_path = module_path
+        self.function_name = function_name
+        self._func: Optional[Callable] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _package_module(path: Path) -> Optional[Tuple[str, Path]]:
+        """文件位于包（含 __init__.py 的目录）中时，返回 (完整模块名, 包所在目录)"""
+        parts = [] if path.stem == "__init__" else [path.stem]
+        directory = path.parent
+        while (directory / "__init__.py").exists():
+            parts.insert(0, directory.name)
+            directory = directory.parent
+        if directory == path.parent:
+            return None
+        return ".".join(parts), directory
+
+    def _load(self) -> Callable:
+        with self._lock:
+            if self._func is None:
+                path = Path(self.module_path).resolve()
+                package = self._package_module(path)
+                if package is not None:
+                    # 包内的工具模块按真实模块名导入，模块中的相对导入才能正常工作
+                    module_name, root = package
+                    if str(root) not in sys.path:
+                        sys.path.append(str(root))
+                    module = importlib.import_module(module_name)
+                    self._func = getattr(module, self.function_name)
+                    return self._func
+                digest = hashlib.md5(str(path).encode("utf-8")).hexdigest()[:8]
+                module_name = f"mcp_tools_{path.stem}_{digest}"
+                module = sys.modules.get(module_name)
+                if module is None:
+                    spec = importlib.util.spec_from_file_location(module_name, path)
+                    if spec is None or spec.loader is None:
+                        raise ImportError(f"无法加载工具模块 {path}")
+                    module = importlib.util.module_from_spec(spec)
+                    sys.modules[module_name] = module
+                    spec.loader.exec_module(module)
+                    logger.info(f"已加载工具模块: {path}")
+                self._func = getattr(module, self.function_name)
+            return self._func
+
+    @property
+    def loaded(self) -> bool:
+        return self._func is not None
+
+    def __call__(self, arguments: Dict[str, Any]):
+        return self._load()(**(arguments or {}))
+
+    def __repr__(self):
+        return f"LazyToolExecutor({self.module_path}:{self.function_name})"
+
+
+def default_index_file() -> Path:
+    """工具索引缓存的默认位置：用户缓存目录（$XDG_CACHE_HOME 或 ~/.cache）下的 aiframework 目录"""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "aiframework" / "mcp_tool_index.json"
+
+
+class ToolIndex:
+    """
+    本地工具索引
+
+    通过 AST 扫描源文件发现 @mcp_tool 函数，不导入模块；
+    扫描结果按文件 mtime/size 缓存到 JSON 文件，未修改的文件不再重复解析。
+    """
+
+    def __init__(self, cache_file: Union[str, Path] = None):
+        # 索引以源文件的绝对路径为键，不同项目可以共用一个缓存文件
+        self.cache_file = Path(cache_file) if cache_file else default_index_file()
+        self._cache: Dict[str, Dict[str, Any]] = self._load_cache()
+
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_file.exists():
+            return {}
+        try:
+            data = json.loads(self.cache_file.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning(f"读取工具索引缓存失败: {e}")
+            return {}
+        if data.get("version") != INDEX_VERSION:
+            return {}
+        return data.get("files", {})
+
+    def _save_cache(self):
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix(".tmp")
+            tmp_file.write_text(
+                json.dumps({"version": INDEX_VERSION, "files": self._cache}, ensure_ascii=False),
+                encoding="utf-8"
+            )
+            tmp_file.replace(self.cache_file)
+        except Exception as e:
+            logger.warning(f"写入工具索引缓存失败: {e}")
+
+    @staticmethod
+    def _iter_sources(paths: Iterable[Union[str, Path]]) -> Iterable[Path]:
+        for path in paths:
+            path = Path(path)
+            if path.is_file() and path.suffix == ".py":
+                yield path.resolve()
+            elif path.is_dir():
+                for file in sorted(path.rglob("*.py")):
+                    relative = file.relative_to(path).parts
+                    if not any(part.startswith((".", "__pycache__")) for part in relative):
+                        yield file.resolve()
+
+    def scan(self, paths: Iterable[Union[str, Path]]) -> Dict[str, Dict[str, Any]]:
+        """扫描路径，返回 {工具名: 工具条目}"""
+        index, seen, changed = {}, set(), False
+        for file in self._iter_sources(paths):
+            key = str(file)
+            seen.add(key)
+            stat = file.stat()
+            entry = self._cache.get(key)
+            if not entry or entry["mtime"] != stat.st_mtime_ns or entry["size"] != stat.st_size:
+                entry = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "tools": scan_source(file)}
+                self._cache[key] = entry
+                changed = True
+            for tool in entry["tools"]:
+                if tool["name"] in index:
+                    logger.warning(f"工具 {tool['name']} 重复定义，已使用 {key}")
+                index[tool["name"]] = dict(tool, module_path=key)
+
+        # 已删除的文件从缓存中移除
+        for key in [k for k in self._cache if k not in seen and not Path(k).exists()]:
+            del self._cache[key]
+            changed = True
+        if changed:
+            self._save_cache()
+        return index
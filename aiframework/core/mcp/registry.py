@@ -0,0 +1,158 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/9/28 21:05
+# @Author  : afish
+# @File    : registry.py
+import asyncio
+import inspect
+import threading
+from typing import Dict, Any, List, Optional, Callable
+
+from aiframework.core.mcp.action import ToolInfo, ToolType
+from aiframework.core.mcp.client import MCPClientManager
+from aiframework.core.mcp.schema import count_tokens, limit_tools, to_openai_tool
+from aiframework.core.mcp.server import MCPServerManager
+from aiframework.logger import logger
+
+
+class ToolRegistry:
+    """
+    统一工具注册表
+
+    合并 MCPServerManager 中的本地工具与 MCPClientManager 中的远程 MCP 工具，
+    对外提供与 MCPClientManager 相同的 tool_list / to_json / call_tool 接口。
+    本地工具直接在进程内调用 executor，不经过序列化和网络。
+    同名工具以本地工具优先。
+    """
+
+    def __init__(self, remote: Optional[MCPClientManager] = None,
+                 local: Optional[MCPServerManager] = None):
+        self.remote = remote
+        self.local = local
+        self._builtin: Dict[str, ToolInfo] = {}  # 框架内置工具（如 fetch_blob）
+        self._loop = asyncio.new_event_loop()  # 本地异步工具使用的事件循环
+        self._thread = None
+        if self.local is not None and not self.local.initialized:
+            try:
+                self.run_async(self.local.initialize)
+            except Exception as e:
+                logger.error(f"本地工具初始化失败: {e}")
+
+    def start(self):
+        """启动本地工具事件循环"""
+        if self._thread and self._thread.is_alive():
+            return
+
+        self._thread = threading.Thread(target=self._run_event_loop, daemon=True)
+        self._thread.start()
+
+    def _run_event_loop(self):
+        """在新线程中运行事件循环"""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def stop(self):
+        """停止本地工具事件循环"""
+        if self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def run_async(self, coro: Callable, *args, **kwargs):
+        """在本地事件循环中运行异步函数并返回结果"""
+        if not self._loop.is_running():
+            self.start()
+
+        future = asyncio.run_coroutine_threadsafe(coro(*args, **kwargs), self._loop)
+        return future.result()
+
+    def _local_tools(self) -> Dict[str, ToolInfo]:
+        tools = self.local.get_all_tools() if self.local else {}
+        if self._builtin:
+            tools = {**self._builtin, **tools}
+        return tools
+
+    def add_builtin_tool(self, name: str, executor: Callable[[Dict[str, Any]], Any], description: str,
+                         input_schema: Dict[str, Any]):
+        """注册框架内置工具，executor 接收参数字典；与本地工具同名时以本地工具为准"""
+        self._builtin[name] = ToolInfo(
+            name=name,
+            tool_type=ToolType.LOCAL_TOOL,
+            definition=to_openai_tool(name, description, input_schema),
+            description=description,
+            executor=executor,
+            input_schema=input_schema
+        )
+
+    def is_local(self, tool_name: str) -> bool:
+        """判断工具是否为本地工具"""
+        return tool_name in self._local_tools()
+
+    def has_tool(self, tool_name: str) -> bool:
+        """判断工具是否已注册（本地或远程）"""
+        if self.is_local(tool_name):
+            return True
+        return bool(self.remote) and tool_name in self.remote.tool_server_mapping
+
+    def get_input_schema(self, tool_name: str) -> Optional[Dict[str, Any]]:
+        """获取工具的输入 schema，未知工具返回 None"""
+        tool = self._local_tools().get(tool_name)
+        if tool is not None:
+            return tool.definition["function"].get("parameters")
+        return self.remote.get_input_schema(tool_name) if self.remote else None
+
+    def tool_list(self) -> Dict[str, str]:
+        """获取所有工具名称与描述"""
+        tools = dict(self.remote.tool_list()) if self.remote else {}
+        for name, tool in self._local_tools().items():
+            tools[name] = tool.description or tool.definition["function"].get("description")
+        return tools
+
+    def to_json(self, max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+        """合并本地工具与远程工具的 OpenAI 函数定义，max_tokens 限制工具定义的总 token 数"""
+        local_tools = self._local_tools()
+        result = [tool.definition for tool in local_tools.values()]
+        if self.remote:
+            for tool_def in self.remote.to_json():
+                name = tool_def["function"]["name"]
+                if name in local_tools:
+                    logger.warning(f"远程工具 {name} 与本地工具同名，已使用本地工具")
+                    continue
+                result.append(tool_def)
+        return limit_tools(result, max_tokens)
+
+    def tool_token_counts(self) -> Dict[str, int]:
+        """每个工具定义占用的 token 数"""
+        counts = self.remote.tool_token_counts() if self.remote else {}
+        for name, tool in self._local_tools().items():
+            counts[name] = count_tokens(tool.definition)
+        return counts
+
+    def call_tool(self, tool_name, **kwargs):
+        """同步方法调用工具，本地工具走进程内快速路径"""
+        tool = self._local_tools().get(tool_name)
+        if tool is not None:
+            logger.info(f"正在调用本地工具 {tool_name}...")
+            return self._call_local(tool, kwargs)
+        if not self.remote:
+            raise ValueError(f"工具 {tool_name} 未找到")
+        return self.remote.call_tool(tool_name, **kwargs)
+
+    def _call_local(self, tool: ToolInfo, arguments: Dict[str, Any]):
+        """直接调用本地 executor，异步 executor 在本地事件循环中等待结果"""
+        if tool.executor is None:
+            raise ValueError(f"本地工具 {tool.name} 未设置执行器")
+        result = tool.executor(arguments)
+        if inspect.isawaitable(result):
+            result = self.run_async(self._await, result)
+        return result
+
+    @staticmethod
+    async def _await(awaitable):
+        return await awaitable
+
+    def disconnect_all(self):
+        """断开所有远程客户端连接"""
+        if self.remote:
+            self.remote.disconnect_all()
@@ -0,0 +1,163 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/4 20:12
+# @Author  : afish
+# @File    : retrieval.py
+"""
+工具检索
+
+为工具名称、描述和参数说明建立 TF-IDF 索引，按当前用户消息和最近的上下文
+挑选最相关的 top-k 个工具，避免每次请求都携带全部工具定义。
+纯 Python 实现，无需额外依赖；中文按字和相邻二字切分。
+"""
+import hashlib
+import math
+import re
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from aiframework.logger import logger
+
+_WORD = re.compile(r"[A-Za-z]+|\d+")
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """切分英文单词（拆开驼峰/下划线）与中文单字、二字组合"""
+    if not text:
+        return []
+    tokens = []
+    for word in _WORD.findall(_CAMEL.sub(" ", text)):
+        word = word.lower()
+        if len(word) > 1 or word.isdigit():
+            tokens.append(word)
+    for run in _CJK_RUN.findall(text):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _tool_text(tool: Dict[str, Any]) -> str:
+    """工具的检索文本：名称、描述、参数名和参数描述"""
+    function = tool.get("function", {})
+    parts = [function.get("name", ""), function.get("name", ""), function.get("description") or ""]
+
+    def walk(schema: Any):
+        if not isinstance(schema, dict):
+            return
+        for name, sub in (schema.get("properties") or {}).items():
+            parts.append(name)
+            if isinstance(sub, dict):
+                parts.append(sub.get("description") or "")
+                walk(sub)
+        walk(schema.get("items"))
+
+    walk(function.get("parameters"))
+    return " ".join(parts)
+
+
+def _catalog_key(tools: Sequence[Dict[str, Any]]) -> str:
+    digest = hashlib.sha1()
+    for tool in tools:
+        digest.update(_tool_text(tool).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ToolRetriever:
+    """
+    基于 TF-IDF 的工具检索
+
+    :param top_k: 每次请求最多携带的工具数量
+    :param context_messages: 除最后一条用户消息外，参与检索的最近消息条数
+    :param always_include: 总是携带的工具名称
+    """
+
+    def __init__(self, top_k: int = 8, context_messages: int = 4, always_include: Iterable[str] = ()):
+        self.top_k = top_k
+        self.context_messages = context_messages
+        self.always_include = set(always_include)
+        self._key: Optional[str] = None
+        self._names: List[str] = []
+        self._vectors: List[Dict[str, float]] = []
+        self._idf: Dict[str, float] = {}
+        # 多个会话的客户端共享同一个检索器，索引的更新与检索互斥
+        self._lock = threading.RLock()
+
+    def index(self, tools: Sequence[Dict[str, Any]]):
+        """建立索引，工具目录未变化时直接复用"""
+        key = _catalog_key(tools)
+        with self._lock:
+            if key == self._key:
+                return
+            documents = [Counter(tokenize(_tool_text(tool))) for tool in tools]
+            df = Counter(term for doc in documents for term in doc)
+            n = len(documents)
+            self._idf = {term: math.log((1 + n) / (1 + count)) + 1 for term, count in df.items()}
+            self._names = [tool["function"]["name"] for tool in tools]
+            self._vectors = [self._weigh(doc) for doc in documents]
+            self._key = key
+        logger.debug(f"工具检索索引已更新，工具数量: {n}，词项数量: {len(df)}")
+
+    def _weigh(self, counts: Counter) -> Dict[str, float]:
+        """计算归一化的 TF-IDF 向量，索引中不存在的词项被忽略"""
+        vector = {term: (1 + math.log(tf)) * self._idf[term] for term, tf in counts.items() if term in self._idf}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {term: w / norm for term, w in vector.items()} if norm else {}
+
+    def rank(self, query: str) -> List[tuple]:
+        """返回 (工具名, 相似度) 列表，按相似度降序，只包含相关的工具"""
+        query_vector = self._weigh(Counter(tokenize(query)))
+        if not query_vector:
+            return []
+        scores = []
+        for name, vector in zip(self._names, self._vectors):
+            score = sum(w * vector.get(term, 0.0) for term, w in query_vector.items())
+            if score > 0:
+                scores.append((name, score))
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores
+
+    def build_query(self, messages: Sequence[Dict[str, Any]]) -> str:
+        """由最后一条用户消息和最近的上下文组成检索文本，用户消息权重加倍"""
+        texts, last_user = [], None
+        for message in reversed(messages):
+            if not isinstance(message, dict) or message.get("role") == "system":
+                continue
+            content = message.get("content")
+            if not isinstance(content, str) or not content:
+                continue
+            if last_user is None and message.get("role") == "user":
+                last_user = content
+            elif len(texts) < self.context_messages:
+                texts.append(content)
+            if last_user is not None and len(texts) >= self.context_messages:
+                break
+        return " ".join(([last_user] * 2 if last_user else []) + texts)
+
+    def select(self, tools: List[Dict[str, Any]], messages: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        挑选与当前对话最相关的工具
+
+        工具数量不超过 top_k，或没有任何工具与对话相关时，返回完整的工具目录
+        """
+        if not self.top_k or len(tools) <= self.top_k:
+            return tools
+        query = self.build_query(messages)
+        with self._lock:
+            self.index(tools)
+            ranked = self.rank(query)
+        if not ranked:
+            logger.debug("未检索到相关工具，使用完整工具目录")
+            return tools
+
+        selected = {name for name in self.always_include}
+        for name, _ in ranked:
+            if len(selected) >= self.top_k:
+                break
+            selected.add(name)
+        result = [tool for tool in tools if tool["function"]["name"] in selected]
+        logger.info(f"已按相关性选择 {len(result)}/{len(tools)} 个工具: {sorted(selected)}")
+        return result
@@ -0,0 +1,142 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/3 19:32
+# @Author  : afish
+# @File    : schema.py
+"""
+工具定义规范化
+
+把 MCP 工具的 inputSchema 转换为完整的 OpenAI 函数定义：保留 type/required/嵌套结构，
+展开 $ref，去掉对模型无用的字段并裁剪过长的描述；同时估算每个工具定义占用的 token 数。
+"""
+import copy
+import json
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from aiframework.logger import logger
+
+# 描述默认最大长度（字符）
+DEFAULT_MAX_DESCRIPTION = 512
+
+# 对模型无用、只增加 token 的字段
+_DROP_KEYS = {"$schema", "$id", "$defs", "definitions", "title", "examples", "$comment"}
+
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def resolve_refs(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """展开本地 $ref（#/$defs/... 与 #/definitions/...），循环引用处退化为 object"""
+    definitions = {}
+    for key in ("$defs", "definitions"):
+        for name, definition in (schema.get(key) or {}).items():
+            definitions[f"#/{key}/{name}"] = definition
+
+    def resolve(node: Any, stack: tuple) -> Any:
+        if isinstance(node, list):
+            return [resolve(item, stack) for item in node]
+        if not isinstance(node, dict):
+            return node
+        ref = node.get("$ref")
+        if isinstance(ref, str):
+            target = definitions.get(ref)
+            if target is None or ref in stack:
+                # 外部引用或循环引用无法展开
+                fallback = {"type": "object"}
+                if "description" in node:
+                    fallback["description"] = node["description"]
+                return fallback
+            merged = {**target, **{k: v for k, v in node.items() if k != "$ref"}}
+            return resolve(merged, stack + (ref,))
+        return {k: resolve(v, stack) for k, v in node.items() if k not in ("$defs", "definitions")}
+
+    return resolve(schema, ())
+
+
+def _trim(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _clean(node: Any, max_description: int, in_properties: bool = False) -> Any:
+    """去掉无用字段、裁剪描述"""
+    if isinstance(node, list):
+        return [_clean(item, max_description) for item in node]
+    if not isinstance(node, dict):
+        return node
+    result = {}
+    for key, value in node.items():
+        if in_properties:
+            # properties 下的键是参数名，不能按关键字过滤
+            result[key] = _clean(value, max_description)
+        elif key in _DROP_KEYS:
+            continue
+        elif key == "description" and isinstance(value, str):
+            if value.strip():
+                result[key] = _trim(value, max_description)
+        else:
+            result[key] = _clean(value, max_description, in_properties=key == "properties")
+    return result
+
+
+def normalize_schema(schema: Optional[Dict[str, Any]],
+                     max_description: int = DEFAULT_MAX_DESCRIPTION) -> Dict[str, Any]:
+    """生成规范化的参数 schema（根节点总是带 properties 的 object）"""
+    schema = copy.deepcopy(schema) if isinstance(schema, dict) else {}
+    normalized = _clean(resolve_refs(schema), max_description)
+    normalized.setdefault("type", "object")
+    if normalized["type"] == "object":
+        normalized.setdefault("properties", {})
+    if not normalized.get("required"):
+        normalized.pop("required", None)
+    return normalized
+
+
+def to_openai_tool(name: str, description: Optional[str], input_schema: Optional[Dict[str, Any]],
+                   max_description: int = DEFAULT_MAX_DESCRIPTION) -> Dict[str, Any]:
+    """生成完整的 OpenAI 函数定义"""
+    function = {"name": name}
+    if description and description.strip():
+        function["description"] = _trim(description, max_description)
+    function["parameters"] = normalize_schema(input_schema, max_description)
+    return {"type": "function", "function": function}
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    """tiktoken 为可选依赖，未安装时使用估算"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(obj: Any) -> int:
+    """估算对象序列化后占用的 token 数"""
+    text = obj if isinstance(obj, str) else json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # 中日韩字符约 1 token/字，其余约 4 字符/token
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def limit_tools(tools: List[Dict[str, Any]], max_tokens: Optional[int]) -> List[Dict[str, Any]]:
+    """按顺序保留工具定义，直到总 token 数达到上限"""
+    if not max_tokens:
+        return tools
+    kept, dropped, total = [], [], 0
+    for tool in tools:
+        tokens = count_tokens(tool)
+        if total + tokens > max_tokens:
+            dropped.append(tool["function"]["name"])
+            continue
+        kept.append(tool)
+        total += tokens
+    if dropped:
+        logger.warning(f"工具定义超出 {max_tokens} token 上限，已省略: {dropped}")
+    return kept
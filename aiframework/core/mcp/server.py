@@ -3,39 +3,145 @@
 # @Time    : 2025/9/4 20:30
 # @Author  : afish
 # @File    : server.py
-from typing import Dict, Any, List, Optional
+import asyncio
+import inspect
+import json
+import uuid
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
 
 from aiframework.logger import logger
 
 from aiframework.core.mcp.action import ToolType, ToolInfo
+from aiframework.core.mcp.discovery import ToolIndex, LazyToolExecutor, get_registered_tools
+from aiframework.core.mcp.schema import to_openai_tool
 from aiframework.utils.decorate import singleton
+from aiframework.utils.http import HTTPError, HTTPRequest, read_request, write_response, write_json, start_sse, send_sse
+
+
+# MCP 协议版本，按从旧到新排列
+SUPPORTED_PROTOCOL_VERSIONS = ["2024-11-05", "2025-03-26", "2025-06-18"]
+
+# JSON-RPC 错误码
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
 
 
 # 服务端工具实现
 class MCPServer:
-    """MCP 服务器实现示例"""
+    """
+    基于 asyncio 的 Streamable HTTP MCP 服务器
 
-    def __init__(self):
+    通过 POST {path} 接收 JSON-RPC 消息，按客户端 Accept 头返回 JSON 或 SSE。
+    每个工具有独立的并发上限和超时，stop() 会等待进行中的请求完成后再关闭连接。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, path: str = "/mcp",
+                 name: str = "aiframework", request_timeout: float = 30.0,
+                 max_concurrency: int = 8, shutdown_timeout: float = 10.0,
+                 idle_timeout: float = 60.0, max_body: int = 4 * 1024 * 1024):
+        """
+        :param host: 监听地址（供其他实例访问时使用 0.0.0.0）
+        :param port: 监听端口，0 表示自动分配
+        :param path: MCP 端点路径
+        :param name: 服务名称，返回给客户端
+        :param request_timeout: 默认单次工具调用超时（秒）
+        :param max_concurrency: 默认单个工具的最大并发数
+        :param shutdown_timeout: 优雅关闭时等待进行中请求的最长时间（秒）
+        :param idle_timeout: keep-alive 连接的空闲超时（秒）
+        :param max_body: 请求体大小上限（字节）
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+        self.name = name
+        self.request_timeout = request_timeout
+        self.max_concurrency = max_concurrency
+        self.shutdown_timeout = shutdown_timeout
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
         self.tools = {}
+        self.sessions = set()
+
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self._busy: set = set()  # 正在处理请求的连接
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{self.path}"
 
     async def start(self):
         """启动服务器"""
         logger.info("MCP 服务器启动中...")
-        # 这里实现服务器启动逻辑
-        # 可以是 Stdio、SSE 或 HTTP 服务器
+        self._closing = False
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # 端口为 0 时回填实际端口
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"MCP 服务器已启动: {self.url}，工具数量: {len(self.tools)}")
+
+    async def serve_forever(self):
+        """启动并持续运行，直到任务被取消"""
+        if self._server is None:
+            await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
 
     async def stop(self):
         """停止服务器"""
+        if self._server is None:
+            return
         logger.info("MCP 服务器停止中...")
-        # 这里实现服务器停止逻辑
+        self._closing = True
+        # 1. 不再接受新连接
+        self._server.close()
+
+        # 2. 等待进行中的请求完成
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"仍有 {len(self._busy)} 个请求未完成，强制关闭")
+
+        # 3. 关闭剩余连接
+        for task, writer in list(self._connections.items()):
+            writer.close()
+            task.cancel()
+        if self._connections:
+            await asyncio.gather(*self._connections, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        self.sessions.clear()
+        logger.info("MCP 服务器已停止")
 
-    def register_tool(self, name: str, func: callable, description: str = None):
-        """注册工具"""
+    def register_tool(self, name: str, func: callable, description: str = None,
+                      input_schema: Dict[str, Any] = None, max_concurrency: int = None,
+                      timeout: float = None):
+        """注册工具，func 接收参数字典，可以是同步或异步函数"""
         self.tools[name] = {
             "func": func,
-            "description": description or f"Tool: {name}"
+            "description": description or f"Tool: {name}",
+            "input_schema": input_schema or {"type": "object", "properties": {}},
+            "timeout": timeout or self.request_timeout,
+            "semaphore": asyncio.Semaphore(max_concurrency or self.max_concurrency),
         }
 
+    def register_manager_tools(self, manager: "MCPServerManager"):
+        """将 MCPServerManager 中的本地工具全部注册到服务器"""
+        for name, tool in manager.get_all_tools().items():
+            self.register_tool(
+                name,
+                tool.executor,
+                tool.description or tool.definition["function"].get("description"),
+                tool.definition["function"].get("parameters")
+            )
+
     async def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """处理请求"""
         tool_name = request.get("tool")
@@ -45,19 +151,211 @@ class MCPServer:
             return {"error": f"Tool not found: {tool_name}"}
 
         try:
-            result = await self.tools[tool_name]["func"](arguments)
+            result = await self._invoke(tool_name, arguments)
             return {"result": result}
         except Exception as e:
             return {"error": str(e)}
 
+    async def _invoke(self, tool_name: str, arguments: Dict[str, Any]) -> Any:
+        """在并发上限和超时控制下执行工具，超时从拿到并发名额后开始计算"""
+        tool = self.tools[tool_name]
+        semaphore = tool["semaphore"]
+        await semaphore.acquire()
+        try:
+            task = asyncio.ensure_future(self._run_tool(tool["func"], arguments))
+        except BaseException:
+            semaphore.release()
+            raise
+
+        def release(finished: asyncio.Future):
+            semaphore.release()
+            if not finished.cancelled():
+                finished.exception()  # 超时后才结束的任务，异常已无人接收
+
+        # 名额跟随任务，任务结束时释放（包括还没开始执行就被取消的情况）
+        task.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout=tool["timeout"])
+        except asyncio.TimeoutError:
+            task.cancel()
+            raise TimeoutError(f"工具 {tool_name} 执行超时（{tool['timeout']}s）")
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+    @staticmethod
+    async def _run_tool(func: callable, arguments: Dict[str, Any]) -> Any:
+        if inspect.iscoroutinefunction(func):
+            return await func(arguments)
+        # 同步工具放到线程池，避免阻塞事件循环
+        thread = asyncio.ensure_future(asyncio.to_thread(func, arguments))
+        try:
+            result = await asyncio.shield(thread)
+        except asyncio.CancelledError:
+            # 线程无法中断：等它真正返回后任务才结束，名额在此之前不会释放
+            await asyncio.wait({thread})
+            if not thread.cancelled() and thread.exception() is None and inspect.iscoroutine(thread.result()):
+                thread.result().close()
+            raise
+        # 同步函数返回的可等待对象（如懒加载的异步工具）同样在名额内执行
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def handle_message(self, message: Any) -> Optional[Dict[str, Any]]:
+        """处理一条 JSON-RPC 消息，通知类消息返回 None"""
+        if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+            return self._error(message.get("id") if isinstance(message, dict) else None,
+                               INVALID_REQUEST, "Invalid Request")
+
+        msg_id = message.get("id")
+        method = message["method"]
+        params = message.get("params") or {}
+        if msg_id is None:
+            # 通知（notifications/initialized 等）无需响应
+            return None
+
+        if method == "initialize":
+            requested = params.get("protocolVersion")
+            version = requested if requested in SUPPORTED_PROTOCOL_VERSIONS else SUPPORTED_PROTOCOL_VERSIONS[-1]
+            return self._result(msg_id, {
+                "protocolVersion": version,
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": self.name, "version": "0.1.0"},
+            })
+        if method == "ping":
+            return self._result(msg_id, {})
+        if method == "tools/list":
+            return self._result(msg_id, {"tools": [
+                {"name": name, "description": tool["description"], "inputSchema": tool["input_schema"]}
+                for name, tool in self.tools.items()
+            ]})
+        if method == "tools/call":
+            tool_name = params.get("name")
+            if tool_name not in self.tools:
+                return self._error(msg_id, INVALID_PARAMS, f"Tool not found: {tool_name}")
+            try:
+                result = await self._invoke(tool_name, params.get("arguments") or {})
+                return self._result(msg_id, {"content": [self._text_content(result)], "isError": False})
+            except Exception as e:
+                logger.error(f"工具 {tool_name} 执行失败: {e}")
+                return self._result(msg_id, {"content": [self._text_content(str(e))], "isError": True})
+        return self._error(msg_id, METHOD_NOT_FOUND, f"Method not found: {method}")
+
+    @staticmethod
+    def _result(msg_id, result: Dict[str, Any]) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": msg_id, "result": result}
+
+    @staticmethod
+    def _error(msg_id, code: int, message: str) -> Dict[str, Any]:
+        return {"jsonrpc": "2.0", "id": msg_id, "error": {"code": code, "message": message}}
+
+    @staticmethod
+    def _text_content(result: Any) -> Dict[str, Any]:
+        if isinstance(result, (dict, list, int, float, bool)) or result is None:
+            text = json.dumps(result, ensure_ascii=False, default=str)
+        else:
+            text = str(result)
+        return {"type": "text", "text": text}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理单个 TCP 连接上的请求（支持 keep-alive）"""
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while not self._closing:
+                try:
+                    request = await asyncio.wait_for(read_request(reader, self.max_body), self.idle_timeout)
+                except HTTPError as e:
+                    await write_json(writer, e.status, self._error(None, INVALID_REQUEST, str(e)), keep_alive=False)
+                    break
+                if request is None:
+                    break
+
+                self._busy.add(task)
+                self._idle.clear()
+                try:
+                    keep_alive = await self._dispatch(request, writer)
+                finally:
+                    self._busy.discard(task)
+                    if not self._busy:
+                        self._idle.set()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"MCP 连接处理异常: {e}")
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _dispatch(self, request: HTTPRequest, writer: asyncio.StreamWriter) -> bool:
+        """路由 HTTP 请求，返回连接是否保持"""
+        keep_alive = request.keep_alive and not self._closing
+        if request.path != self.path:
+            await write_response(writer, 404, keep_alive=keep_alive)
+            return keep_alive
+
+        session_id = request.headers.get("mcp-session-id")
+        if request.method == "DELETE":
+            self.sessions.discard(session_id)
+            await write_response(writer, 200, keep_alive=keep_alive)
+            return keep_alive
+        if request.method != "POST":
+            # 不提供服务端主动推送的 GET 流
+            await write_response(writer, 405, headers={"Allow": "POST, DELETE"}, keep_alive=keep_alive)
+            return keep_alive
+
+        try:
+            payload = request.json()
+        except ValueError:
+            await write_json(writer, 400, self._error(None, PARSE_ERROR, "Parse error"), keep_alive=keep_alive)
+            return keep_alive
+
+        messages = payload if isinstance(payload, list) else [payload]
+        is_initialize = any(isinstance(m, dict) and m.get("method") == "initialize" for m in messages)
+        headers = {}
+        if is_initialize:
+            session_id = uuid.uuid4().hex
+            self.sessions.add(session_id)
+            headers["Mcp-Session-Id"] = session_id
+        elif session_id and session_id not in self.sessions:
+            await write_response(writer, 404, keep_alive=keep_alive)
+            return keep_alive
+
+        # 同一批次内的消息并发处理
+        responses = [r for r in await asyncio.gather(*map(self.handle_message, messages)) if r is not None]
+        if not responses:
+            await write_response(writer, 202, headers=headers, keep_alive=keep_alive)
+            return keep_alive
+
+        body = responses if isinstance(payload, list) else responses[0]
+        if request.accepts("application/json"):
+            await write_json(writer, 200, body, headers=headers, keep_alive=keep_alive)
+            return keep_alive
+
+        await start_sse(writer, headers)
+        for response in responses:
+            await send_sse(writer, response)
+        return False
+
 
 @singleton
 class MCPServerManager:
     """MCP 服务端管理器，负责管理本地工具"""
 
-    def __init__(self):
+    def __init__(self, tool_paths: List[Union[str, Path]] = None, index_file: Union[str, Path] = None):
+        """
+        :param tool_paths: 扫描 @mcp_tool 工具的文件或目录列表
+        :param index_file: 工具索引缓存文件路径（默认 ~/.cache/aiframework/mcp_tool_index.json）
+        """
         self.local_tools: Dict[str, ToolInfo] = {}
         self.tool_definitions: List[Dict[str, Any]] = []
+        self.tool_paths = list(tool_paths or [])
+        self.index = ToolIndex(index_file)
         self.initialized = False
 
     async def initialize(self):
@@ -76,10 +374,28 @@ class MCPServerManager:
 
     async def auto_discover_tools(self):
         """自动发现并注册本地工具"""
-        # 这里可以扫描特定的包或模块来发现工具
-        # 例如，扫描所有带有 @mcp_tool 装饰器的函数
+        # 扫描 tool_paths 中带有 @mcp_tool 装饰器的函数，模块在首次调用时才导入
+        for name, entry in self.index.scan(self.tool_paths).items():
+            await self.register_tool(
+                name,
+                LazyToolExecutor(entry["module_path"], entry["function"]),
+                entry["description"],
+                entry["input_schema"]
+            )
+
+        # 已经导入的模块中注册的工具
+        for name, func in get_registered_tools().items():
+            if name in self.local_tools:
+                continue
+            meta = func.__mcp_tool__
+            await self.register_tool(
+                name,
+                lambda arguments, _func=func: _func(**(arguments or {})),
+                meta["description"],
+                meta["input_schema"]
+            )
 
-        # 示例：手动注册一些工具
+        # 内置示例工具
         await self.register_tool("echo", self._echo_tool, "Echo tool", {
             "type": "object",
             "properties": {
@@ -97,23 +413,16 @@ class MCPServerManager:
                             input_schema: Dict[str, Any] = None):
         """注册本地工具"""
         # 构建工具定义
-        tool_def = {
-            "type": "function",
-            "function": {
-                "name": name,
-                "description": description or f"Local tool: {name}",
-                "parameters": input_schema or {
-                    "type": "object",
-                    "properties": {
-                        "input": {
-                            "type": "string",
-                            "description": "Input for the function"
-                        }
-                    },
-                    "required": ["input"]
+        tool_def = to_openai_tool(name, description or f"Local tool: {name}", input_schema or {
+            "type": "object",
+            "properties": {
+                "input": {
+                    "type": "string",
+                    "description": "Input for the function"
                 }
-            }
-        }
+            },
+            "required": ["input"]
+        })
 
         # 创建工具信息
         tool_info = ToolInfo(
@@ -125,7 +434,9 @@ class MCPServerManager:
             input_schema=input_schema
         )
 
-        # 存储工具信息
+        # 存储工具信息（重复注册时覆盖旧定义）
+        if name in self.local_tools:
+            self.tool_definitions = [d for d in self.tool_definitions if d["function"]["name"] != name]
         self.local_tools[name] = tool_info
         self.tool_definitions.append(tool_def)
 
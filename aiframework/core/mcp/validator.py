@@ -0,0 +1,269 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/2 20:26
+# @Author  : afish
+# @File    : validator.py
+"""
+工具参数校验
+
+将工具的 inputSchema 编译为嵌套的校验函数，每个工具版本只编译一次；
+模型生成的参数在本地校验失败时直接把错误返回给模型，不再请求服务端。
+"""
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 校验函数：接收 (值, 路径)，返回错误列表
+Check = Callable[[Any, str], List[str]]
+
+_JSON_TYPES = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool)
+                         or isinstance(v, float) and v.is_integer(),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+    "null": lambda v: v is None,
+}
+
+
+class ToolArgumentError(ValueError):
+    """工具参数不合法"""
+
+    def __init__(self, tool_name: str, errors: List[str]):
+        self.tool_name = tool_name
+        self.errors = errors
+        super().__init__(f"工具 {tool_name} 参数校验失败: " + "; ".join(errors))
+
+
+def compile_schema(schema: Optional[Dict[str, Any]]) -> Check:
+    """把 JSON Schema 编译为校验函数"""
+    if not isinstance(schema, dict) or not schema:
+        return lambda value, path: []
+
+    checks: List[Check] = []
+    type_check: Optional[Check] = None
+
+    if "$ref" in schema:
+        # 未展开的引用不做校验
+        return lambda value, path: []
+
+    schema_type = schema.get("type")
+    if schema_type:
+        types = schema_type if isinstance(schema_type, list) else [schema_type]
+        predicates = [_JSON_TYPES[t] for t in types if t in _JSON_TYPES]
+        if predicates:
+            expected = "/".join(types)
+
+            def check_type(value, path):
+                if any(p(value) for p in predicates):
+                    return []
+                return [f"{path} 类型应为 {expected}，实际为 {_type_name(value)}"]
+
+            type_check = check_type
+            checks.append(check_type)
+
+    if "enum" in schema:
+        options = schema["enum"]
+
+        def check_enum(value, path):
+            return [] if value in options else [f"{path} 取值应为 {options} 之一"]
+
+        checks.append(check_enum)
+
+    if "const" in schema:
+        const = schema["const"]
+        checks.append(lambda value, path: [] if value == const else [f"{path} 取值应为 {const!r}"])
+
+    checks.extend(_string_checks(schema))
+    checks.extend(_number_checks(schema))
+    checks.extend(_array_checks(schema))
+    checks.extend(_object_checks(schema))
+
+    for keyword in ("anyOf", "oneOf"):
+        if keyword in schema:
+            branches = [compile_schema(s) for s in schema[keyword]]
+            exactly_one = keyword == "oneOf"
+
+            def check_branches(value, path, branches=branches, exactly_one=exactly_one, keyword=keyword):
+                passed = sum(1 for branch in branches if not branch(value, path))
+                if passed == 0 or (exactly_one and passed > 1):
+                    return [f"{path} 不满足 {keyword} 中的{'唯一' if exactly_one else '任一'}约束"]
+                return []
+
+            checks.append(check_branches)
+
+    if "allOf" in schema:
+        branches = [compile_schema(s) for s in schema["allOf"]]
+        checks.append(lambda value, path: [e for branch in branches for e in branch(value, path)])
+
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value, path):
+        errors = []
+        for check in checks:
+            errors.extend(check(value, path))
+            if errors and check is type_check:
+                # 类型不对时不再继续检查细节
+                break
+        return errors
+
+    return check_all
+
+
+def _string_checks(schema: Dict[str, Any]) -> List[Check]:
+    checks = []
+    min_length, max_length = schema.get("minLength"), schema.get("maxLength")
+    if min_length is not None or max_length is not None:
+        def check_length(value, path):
+            if not isinstance(value, str):
+                return []
+            if min_length is not None and len(value) < min_length:
+                return [f"{path} 长度不能小于 {min_length}"]
+            if max_length is not None and len(value) > max_length:
+                return [f"{path} 长度不能大于 {max_length}"]
+            return []
+
+        checks.append(check_length)
+    if "pattern" in schema:
+        try:
+            pattern = re.compile(schema["pattern"])
+        except re.error:
+            pattern = None
+        if pattern is not None:
+            checks.append(lambda value, path: [] if not isinstance(value, str) or pattern.search(value)
+                          else [f"{path} 不匹配格式 {pattern.pattern}"])
+    return checks
+
+
+def _number_checks(schema: Dict[str, Any]) -> List[Check]:
+    bounds: List[Tuple[str, Callable[[float, float], bool], str]] = [
+        ("minimum", lambda v, b: v >= b, "不能小于"),
+        ("maximum", lambda v, b: v <= b, "不能大于"),
+        ("exclusiveMinimum", lambda v, b: v > b, "必须大于"),
+        ("exclusiveMaximum", lambda v, b: v < b, "必须小于"),
+    ]
+    checks = []
+    for keyword, predicate, message in bounds:
+        bound = schema.get(keyword)
+        if isinstance(bound, (int, float)) and not isinstance(bound, bool):
+            def check_bound(value, path, bound=bound, predicate=predicate, message=message):
+                if not _JSON_TYPES["number"](value) or predicate(value, bound):
+                    return []
+                return [f"{path} {message} {bound}"]
+
+            checks.append(check_bound)
+    return checks
+
+
+def _array_checks(schema: Dict[str, Any]) -> List[Check]:
+    checks = []
+    min_items, max_items = schema.get("minItems"), schema.get("maxItems")
+    if min_items is not None or max_items is not None:
+        def check_size(value, path):
+            if not isinstance(value, list):
+                return []
+            if min_items is not None and len(value) < min_items:
+                return [f"{path} 至少需要 {min_items} 项"]
+            if max_items is not None and len(value) > max_items:
+                return [f"{path} 最多 {max_items} 项"]
+            return []
+
+        checks.append(check_size)
+    if isinstance(schema.get("items"), dict):
+        item_check = compile_schema(schema["items"])
+
+        def check_items(value, path):
+            if not isinstance(value, list):
+                return []
+            return [e for i, item in enumerate(value) for e in item_check(item, f"{path}[{i}]")]
+
+        checks.append(check_items)
+    return checks
+
+
+def _object_checks(schema: Dict[str, Any]) -> List[Check]:
+    checks = []
+    properties = schema.get("properties") or {}
+    required = list(schema.get("required") or [])
+    additional = schema.get("additionalProperties", True)
+    if not (properties or required or additional is not True):
+        return checks
+
+    property_checks = {name: compile_schema(sub) for name, sub in properties.items()}
+    additional_check = compile_schema(additional) if isinstance(additional, dict) else None
+
+    def check_object(value, path):
+        if not isinstance(value, dict):
+            return []
+        errors = [f"缺少必填参数 {_join(path, name)}" for name in required if name not in value]
+        for key, item in value.items():
+            check = property_checks.get(key)
+            if check is not None:
+                errors.extend(check(item, _join(path, key)))
+            elif additional is False:
+                errors.append(f"不支持的参数 {_join(path, key)}")
+            elif additional_check is not None:
+                errors.extend(additional_check(item, _join(path, key)))
+        return errors
+
+    checks.append(check_object)
+    return checks
+
+
+def _join(path: str, key: str) -> str:
+    return f"{path}.{key}" if path else key
+
+
+def _type_name(value: Any) -> str:
+    for name in ("null", "boolean", "integer", "number", "string", "array", "object"):
+        if _JSON_TYPES[name](value):
+            return name
+    return type(value).__name__
+
+
+def schema_fingerprint(schema: Optional[Dict[str, Any]]) -> str:
+    """schema 内容指纹，用于区分同一工具的不同版本"""
+    raw = json.dumps(schema or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ArgumentValidator:
+    """按工具缓存已编译的校验函数，schema 变化（工具版本更新）时重新编译"""
+
+    def __init__(self):
+        # tool_name -> (schema 对象, 指纹, 校验函数)
+        self._compiled: Dict[str, Tuple[Any, str, Check]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tool_name: str, schema: Optional[Dict[str, Any]]) -> Check:
+        """获取工具的校验函数"""
+        cached = self._compiled.get(tool_name)
+        if cached and cached[0] is schema:
+            return cached[2]
+
+        fingerprint = schema_fingerprint(schema)
+        with self._lock:
+            cached = self._compiled.get(tool_name)
+            if cached and cached[1] == fingerprint:
+                check = cached[2]
+            else:
+                check = compile_schema(schema)
+            self._compiled[tool_name] = (schema, fingerprint, check)
+        return check
+
+    def validate(self, tool_name: str, schema: Optional[Dict[str, Any]], arguments: Any):
+        """校验参数，不合法时抛出 ToolArgumentError"""
+        if not isinstance(arguments, dict):
+            raise ToolArgumentError(tool_name, [f"参数应为 JSON 对象，实际为 {_type_name(arguments)}"])
+        errors = self.get(tool_name, schema)(arguments, "")
+        if errors:
+            raise ToolArgumentError(tool_name, errors)
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
@@ -0,0 +1,296 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/7 15:02
+# @Author  : afish
+# @File    : async_seek.py
+"""
+异步 OpenAI 客户端
+
+所有 AsyncOpenAIClient 共享一个后台事件循环和按配置复用的 httpx 连接池（可选 HTTP/2），
+请求在后台循环中异步发送：同步调用方（response / create_completion）只等待结果；
+异步调用方 await acreate_completion 不占用线程，aresponse 是把整轮对话放到线程池中执行的包装。
+可选的对冲请求：第一个请求超过历史 p95 延迟仍未返回时再发一个相同的请求，取先返回的结果。
+"""
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+
+from aiframework.core.seek.OpenAI.seek import OpenAIClient
+from aiframework.logger import logger
+
+# 当前请求的计时（共享连接池的事件钩子写入，按请求所在的任务隔离）
+_request_timing: contextvars.ContextVar[Optional[Dict[str, float]]] = \
+    contextvars.ContextVar("llm_request_timing", default=None)
+
+
+async def _on_request(request: httpx.Request):
+    timing = _request_timing.get()
+    if timing is not None:
+        timing["start"] = time.perf_counter()
+
+
+async def _on_response(response: httpx.Response):
+    timing = _request_timing.get()
+    if timing is not None and "start" in timing:
+        timing["ttfb"] = time.perf_counter() - timing["start"]
+
+
+class SharedHTTPPool:
+    """
+    共享的后台事件循环与 httpx 连接池
+
+    相同配置的客户端复用同一个 httpx.AsyncClient，连接（包括 TLS 握手和 HTTP/2 会话）在请求之间保持。
+    """
+    _lock = threading.Lock()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[threading.Thread] = None
+    _clients: Dict[Tuple, httpx.AsyncClient] = {}
+
+    @classmethod
+    def loop(cls) -> asyncio.AbstractEventLoop:
+        """获取（必要时启动）后台事件循环"""
+        stale = None
+        with cls._lock:
+            if cls._loop is None or not cls._thread or not cls._thread.is_alive():
+                if cls._clients:
+                    stale = (cls._loop, list(cls._clients.values()))
+                cls._loop = asyncio.new_event_loop()
+                cls._thread = threading.Thread(target=cls._run_event_loop, args=(cls._loop,),
+                                               name="llm-http-pool", daemon=True)
+                cls._thread.start()
+                cls._clients = {}
+            loop = cls._loop
+        if stale:
+            cls._close_stale(*stale)
+        return loop
+
+    @staticmethod
+    def _close_stale(loop: Optional[asyncio.AbstractEventLoop], clients: List[httpx.AsyncClient]):
+        """后台事件循环意外退出后，在原来的事件循环上关闭其中的连接池，释放连接"""
+        logger.warning(f"共享连接池的事件循环已退出，关闭 {len(clients)} 个旧的连接池")
+        if loop is None or loop.is_closed() or loop.is_running():
+            logger.warning("旧的事件循环不可用，旧连接池未能关闭，连接将在进程退出时释放")
+            return
+
+        async def close_clients():
+            await asyncio.gather(*(client.aclose() for client in clients), return_exceptions=True)
+
+        try:
+            loop.run_until_complete(asyncio.wait_for(close_clients(), timeout=5.0))
+        except Exception as e:
+            # 例如调用方线程中已有正在运行的事件循环
+            logger.warning(f"关闭旧连接池失败，连接将在进程退出时释放: {e}")
+        else:
+            loop.close()
+
+    @staticmethod
+    def _run_event_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    @classmethod
+    def run_async(cls, coro: Callable, *args, **kwargs):
+        """在后台事件循环中运行异步函数并等待结果"""
+        future = asyncio.run_coroutine_threadsafe(coro(*args, **kwargs), cls.loop())
+        return future.result()
+
+    @classmethod
+    async def arun(cls, coro: Callable, *args, **kwargs):
+        """在后台事件循环中运行异步函数，供其他事件循环 await"""
+        loop = cls.loop()
+        if asyncio.get_running_loop() is loop:
+            return await coro(*args, **kwargs)
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro(*args, **kwargs), loop))
+
+    @classmethod
+    def get_client(cls, http2: bool = True, timeout: float = 60.0, connect_timeout: float = 5.0,
+                   max_connections: int = 20, max_keepalive: int = 10,
+                   keepalive_expiry: float = 120.0) -> httpx.AsyncClient:
+        """获取指定配置的共享 httpx 客户端"""
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("未安装 h2，HTTP/2 不可用，使用 HTTP/1.1（pip install httpx[http2]）")
+                http2 = False
+        key = (http2, timeout, connect_timeout, max_connections, max_keepalive, keepalive_expiry)
+        loop = cls.loop()
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    http2=http2,
+                    # 首字节计时，与同步客户端的 TTFBProbe 钩子对应
+                    event_hooks={"request": [_on_request], "response": [_on_response]},
+                    timeout=httpx.Timeout(timeout, connect=connect_timeout),
+                    limits=httpx.Limits(max_connections=max_connections,
+                                        max_keepalive_connections=max_keepalive,
+                                        keepalive_expiry=keepalive_expiry),
+                )
+                cls._clients[key] = client
+                logger.info(f"已创建共享连接池: http2={http2}, max_connections={max_connections}, "
+                            f"timeout={timeout}s")
+        return client
+
+    @classmethod
+    def close(cls):
+        """关闭所有连接并停止后台事件循环"""
+        with cls._lock:
+            loop, clients, thread = cls._loop, list(cls._clients.values()), cls._thread
+            cls._loop, cls._thread, cls._clients = None, None, {}
+        if loop is None or not loop.is_running():
+            return
+
+        async def close_clients():
+            for client in clients:
+                await client.aclose()
+
+        asyncio.run_coroutine_threadsafe(close_clients(), loop).result(timeout=5.0)
+        loop.call_soon_threadsafe(loop.stop)
+        if thread:
+            thread.join(timeout=1.0)
+
+
+class LatencyTracker:
+    """记录最近的请求延迟，计算分位数"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """样本不足时返回 None"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        index = min(len(samples) - 1, max(0, int(round(q * (len(samples) - 1)))))
+        return samples[index]
+
+
+class AsyncOpenAIClient(OpenAIClient):
+    """
+    基于 AsyncOpenAI 和共享连接池的客户端
+
+    构造参数（可通过 LLM_OPTIONS 配置）：
+        http2: 是否启用 HTTP/2
+        timeout / connect_timeout: 读取与连接超时（秒）
+        max_connections / max_keepalive / keepalive_expiry: 连接池参数
+        hedge: 是否启用对冲请求
+        hedge_delay: 固定的对冲延迟（秒），为空时使用历史延迟的 hedge_percentile 分位数
+        hedge_percentile: 对冲延迟分位数，默认 0.95
+    """
+
+    def __init__(self, system_prompt: str, MessageManager, *args, **kwargs):
+        super().__init__(system_prompt, MessageManager, *args, **kwargs)
+        self.http_options = {
+            "http2": kwargs.get('http2', True),
+            "timeout": kwargs.get('timeout', 60.0),
+            "connect_timeout": kwargs.get('connect_timeout', 5.0),
+            "max_connections": kwargs.get('max_connections', 20),
+            "max_keepalive": kwargs.get('max_keepalive', 10),
+            "keepalive_expiry": kwargs.get('keepalive_expiry', 120.0),
+        }
+        self.hedge = kwargs.get('hedge', False)
+        self.hedge_delay: Optional[float] = kwargs.get('hedge_delay')
+        self.hedge_percentile = kwargs.get('hedge_percentile', 0.95)
+        self.latency = LatencyTracker()
+        self.hedge_stats = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+
+    def create_client(self, api_key: str, baseurl: str, **kwargs):
+        """创建使用共享连接池的 AsyncOpenAI 客户端"""
+        kwargs.setdefault("http_client", SharedHTTPPool.get_client(**self.http_options))
+        return AsyncOpenAI(
+            api_key=api_key,
+            base_url=baseurl,
+            **kwargs
+        )
+
+    def create_completion(self, api_params: dict) -> ChatCompletion:
+        """在共享事件循环中发送请求，调用线程只等待结果"""
+        completion, ttfb = SharedHTTPPool.run_async(self._create_completion, api_params)
+        self.ttfb.record(ttfb)
+        return completion
+
+    async def acreate_completion(self, api_params: dict) -> ChatCompletion:
+        """异步发送请求，可在任意事件循环中 await（请求本身在共享事件循环中发送）"""
+        completion, ttfb = await SharedHTTPPool.arun(self._create_completion, api_params)
+        self.ttfb.record(ttfb)
+        return completion
+
+    async def aresponse(self, user_prompt: str):
+        """
+        response 的异步版本
+
+        只有接口请求（传输层）是异步的：工具调用和消息处理仍是同步的，一轮对话整体放到线程池中执行，
+        期间占用一个工作线程（等待请求时阻塞在 run_coroutine_threadsafe 上），调用方的事件循环不被阻塞。
+        不需要工具循环时直接 await acreate_completion，不占用线程。
+        """
+        await asyncio.to_thread(self.response, user_prompt)
+
+    async def _create_completion(self, api_params: dict) -> Tuple[ChatCompletion, Optional[float]]:
+        """发送请求，返回 (响应, 首字节时间)（连接池绑定在共享事件循环上，需在该循环中运行）"""
+        self.hedge_stats["requests"] += 1
+        delay = self._current_hedge_delay()
+        if delay is None:
+            return await self._timed_create(api_params)
+
+        first = asyncio.ensure_future(self._timed_create(api_params))
+        done, _ = await asyncio.wait({first}, timeout=delay)
+        if done:
+            return first.result()
+
+        # 第一个请求超过对冲延迟仍未返回，再发一个请求，取先成功的结果
+        logger.debug(f"请求超过 {delay:.2f}s 未返回，发送对冲请求")
+        self.hedge_stats["hedged"] += 1
+        second = asyncio.ensure_future(self._timed_create(api_params))
+        pending = {first, second}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.hedge_stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _timed_create(self, api_params: dict) -> Tuple[ChatCompletion, Optional[float]]:
+        timing: Dict[str, float] = {}
+        token = _request_timing.set(timing)
+        try:
+            start = time.perf_counter()
+            completion = await self.client.chat.completions.create(**api_params)
+            self.latency.record(time.perf_counter() - start)
+        finally:
+            _request_timing.reset(token)
+        return completion, timing.get("ttfb")
+
+    def _current_hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        if self.hedge_delay is not None:
+            return self.hedge_delay
+        return self.latency.percentile(self.hedge_percentile)
+
+    def hedge_report(self) -> Dict[str, Any]:
+        """对冲请求统计"""
+        return {**self.hedge_stats, "p95": self.latency.percentile(0.95)}
+
@@ -0,0 +1,179 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/8 20:31
+# @Author  : afish
+# @File    : fake_server.py
+"""
+本地模拟的 OpenAI 兼容接口
+
+只实现 POST /v1/chat/completions（非流式），可配置延迟、生成速度和错误率，
+用于在没有真实服务的情况下测试路由、回退和级联等逻辑。
+"""
+import asyncio
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiframework.logger import logger
+from aiframework.utils.http import HTTPError, HTTPRequest, read_request, write_json
+
+
+class FakeOpenAIServer:
+    """
+    :param model: 返回的模型名称（为空时使用请求中的模型）
+    :param latency: 首字延迟（秒）
+    :param tokens_per_second: 模拟的生成速度，为 0 时不计算生成时间
+    :param failure_rate: 返回错误的概率
+    :param failure_status: 返回错误时的状态码
+    :param reply: 固定回复，为空时回显最后一条用户消息
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, model: Optional[str] = None,
+                 latency: float = 0.05, tokens_per_second: float = 0, failure_rate: float = 0.0,
+                 failure_status: int = 500, reply: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.model = model
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.reply = reply
+        self.requests = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self):
+        """在当前事件循环中启动服务"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"模拟 OpenAI 服务已启动: {self.url}")
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            # 关闭保持中的连接
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self) -> "FakeOpenAIServer":
+        """在后台线程中启动服务，返回时已可接收请求"""
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start())
+            ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self.close())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="fake-openai", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """停止后台线程中的服务"""
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start_in_thread()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await write_json(writer, e.status, {"error": {"message": str(e)}}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                await self._dispatch(request, writer)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _dispatch(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        if request.method != "POST" or not request.path.endswith("/chat/completions"):
+            await write_json(writer, 404, {"error": {"message": "Not found"}}, keep_alive=request.keep_alive)
+            return
+        try:
+            body = request.json()
+        except ValueError:
+            await write_json(writer, 400, {"error": {"message": "Invalid JSON"}}, keep_alive=request.keep_alive)
+            return
+
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            await write_json(writer, self.failure_status, {"error": {"message": "Simulated failure"}},
+                             keep_alive=request.keep_alive)
+            return
+
+        content = self.reply if self.reply is not None else self._last_user_message(body.get("messages") or [])
+        completion_tokens = max(1, len(content) // 4)
+        if self.tokens_per_second:
+            await asyncio.sleep(completion_tokens / self.tokens_per_second)
+        await write_json(writer, 200, self._completion(body, content, completion_tokens),
+                         keep_alive=request.keep_alive)
+
+    @staticmethod
+    def _last_user_message(messages: List[Dict[str, Any]]) -> str:
+        for message in reversed(messages):
+            if message.get("role") == "user" and isinstance(message.get("content"), str):
+                return message["content"]
+        return ""
+
+    def _completion(self, body: Dict[str, Any], content: str, completion_tokens: int) -> Dict[str, Any]:
+        prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages") or []) // 4
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.model or body.get("model") or "fake",
+            "choices": [{
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
@@ -0,0 +1,185 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/8 19:05
+# @Author  : afish
+# @File    : router.py
+"""
+多服务商路由
+
+把请求分发到多个 OpenAI 兼容的接口/模型：支持平滑加权轮询和最低延迟（EWMA）两种策略，
+出错或超时时切换到下一个服务商，失败的服务商在冷却时间内不再被选择；
+同时统计每个服务商的延迟和生成速度（tokens/s）。
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import openai
+from openai import OpenAI
+from openai.types.chat import ChatCompletion
+
+from aiframework.core.seek.OpenAI.seek import OpenAIClient
+from aiframework.logger import logger
+
+# 可以切换到其他服务商重试的错误
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,  # 包括 APITimeoutError
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+@dataclass
+class Provider:
+    """一个 OpenAI 兼容的服务商（接口 + 模型）"""
+    name: str
+    base_url: str
+    model: str
+    api_key: str = ""
+    weight: int = 1
+    timeout: Optional[float] = None
+    client: Any = field(default=None, repr=False)
+
+    # 运行状态
+    current_weight: int = 0
+    ewma_latency: Optional[float] = None
+    cooldown_until: float = 0.0
+    requests: int = 0
+    failures: int = 0
+    completion_tokens: int = 0
+    busy_seconds: float = 0.0
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        return self.completion_tokens / self.busy_seconds if self.busy_seconds else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ewma_latency": self.ewma_latency,
+            "tokens_per_second": self.tokens_per_second,
+            "cooling_down": not self.available,
+        }
+
+
+class RouterOpenAIClient(OpenAIClient):
+    """
+    在多个服务商之间路由请求
+
+    构造参数（可通过 LLM_OPTIONS 配置）：
+        providers: 服务商列表，每项包含 name/base_url/model/weight/timeout，
+                   以及 api_key 或 api_key_env（为空时使用 set 传入的 API_KEY）
+        routing: 'weighted'（平滑加权轮询）或 'latency'（最低 EWMA 延迟）
+        cooldown: 服务商出错后的冷却时间（秒）
+        ewma_alpha: 延迟平滑系数
+    未配置 providers 时退化为 set 传入的单个接口。
+    """
+
+    def __init__(self, system_prompt: str, MessageManager, *args, **kwargs):
+        super().__init__(system_prompt, MessageManager, *args, **kwargs)
+        self.provider_configs: List[Dict[str, Any]] = list(kwargs.get('providers') or [])
+        self.routing = kwargs.get('routing', 'weighted')
+        self.cooldown = kwargs.get('cooldown', 30.0)
+        self.ewma_alpha = kwargs.get('ewma_alpha', 0.3)
+        self.providers: List[Provider] = []
+        self._lock = threading.Lock()
+
+    def create_client(self, api_key: str, baseurl: str, **kwargs):
+        """为每个服务商创建客户端，self.client 为第一个服务商的客户端"""
+        configs = self.provider_configs or [{"name": "default", "base_url": baseurl, "model": self.model}]
+        # 失败时直接切换服务商，不在同一个服务商上重试
+        kwargs.setdefault('max_retries', 0)
+        self.apply_ttfb_hooks(kwargs)
+        self.providers = []
+        for index, config in enumerate(configs):
+            key = config.get('api_key') or os.getenv(config.get('api_key_env') or '', '') or api_key
+            provider = Provider(
+                name=config.get('name') or f"provider-{index}",
+                base_url=config.get('base_url') or baseurl,
+                model=config.get('model') or self.model,
+                api_key=key,
+                weight=max(1, int(config.get('weight', 1))),
+                timeout=config.get('timeout'),
+            )
+            provider.client = OpenAI(api_key=key, base_url=provider.base_url, **kwargs)
+            self.providers.append(provider)
+        logger.info(f"已配置 {len(self.providers)} 个服务商，路由策略: {self.routing}: "
+                    f"{[(p.name, p.model) for p in self.providers]}")
+        return self.providers[0].client
+
+    def _candidates(self) -> List[Provider]:
+        """按路由策略排列本次请求尝试的服务商，冷却中的服务商排在最后"""
+        with self._lock:
+            available = [p for p in self.providers if p.available]
+            cooling = sorted((p for p in self.providers if not p.available), key=lambda p: p.cooldown_until)
+            if not available:
+                return cooling
+            if self.routing == 'latency':
+                # 没有延迟数据的服务商优先，以便采集
+                ordered = sorted(available, key=lambda p: -1.0 if p.ewma_latency is None else p.ewma_latency)
+            else:
+                # 平滑加权轮询（nginx 算法）
+                total = sum(p.weight for p in available)
+                for p in available:
+                    p.current_weight += p.weight
+                chosen = max(available, key=lambda p: p.current_weight)
+                chosen.current_weight -= total
+                ordered = [chosen] + sorted((p for p in available if p is not chosen),
+                                            key=lambda p: p.current_weight, reverse=True)
+            return ordered + cooling
+
+    def create_completion(self, api_params: dict) -> ChatCompletion:
+        """
+        依次尝试服务商，可重试的错误切换到下一个
+
+        请求的模型为客户端的默认模型时换成各服务商配置的模型；调用方指定了其他模型（如级联中便宜的层级）时保留
+        """
+        last_error: Optional[Exception] = None
+        requested = api_params.get("model")
+        for provider in self._candidates():
+            model = provider.model if requested in (None, self.model) else requested
+            params = {**api_params, "model": model}
+            if provider.timeout is not None:
+                params["timeout"] = provider.timeout
+            start = time.perf_counter()
+            try:
+                completion = provider.client.chat.completions.create(**params)
+            except RETRYABLE_ERRORS as e:
+                self._record_failure(provider, e)
+                last_error = e
+                continue
+            self._record_success(provider, time.perf_counter() - start, completion)
+            return completion
+        raise last_error or RuntimeError("没有可用的服务商")
+
+    def _record_success(self, provider: Provider, elapsed: float, completion: ChatCompletion):
+        usage = getattr(completion, 'usage', None)
+        with self._lock:
+            provider.requests += 1
+            provider.cooldown_until = 0.0
+            provider.ewma_latency = elapsed if provider.ewma_latency is None else \
+                self.ewma_alpha * elapsed + (1 - self.ewma_alpha) * provider.ewma_latency
+            if usage is not None and usage.completion_tokens:
+                provider.completion_tokens += usage.completion_tokens
+                provider.busy_seconds += elapsed
+        logger.debug(f"服务商 {provider.name} 请求成功，耗时 {elapsed:.2f}s")
+
+    def _record_failure(self, provider: Provider, error: Exception):
+        with self._lock:
+            provider.requests += 1
+            provider.failures += 1
+            provider.cooldown_until = time.monotonic() + self.cooldown
+        logger.warning(f"服务商 {provider.name} 请求失败，{self.cooldown}s 内不再使用: {error}")
+
+    def provider_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各服务商的统计信息"""
+        with self._lock:
+            return {p.name: p.stats() for p in self.providers}
@@ -3,16 +3,35 @@
 # @Time    : 2025/6/16 16:16
 # @Author  : afish
 # @File    : seek.py
+import copy
 import json
-from typing import Optional
+import time
+import uuid
+from contextlib import nullcontext
+from typing import List, Optional, Set, Tuple, Union
 
+import openai
 from openai import OpenAI
 from openai.types.chat import ChatCompletion, ChatCompletionMessage
 
+from aiframework.backend.blob_store import FETCH_BLOB_DESCRIPTION, FETCH_BLOB_SCHEMA, FileBlobStore, fetch_blob
+from aiframework.backend.history_factory import HistoryBackendFactory
 from aiframework.core.mcp.client import MCPClientManager
+from aiframework.core.mcp.registry import ToolRegistry
+from aiframework.core.mcp.retrieval import ToolRetriever
+from aiframework.core.mcp.schema import limit_tools
+from aiframework.core.mcp.validator import ArgumentValidator, ToolArgumentError
+from aiframework.core.seek.cache import ResponseCache, CachedResponse, context_key
+from aiframework.core.seek.cascade import ModelCascade
+from aiframework.core.seek.prompt import PromptAssembler
+from aiframework.core.seek.usage import TTFBProbe, TurnMetrics
 from aiframework.core.seek.seek import LLMClientBase
+from aiframework.core.seek.tool_result import ToolResultProcessor
 from aiframework.logger import logger
 from aiframework.message.MessageABC import MessageManagerBase
+from aiframework.message.compaction import ConversationCompactor
+from aiframework.message.session import MessageSession, SessionMessageStore
+from aiframework.utils.metrics import metrics
 
 
 class OpenAIClient(LLMClientBase):
@@ -21,15 +40,82 @@ class OpenAIClient(LLMClientBase):
         self.model = None
         self.system_info = None
         self.completion = None
-        self.mcp: Optional[MCPClientManager] = None
+        self.mcp: Optional[Union[ToolRegistry, MCPClientManager]] = None
         self.client = None
+        self.validator = ArgumentValidator()
+        # 工具定义在每次请求中允许占用的最大 token 数（None 表示不限制）
+        self.tool_token_budget: Optional[int] = kwargs.get('tool_token_budget')
+        # 按相关性挑选工具（tool_top_k 为空时每次携带全部工具）
+        tool_top_k = kwargs.get('tool_top_k')
+        self.retriever = ToolRetriever(
+            top_k=tool_top_k,
+            context_messages=kwargs.get('tool_context_messages', 4),
+            always_include=kwargs.get('tool_always_include', ()),
+        ) if tool_top_k else None
+        self._offered_tools: Optional[Set[str]] = None  # 最近一次请求携带的工具
+        self._full_catalog = False  # 本轮是否已回退到完整工具目录
+        # 响应缓存（response_cache_size 为空或 0 时不启用）
+        cache_size = kwargs.get('response_cache_size')
+        self.response_cache = ResponseCache(
+            max_entries=cache_size,
+            ttl=kwargs.get('response_cache_ttl', 3600),
+            similarity_threshold=kwargs.get('response_cache_similarity'),
+        ) if cache_size else None
+
+        # 模型级联：先用 cascade_models 中便宜的模型回答，必要时升级到 self.model
+        self.cascade_options = {
+            "models": list(kwargs.get('cascade_models') or []),
+            "logprob_threshold": kwargs.get('cascade_logprob_threshold'),
+            "prices": kwargs.get('cascade_prices'),
+            "defer_hint": kwargs.get('cascade_defer_hint', True),
+        }
+        self.cascade: Optional[ModelCascade] = None
+        # 被移出上下文的大块内容（截断的工具输出、图片、被压缩的历史）保存在 blob 存储中，
+        # 设置了 blob_path 或启用了历史压缩时创建
+        compaction_max_chars = kwargs.get('compaction_max_chars')
+        self.blob_store = FileBlobStore(kwargs.get('blob_path') or 'blobs') \
+            if kwargs.get('blob_path') or compaction_max_chars else None
+        # 工具结果后处理：限制单个结果和每轮工具输出的长度
+        self.tool_results = ToolResultProcessor(
+            self.blob_store,
+            max_chars=kwargs.get('tool_result_max_chars', 20000),
+            turn_budget=kwargs.get('tool_result_turn_budget', 60000),
+        )
+        # 对话历史压缩：消息总长度超过 compaction_max_chars 后，旧的工具输出移到 blob 存储中（为空时不压缩）
+        self.compactor = ConversationCompactor(
+            self.blob_store,
+            max_chars=compaction_max_chars,
+            keep_recent=kwargs.get('compaction_keep_recent', 6),
+        ) if compaction_max_chars else None
+        # 每轮对话的 token 用量与延迟统计
+        self.ttfb = TTFBProbe()
+        self.turn: Optional[TurnMetrics] = None
+        self.last_turn: Optional[TurnMetrics] = None
+        if kwargs.get('metrics_port'):
+            metrics.start_http_server(kwargs.get('metrics_host', '127.0.0.1'), kwargs['metrics_port'])
+        if kwargs.get('metrics_file'):
+            metrics.start_file_exporter(kwargs['metrics_file'], kwargs.get('metrics_interval', 15.0))
 
         self.message_manager = MessageManager
+        # 对话历史持久化（history_backend 为空时只保存在内存中）
+        self.history_backend = HistoryBackendFactory.get_backend(
+            kwargs['history_backend'], kwargs.get('history_path', 'history')
+        ) if kwargs.get('history_backend') else None
+        if self.history_backend is not None and hasattr(self.message_manager, 'attach_store'):
+            self.message_manager.attach_store(self.history_backend, kwargs.get('history_session', 'default'))
+        # 多会话：with_session 按会话 ID 创建绑定到独立消息历史的客户端
+        self.session_options = {
+            "max_resident": kwargs.get('session_max_resident', 256),
+            "max_memory": int(kwargs.get('session_max_memory_mb', 256) * 1024 * 1024),
+            "idle_timeout": kwargs.get('session_idle_timeout'),
+        }
+        self.session_store: Optional[SessionMessageStore] = kwargs.get('session_store')
         self.system_prompt = system_prompt
+        self.prompt = PromptAssembler(system_prompt)
 
 
 
-    def set(self, api_key: str, baseurl: str, mcp: MCPClientManager, model="qwen-plus-2025-09-11", *args, **kwargs):
+    def set(self, api_key: str, baseurl: str, mcp: Union[ToolRegistry, MCPClientManager], model="qwen-plus-2025-09-11", *args, **kwargs):
         # TODO: 目前set函数结构设置不清晰，如果有新参数，添加不方便，待修复
         # 设置默认的DashScope API URL
         self.model = model
@@ -40,47 +126,143 @@ class OpenAIClient(LLMClientBase):
         if baseurl and not baseurl.startswith(('http://', 'https://')):
             baseurl = f"https://{baseurl}"
 
-        self.client = OpenAI(
+        self.client = self.create_client(api_key, baseurl, **kwargs)
+        self.mcp = mcp
+        if self.blob_store is not None:
+            self.register_blob_tool()
+        if self.cascade_options["models"]:
+            options = dict(self.cascade_options)
+            self.cascade = ModelCascade([*options.pop("models"), self.model], **options)
+            logger.info(f"已启用模型级联: {self.cascade.models}")
+        self.set_system_message()
+
+    def create_client(self, api_key: str, baseurl: str, **kwargs):
+        """创建接口客户端，子类可替换为异步客户端等实现"""
+        self.apply_ttfb_hooks(kwargs)
+        return OpenAI(
             api_key=api_key,
             base_url=baseurl,
             **kwargs
         )
-        self.mcp = mcp
-        self.set_system_message()
+
+    def apply_ttfb_hooks(self, kwargs: dict):
+        """未指定 http_client 时使用带首字节计时钩子的默认 httpx 客户端"""
+        http_client_cls = getattr(openai, 'DefaultHttpxClient', None)
+        if http_client_cls is not None and 'http_client' not in kwargs:
+            kwargs['http_client'] = http_client_cls(event_hooks=self.ttfb.event_hooks())
+
+    def register_blob_tool(self):
+        """注册 fetch_blob 工具，供模型取回被移出上下文的内容"""
+        if not hasattr(self.mcp, 'add_builtin_tool'):
+            logger.warning("工具注册表不支持内置工具，模型将无法取回被移出上下文的内容")
+            return
+        self.mcp.add_builtin_tool(
+            "fetch_blob",
+            lambda arguments: fetch_blob(self.blob_store, arguments),
+            FETCH_BLOB_DESCRIPTION,
+            FETCH_BLOB_SCHEMA
+        )
 
     def set_system_message(self):
-        system_message = f"""
-        你可以使用的工具有：{self.mcp.tool_list() if self.mcp.tool_list() else "无可用工具"}
-        当前系统信息:{self.system_info}
+        # 系统消息只包含稳定内容，系统信息在每次请求时附加到末尾，保证提示词前缀可被缓存
+        # 恢复的会话中已有系统消息时替换，而不是重复添加
+        self.message_manager.set_system_message(self.prompt.system_message(self.mcp.tool_list()))
+
+    def with_session(self, session: Union[str, MessageSession]) -> "OpenAIClient":
+        """
+        返回绑定到指定会话的客户端
+
+        新客户端与当前客户端共享接口连接、工具、缓存和级联配置，只有消息历史和每轮的状态是独立的，
+        不同会话可以在多个线程中同时调用 response。同一会话的多轮对话按顺序处理。
+        响应缓存的键包含会话 ID，一个会话的回答不会被另一个会话命中。
         """
-        self.message_manager.add_system_message(system_message)
+        store = self.sessions
+        if isinstance(session, str):
+            session = store.get(session)
+        client = copy.copy(self)
+        client.message_manager = session
+        client.prompt = self.prompt.for_session()
+        client.completion = None
+        client.turn = None
+        client.last_turn = None
+        client._offered_tools = None
+        client._full_catalog = False
+        if self.mcp is not None:
+            client.set_system_message()
+        return client
+
+    @property
+    def sessions(self) -> SessionMessageStore:
+        """会话存储，第一次使用时创建"""
+        if self.session_store is None:
+            self.session_store = SessionMessageStore(self.history_backend, **self.session_options)
+        return self.session_store
 
     def get_response(self) -> ChatCompletion:
         """获取返回结果"""
+        api_params = self.build_api_params()
+        logger.payload("调用API参数", api_params)
+
+        try:
+            if self.cascade is not None:
+                completion = self.cascade.run(api_params, self._recorded_completion, self._tool_call_error)
+            else:
+                completion = self._recorded_completion(api_params)
+            self.completion = completion
+            logger.payload("API调用成功，响应", completion)
+            if getattr(completion, 'usage', None) is not None:
+                self.prompt.record_usage(completion.usage)
+            return completion
+        except Exception as e:
+            logger.error(f"API调用失败: {e}")
+            raise
+
+    def build_api_params(self) -> dict:
+        """组装本次请求的接口参数"""
         # 获取工具列表
-        tool_list = self.mcp.to_json()
+        tool_list = self.select_tools()
+        messages, tool_list = self.prompt.assemble(self.message_manager.messages, tool_list)
 
         # 准备API调用参数
         api_params = {
             "model": self.model,
-            "messages": self.message_manager.messages,
+            "messages": messages,
             "parallel_tool_calls": True,
         }
 
         # 只有当有工具时才添加tools参数
         if tool_list:
             api_params["tools"] = tool_list
+        return api_params
 
-        logger.info(f"调用API参数: {api_params}")
+    def create_completion(self, api_params: dict) -> ChatCompletion:
+        """发送请求"""
+        return self.client.chat.completions.create(**api_params)
 
-        try:
-            completion = self.client.chat.completions.create(**api_params)
-            self.completion = completion
-            logger.info(f"API调用成功，响应: {completion}")
-            return completion
-        except Exception as e:
-            logger.error(f"API调用失败: {e}")
-            raise
+    def _recorded_completion(self, api_params: dict) -> ChatCompletion:
+        """发送请求并计入本轮统计（级联时每个层级的请求都单独计入）"""
+        self.ttfb.reset()
+        start = time.perf_counter()
+        completion = self.create_completion(api_params)
+        if self.turn is not None:
+            self.turn.record_request(time.perf_counter() - start, getattr(completion, 'usage', None),
+                                     self.ttfb.last)
+        return completion
+
+    def select_tools(self) -> list:
+        """挑选本次请求携带的工具定义"""
+        tool_list = self.mcp.to_json()
+        if self.retriever and not self._full_catalog:
+            tool_list = self.retriever.select(tool_list, self.message_manager.messages)
+        tool_list = limit_tools(tool_list, self.tool_token_budget)
+        self._offered_tools = {tool["function"]["name"] for tool in tool_list}
+        return tool_list
+
+    def _missing_tools(self, msg) -> Set[str]:
+        """模型请求了未携带的工具时返回这些工具名"""
+        if self._full_catalog or self._offered_tools is None or not getattr(msg, 'tool_calls', None):
+            return set()
+        return {call.function.name for call in msg.tool_calls} - self._offered_tools
 
     def get_function(self) -> dict or None:
         """获取函数"""
@@ -95,24 +277,110 @@ class OpenAIClient(LLMClientBase):
         """获取参数"""
         return json.loads(function.function.arguments) if function else None
 
+    def parse_tool_arguments(self, tool_call) -> dict:
+        """解析并在本地校验工具参数，不合法时抛出 ToolArgumentError"""
+        function_name = tool_call.function.name
+        try:
+            arguments = json.loads(tool_call.function.arguments or "{}")
+        except json.JSONDecodeError as e:
+            raise ToolArgumentError(function_name, [f"参数不是合法的 JSON: {e}"])
+        schema = self.mcp.get_input_schema(function_name)
+        if schema is None:
+            raise ToolArgumentError(function_name, ["工具不存在"])
+        self.validator.validate(function_name, schema, arguments)
+        return arguments
+
+    def _tool_call_error(self, msg) -> Optional[str]:
+        """检查消息中的工具调用是否合法，返回第一个错误"""
+        for tool_call in msg.tool_calls:
+            try:
+                self.parse_tool_arguments(tool_call)
+            except ToolArgumentError as e:
+                return str(e)
+        return None
+
     def get_message(self) -> ChatCompletionMessage:
         """获取消息"""
         self.get_response()
         return self.completion.choices[0].message
 
+    def _cache_context(self) -> str:
+        """当前系统提示词、工具目录和会话对应的缓存上下文（缓存由各会话共享，按会话隔离）"""
+        return context_key(self.system_prompt, self.mcp.to_json() if self.mcp else None,
+                           getattr(self.message_manager, 'session_id', None))
+
+    @staticmethod
+    def _replay_message(cached: CachedResponse) -> ChatCompletionMessage:
+        """由缓存的工具调用计划构造一条助手消息，交给工具循环执行"""
+        return ChatCompletionMessage(
+            role="assistant",
+            content=None,
+            tool_calls=[
+                {
+                    "id": f"call_cache_{uuid.uuid4().hex[:16]}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": arguments},
+                }
+                for name, arguments in cached.tool_plan
+            ],
+        )
+
     def response(self, user_prompt: str):
-        """处理用户输入并确保消息流完整"""
-        # 1. 添加用户消息
-        self.message_manager.add_user_message(user_prompt)
+        """处理用户输入并确保消息流完整，同时记录本轮的 token 用量与延迟"""
+        self.turn = TurnMetrics(model=self.model)
+        # 会话消息在一轮对话期间加锁，避免同一会话的两轮对话交错
+        session_lock = getattr(self.message_manager, 'lock', None)
+        try:
+            with session_lock if session_lock is not None else nullcontext():
+                self._response(user_prompt)
+        finally:
+            self.last_turn = self.turn.finish()
+            self.turn = None
+            logger.debug(f"本轮统计: {self.last_turn.to_dict()}")
+
+    def _response(self, user_prompt: str):
+        # 1. 添加用户消息（系统信息在写入历史时附加，之后每轮按相同内容重发，保证历史前缀可被缓存）
+        self.message_manager.add_user_message(
+            self.prompt.user_content(user_prompt, str(self.system_info) if self.system_info else None)
+        )
         # logger.info(f"用户输入后的消息历史: {self.message_manager.messages}")
+        self._full_catalog = False
+        self._offered_tools = None
 
-        # 2. 获取AI初始响应
-        msg = self.get_message()
+        # 2. 查找响应缓存
+        cache_context = self._cache_context() if self.response_cache is not None else None
+        cached = self.response_cache.get(user_prompt, cache_context) if self.response_cache is not None else None
+        if cached:
+            self.turn.cache_hit = True
+        if cached and not cached.uses_tools:
+            self.message_manager.add_assistant_message(cached.content)
+            logger.info(f"命中响应缓存，AI响应: {cached.content}")
+            return
+
+        # 3. 获取AI初始响应（缓存了工具调用计划时直接重放，省去规划请求）
+        if cached:
+            logger.info(f"命中响应缓存，重放工具调用计划: {[name for name, _ in cached.tool_plan]}")
+            msg = self._replay_message(cached)
+        else:
+            msg = self.get_message()
         if not msg:
             return
 
-        # 3. 处理工具调用（如果有）
+        tool_plan: List[Tuple[str, str]] = []  # 第一轮工具调用，用于写入缓存
+        budget = self.tool_results.new_budget()  # 本轮工具输出的字符预算
+        cacheable = cached is None
+        first_round = True
+
+        # 4. 处理工具调用（如果有）
         while hasattr(msg, 'tool_calls') and msg.tool_calls:
+            missing = self._missing_tools(msg)
+            if missing:
+                # 模型请求了被筛掉的工具，携带完整工具目录重新请求
+                logger.info(f"模型请求了未携带的工具 {missing}，使用完整工具目录重新请求")
+                self._full_catalog = True
+                msg = self.get_message()
+                continue
+
             # 记录工具请求（不重复添加）
             if not any(m.get('tool_call_id') == msg.tool_calls[0].id
                        for m in self.message_manager.messages):
@@ -122,24 +390,39 @@ class OpenAIClient(LLMClientBase):
             for tool_call in msg.tool_calls:
                 function_name = tool_call.function.name
                 logger.info(str(tool_call.function.arguments))
-                arguments = json.loads(tool_call.function.arguments)
 
-                # 执行工具
+                # 执行工具（参数不合法时直接把错误返回给模型，不请求服务端）
                 try:
+                    arguments = self.parse_tool_arguments(tool_call)
                     result = self.mcp.call_tool(function_name, **arguments)
+                    if first_round:
+                        tool_plan.append((function_name, tool_call.function.arguments or "{}"))
+                except ToolArgumentError as e:
+                    result = f"{e}，请修正参数后重试"
+                    logger.warning(result)
+                    cacheable = False
                 except Exception as e:
                     result = f"执行工具时出错: {str(e)}"
                     logger.error(result)
+                    cacheable = False
                 # 添加工具执行结果到消息历史
                 self.message_manager.add_tool_message(
-                    content=str(result),
+                    content=self.tool_results.process(result, budget),
                     tool_call_id=tool_call.id
                 )
+            first_round = False
+            self.turn.tool_rounds += 1
 
             # 获取下一个响应（基于工具执行结果）
             msg = self.get_message()
 
-        # 4. 添加最终响应到消息历史
+        # 5. 添加最终响应到消息历史
         if msg and (not hasattr(msg, 'tool_calls') or not msg.tool_calls):
             self.message_manager.add_assistant_message(msg)
             logger.info(f"AI响应: {msg.content}")
+            if self.response_cache is not None and cacheable and msg.content:
+                self.response_cache.put(user_prompt, cache_context, msg.content, tool_plan)
+
+        # 6. 在后台压缩过长的历史，不阻塞本轮响应
+        if self.compactor is not None:
+            self.compactor.submit(self.message_manager)
@@ -0,0 +1,163 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/5 16:40
+# @Author  : afish
+# @File    : cache.py
+"""
+响应缓存
+
+语音场景下用户经常重复同样的指令，缓存以规范化后的用户文本、系统提示词和工具目录的哈希为键：
+不需要工具的回答直接返回；需要工具的回答记录工具调用计划，命中时重放工具调用，省去模型规划的一轮请求。
+可选的相似度匹配使用本地的字词向量索引（与工具检索相同的切分方式），不依赖外部模型。
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiframework.core.mcp.retrieval import tokenize
+from aiframework.logger import logger
+
+_PUNCTUATION = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def normalize_text(text: str) -> str:
+    """规范化用户文本：全角转半角、小写、去掉标点和多余空白"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return _PUNCTUATION.sub(" ", text).strip()
+
+
+def context_key(system_prompt: Optional[str], tools: Optional[List[Dict[str, Any]]],
+                scope: Optional[str] = None) -> str:
+    """
+    系统提示词与工具目录的哈希，任一变化都会使已有缓存失效
+
+    scope 为缓存的作用域（如会话 ID），不同作用域的缓存互不命中
+    """
+    digest = hashlib.sha1()
+    digest.update((system_prompt or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(json.dumps(tools or [], sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    if scope is not None:
+        digest.update(b"\0")
+        digest.update(scope.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _vectorize(text: str) -> Dict[str, float]:
+    counts = Counter(tokenize(text))
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    return {term: c / norm for term, c in counts.items()} if norm else {}
+
+
+@dataclass
+class CachedResponse:
+    """缓存的回答"""
+    text: str  # 规范化后的用户文本
+    context: str
+    content: Optional[str]
+    # 工具调用计划：[(工具名, 参数 JSON 字符串), ...]，为空表示不需要工具
+    tool_plan: List[Tuple[str, str]] = field(default_factory=list)
+    created_at: float = field(default_factory=time.monotonic)
+    hits: int = 0
+    vector: Dict[str, float] = field(default_factory=dict, repr=False)
+
+    @property
+    def uses_tools(self) -> bool:
+        return bool(self.tool_plan)
+
+
+class ResponseCache:
+    """
+    带 TTL 和容量上限（LRU 淘汰）的响应缓存
+
+    :param max_entries: 最大缓存条数
+    :param ttl: 过期时间（秒），None 表示不过期
+    :param similarity_threshold: 相似度匹配阈值（0~1），None 表示只做精确匹配
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = 3600,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple[str, str], CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expired(self, entry: CachedResponse, now: float) -> bool:
+        return self.ttl is not None and now - entry.created_at > self.ttl
+
+    def get(self, user_text: str, context: str) -> Optional[CachedResponse]:
+        """查找缓存，精确匹配优先，其次为相似度最高且超过阈值的条目"""
+        text = normalize_text(user_text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((context, text))
+            if entry is not None and self._expired(entry, now):
+                del self._entries[(context, text)]
+                entry = None
+            if entry is not None:
+                self.stats["hits"] += 1
+            elif self.similarity_threshold is not None:
+                entry = self._most_similar(text, context, now)
+                if entry is not None:
+                    self.stats["similar_hits"] += 1
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end((entry.context, entry.text))
+            entry.hits += 1
+            return entry
+
+    def _most_similar(self, text: str, context: str, now: float) -> Optional[CachedResponse]:
+        vector = _vectorize(text)
+        if not vector:
+            return None
+        best, best_score = None, self.similarity_threshold
+        for key, entry in list(self._entries.items()):
+            if self._expired(entry, now):
+                del self._entries[key]
+                continue
+            if entry.context != context:
+                continue
+            score = sum(w * entry.vector.get(term, 0.0) for term, w in vector.items())
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is not None:
+            logger.debug(f"相似缓存命中: {text!r} ≈ {best.text!r} ({best_score:.2f})")
+        return best
+
+    def put(self, user_text: str, context: str, content: Optional[str],
+            tool_plan: Optional[List[Tuple[str, str]]] = None) -> Optional[CachedResponse]:
+        """写入缓存"""
+        text = normalize_text(user_text)
+        if not text or self.max_entries <= 0:
+            return None
+        entry = CachedResponse(text=text, context=context, content=content, tool_plan=list(tool_plan or []),
+                               vector=_vectorize(text) if self.similarity_threshold is not None else {})
+        with self._lock:
+            self._entries[(context, text)] = entry
+            self._entries.move_to_end((context, text))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return entry
+
+    def invalidate(self, user_text: str, context: str):
+        """删除指定缓存"""
+        with self._lock:
+            self._entries.pop((context, normalize_text(user_text)), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
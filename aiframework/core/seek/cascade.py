@@ -0,0 +1,182 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/9 17:48
+# @Author  : afish
+# @File    : cascade.py
+"""
+模型级联
+
+先用便宜、快速的模型回答，出现以下情况时升级到更强的模型：
+    - 返回的工具调用不合法（工具不存在、参数不是 JSON 或不符合 schema）
+    - 回答的平均 logprob 低于阈值（置信度低）
+    - 模型明确表示交给更强的模型处理（回复中包含 [DEFER]）
+    - 请求失败（超时、限流、服务错误等），最终模型的请求失败时照常抛出异常
+并按层级统计延迟、token 用量和相对只用最终模型节省的费用。
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from openai.types.chat import ChatCompletion
+
+from aiframework.logger import logger
+
+DEFER_MARKER = "[DEFER]"
+
+DEFER_HINT = (f"如果你无法确定如何完成这个请求，或者它需要复杂的推理，请只回复 {DEFER_MARKER}，"
+              f"不要猜测。")
+
+
+@dataclass
+class TierStats:
+    """单个层级的统计"""
+    model: str
+    requests: int = 0
+    accepted: int = 0
+    escalated: int = 0
+    latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "accepted": self.accepted,
+            "escalated": self.escalated,
+            "avg_latency": self.latency / self.requests if self.requests else None,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost": self.cost,
+        }
+
+
+def mean_logprob(completion: ChatCompletion) -> Optional[float]:
+    """回答内容的平均 token logprob，接口未返回 logprobs 时为 None"""
+    logprobs = getattr(completion.choices[0], "logprobs", None)
+    content = getattr(logprobs, "content", None) if logprobs is not None else None
+    if not content:
+        return None
+    values = [token.logprob for token in content if token.logprob is not None and math.isfinite(token.logprob)]
+    return sum(values) / len(values) if values else None
+
+
+class ModelCascade:
+    """
+    :param models: 由便宜到昂贵的模型列表，最后一个为最终模型（不会再升级）
+    :param logprob_threshold: 平均 logprob 低于该值时升级，None 表示不检查置信度
+    :param prices: 模型价格 {模型: [每千输入 token 价格, 每千输出 token 价格]}，用于估算节省的费用
+    :param defer_hint: 是否提示便宜的模型在没有把握时回复 [DEFER]
+    """
+
+    def __init__(self, models: Sequence[str], logprob_threshold: Optional[float] = None,
+                 prices: Optional[Dict[str, Sequence[float]]] = None, defer_hint: bool = True):
+        self.models = list(dict.fromkeys(models))
+        self.logprob_threshold = logprob_threshold
+        self.prices = prices or {}
+        self.defer_hint = defer_hint
+        self.tiers = {model: TierStats(model) for model in self.models}
+        self.savings = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def final_model(self) -> str:
+        return self.models[-1]
+
+    def _cost(self, model: str, usage: Any) -> float:
+        price = self.prices.get(model)
+        if not price or usage is None:
+            return 0.0
+        return (usage.prompt_tokens * price[0] + usage.completion_tokens * price[1]) / 1000
+
+    def _tier_params(self, api_params: dict, model: str) -> dict:
+        """便宜层级的请求参数：替换模型、请求 logprobs，并在最后一条用户消息后附加 [DEFER] 提示"""
+        params = {**api_params, "model": model}
+        if self.logprob_threshold is not None:
+            params["logprobs"] = True
+        if self.defer_hint:
+            messages = list(params["messages"])
+            for index in range(len(messages) - 1, -1, -1):
+                message = messages[index]
+                if message.get("role") == "user" and isinstance(message.get("content"), str):
+                    messages[index] = {**message, "content": f"{message['content']}\n\n{DEFER_HINT}"}
+                    break
+            params["messages"] = messages
+        return params
+
+    def escalation_reason(self, completion: ChatCompletion,
+                          validate_tool_calls: Optional[Callable[[Any], Optional[str]]] = None) -> Optional[str]:
+        """判断便宜模型的回答是否需要升级，返回原因；不需要时返回 None"""
+        message = completion.choices[0].message
+        if message.content and DEFER_MARKER in message.content:
+            return "defer"
+        if message.tool_calls and validate_tool_calls is not None:
+            error = validate_tool_calls(message)
+            if error:
+                return f"invalid_tool_call: {error}"
+        if self.logprob_threshold is not None and not message.tool_calls:
+            confidence = mean_logprob(completion)
+            if confidence is not None and confidence < self.logprob_threshold:
+                return f"low_confidence: {confidence:.2f}"
+        return None
+
+    def run(self, api_params: dict, create: Callable[[dict], ChatCompletion],
+            validate_tool_calls: Optional[Callable[[Any], Optional[str]]] = None) -> ChatCompletion:
+        """依次尝试各层级模型，返回第一个不需要升级的回答"""
+        wasted = 0.0  # 被升级的便宜层级花费
+        for model in self.models:
+            is_final = model == self.final_model
+            params = {**api_params, "model": model} if is_final else self._tier_params(api_params, model)
+            start = time.perf_counter()
+            try:
+                completion = create(params)
+            except Exception as e:
+                if is_final:
+                    raise
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    tier = self.tiers[model]
+                    tier.requests += 1
+                    tier.escalated += 1
+                    tier.latency += elapsed
+                logger.warning(f"级联: {model} 请求失败，升级到下一层级（error: {e}），耗时 {elapsed:.2f}s")
+                continue
+            elapsed = time.perf_counter() - start
+            usage = getattr(completion, "usage", None)
+            cost = self._cost(model, usage)
+
+            reason = None if is_final else self.escalation_reason(completion, validate_tool_calls)
+            with self._lock:
+                tier = self.tiers[model]
+                tier.requests += 1
+                tier.latency += elapsed
+                tier.cost += cost
+                if usage is not None:
+                    tier.prompt_tokens += usage.prompt_tokens
+                    tier.completion_tokens += usage.completion_tokens
+                if reason:
+                    tier.escalated += 1
+                else:
+                    tier.accepted += 1
+                    if not is_final:
+                        # 相对直接使用最终模型节省的费用（按相同 token 用量估算）
+                        self.savings += self._cost(self.final_model, usage) - cost - wasted
+                    else:
+                        self.savings -= wasted
+            if not reason:
+                if not is_final:
+                    logger.info(f"级联: {model} 的回答已采用，耗时 {elapsed:.2f}s")
+                return completion
+            wasted += cost
+            logger.info(f"级联: {model} 的回答需要升级（{reason}），耗时 {elapsed:.2f}s")
+        raise RuntimeError("级联模型列表为空")
+
+    def report(self) -> Dict[str, Any]:
+        """各层级统计与估算节省的费用"""
+        with self._lock:
+            return {
+                "tiers": {model: tier.to_dict() for model, tier in self.tiers.items()},
+                "savings": self.savings if self.prices else None,
+            }
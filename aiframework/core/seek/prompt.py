@@ -0,0 +1,158 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/6 10:15
+# @Author  : afish
+# @File    : prompt.py
+"""
+提示词组装
+
+服务端的提示词缓存（KV cache）只对字节完全相同的前缀生效。这里把系统提示词和工具定义
+整理成稳定的前缀（工具按名称排序、字段按键排序），系统信息等易变内容在用户消息写入历史时
+附加一次（user_content），之后每轮重发的历史与上一次请求逐字节相同；
+并检查每次请求是否以上一次请求的消息为前缀，根据接口返回的 usage 统计前缀缓存命中情况。
+"""
+import copy
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiframework.logger import logger
+
+
+def canonical(obj: Any) -> Any:
+    """递归按键排序，保证序列化结果稳定"""
+    if isinstance(obj, dict):
+        return {key: canonical(obj[key]) for key in sorted(obj)}
+    if isinstance(obj, (list, tuple)):
+        return [canonical(item) for item in obj]
+    return obj
+
+
+def _dumps(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def _usage_value(obj: Any, name: str) -> Optional[Any]:
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class PromptAssembler:
+    """
+    组装每次请求的 messages 和 tools
+
+    :param system_prompt: 系统提示词
+    """
+
+    def __init__(self, system_prompt: Optional[str] = None):
+        self.system_prompt = (system_prompt or "").strip()
+        self.prefix_hash: Optional[str] = None
+        self._tools_key: Optional[int] = None
+        self._tools: List[Dict[str, Any]] = []
+        self._sent: List[str] = []  # 上一次请求各条消息的哈希
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "cache_hit_requests": 0,
+            "prefix_changes": 0,
+            "history_breaks": 0,  # 重发的历史与上一次请求不一致的次数
+        }
+
+    def system_message(self, tool_list: Optional[Dict[str, str]]) -> str:
+        """生成稳定的系统消息：系统提示词 + 按名称排序的工具列表"""
+        tools = {name: tool_list[name] for name in sorted(tool_list)} if tool_list else None
+        parts = [self.system_prompt] if self.system_prompt else []
+        parts.append(f"你可以使用的工具有：{tools if tools else '无可用工具'}")
+        return "\n".join(parts)
+
+    def stable_tools(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """按名称排序并规范化工具定义，同一工具目录只计算一次"""
+        key = hash(_dumps(tools))
+        if key != self._tools_key:
+            self._tools = [canonical(tool) for tool in sorted(tools, key=lambda t: t["function"]["name"])]
+            self._tools_key = key
+        return self._tools
+
+    def for_session(self) -> "PromptAssembler":
+        """会话使用的副本：共享工具缓存和统计，各自比较本会话前后两次请求的历史"""
+        assembler = copy.copy(self)
+        assembler._sent = []
+        return assembler
+
+    @staticmethod
+    def user_content(text: str, volatile: Optional[str] = None) -> str:
+        """
+        写入历史的用户消息内容
+
+        :param volatile: 易变的上下文（如系统信息），只在写入历史时附加一次，之后随历史原样重发
+        """
+        return f"{text}\n\n[当前系统信息] {volatile}" if volatile else text
+
+    def assemble(self, messages: List[Dict[str, Any]],
+                 tools: Optional[List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        生成本次请求的 messages 和 tools
+
+        :param messages: 消息历史（不会被修改，按原样发送）
+        :param tools: 工具定义
+        """
+        tools = self.stable_tools(tools) if tools else []
+        messages = list(messages)
+        self._update_prefix(messages, tools)
+        return messages, tools
+
+    def _update_prefix(self, messages: List[Dict[str, Any]], tools: List[Dict[str, Any]]):
+        """
+        按实际发送的消息计算前缀：
+        prefix_hash 为稳定前缀（工具定义 + 开头的系统消息）的哈希；
+        本次请求没有以上一次请求的全部消息开头时（历史被修改或压缩），上一次的缓存只能部分命中，计入 history_breaks
+        """
+        digest = hashlib.sha1(_dumps(tools).encode("utf-8"))
+        for message in messages:
+            if not isinstance(message, dict) or message.get("role") != "system":
+                break
+            digest.update(_dumps(message).encode("utf-8"))
+        prefix_hash = digest.hexdigest()[:12]
+        sent = [hashlib.sha1(_dumps(message).encode("utf-8")).hexdigest()
+                for message in messages if isinstance(message, dict)]
+        with self._lock:
+            if prefix_hash != self.prefix_hash:
+                if self.prefix_hash is not None:
+                    self.stats["prefix_changes"] += 1
+                    logger.info(f"提示词前缀已变化: {self.prefix_hash} -> {prefix_hash}")
+                self.prefix_hash = prefix_hash
+            elif sent[:len(self._sent)] != self._sent:
+                matched = next((i for i, (a, b) in enumerate(zip(sent, self._sent)) if a != b),
+                               min(len(sent), len(self._sent)))
+                self.stats["history_breaks"] += 1
+                logger.debug(f"重发的历史从第 {matched} 条消息起与上一次请求不同")
+            self._sent = sent
+
+    def record_usage(self, usage: Any) -> Dict[str, Any]:
+        """根据接口返回的 usage 统计前缀缓存命中"""
+        prompt_tokens = _usage_value(usage, "prompt_tokens") or 0
+        cached_tokens = _usage_value(_usage_value(usage, "prompt_tokens_details"), "cached_tokens") or 0
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["cached_tokens"] += cached_tokens
+            if cached_tokens:
+                self.stats["cache_hit_requests"] += 1
+            report = self.report()
+        logger.debug(f"提示词前缀 {self.prefix_hash}: 本次 {cached_tokens}/{prompt_tokens} token 命中缓存，"
+                     f"累计命中率 {report['cached_ratio']:.1%}")
+        return report
+
+    def report(self) -> Dict[str, Any]:
+        """缓存统计"""
+        stats = dict(self.stats)
+        stats["prefix_hash"] = self.prefix_hash
+        stats["cached_ratio"] = stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+        stats["hit_rate"] = stats["cache_hit_requests"] / stats["requests"] if stats["requests"] else 0.0
+        return stats
@@ -0,0 +1,172 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/14 15:30
+# @Author  : afish
+# @File    : tool_result.py
+"""
+工具结果后处理
+
+工具返回的内容会作为 tool 消息写入历史，并在之后的每次请求中重新发送。
+ToolResultProcessor 按内容类型把结果转换为有长度上限的文本：
+- 文本：超过上限时保留开头和结尾，完整内容存入 blob 存储
+- 图片、音频、二进制资源：存入 blob 存储，只保留类型、大小和 blob_id
+- 表格（字典列表）：行数较多时给出列名、行数、数值列范围和前几行，完整数据存入 blob 存储
+此外每轮对话的工具输出有总字符预算，预算用完后后续结果按最小长度截断。
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from aiframework.backend.blob_store import FileBlobStore
+
+
+@dataclass
+class ResultBudget:
+    """一轮对话中工具输出剩余的字符数"""
+    remaining: int
+
+
+def is_table(value: Any) -> bool:
+    return isinstance(value, list) and len(value) > 0 and all(isinstance(row, dict) for row in value)
+
+
+class ToolResultProcessor:
+    """
+    :param blob_store: 保存完整内容的 blob 存储，为空时超出部分直接丢弃
+    :param max_chars: 单个工具结果的最大字符数
+    :param turn_budget: 每轮对话所有工具结果的总字符数
+    :param min_chars: 预算用完后单个结果仍保留的字符数
+    :param head_ratio: 截断时开头部分所占比例
+    :param table_rows: 表格超过该行数时只保留摘要
+    """
+
+    def __init__(self, blob_store: Optional[FileBlobStore] = None, max_chars: int = 20000,
+                 turn_budget: int = 60000, min_chars: int = 1000, head_ratio: float = 0.7,
+                 table_rows: int = 20):
+        self.blob_store = blob_store
+        self.max_chars = max_chars
+        self.turn_budget = turn_budget
+        self.min_chars = min_chars
+        self.head_ratio = head_ratio
+        self.table_rows = table_rows
+
+    def new_budget(self) -> ResultBudget:
+        return ResultBudget(self.turn_budget)
+
+    def process(self, result: Any, budget: Optional[ResultBudget] = None) -> str:
+        """把工具结果转换为写入 tool 消息的文本"""
+        limit = self.max_chars
+        if budget is not None:
+            limit = max(min(limit, budget.remaining), self.min_chars)
+        if hasattr(result, "content") and isinstance(getattr(result, "content"), list):
+            text = self._mcp_result(result, limit)
+        else:
+            text = self._value(result, limit)
+        if budget is not None:
+            budget.remaining = max(budget.remaining - len(text), 0)
+        return text
+
+    def _mcp_result(self, result: Any, limit: int) -> str:
+        """MCP CallToolResult：按内容块分别处理"""
+        texts, references = [], []
+        for part in result.content:
+            if getattr(part, "type", None) == "text":
+                texts.append(part.text)
+            else:
+                references.append(self._content(part))
+        if not texts and not references and getattr(result, "structuredContent", None) is not None:
+            texts.append(self._value(result.structuredContent, limit))
+        # 图片等引用很短，完整保留；文本按剩余长度截断
+        reference_text = "\n".join(references)
+        text = self._truncate("\n".join(texts), max(limit - len(reference_text), self.min_chars // 2))
+        text = "\n".join(part for part in (text, reference_text) if part)
+        if getattr(result, "isError", False):
+            text = f"工具返回错误: {text}"
+        return text
+
+    def _content(self, part: Any) -> str:
+        content_type = getattr(part, "type", None)
+        if content_type == "text":
+            return part.text
+        if content_type in ("image", "audio"):
+            return self._binary(part.data, part.mimeType, "图片" if content_type == "image" else "音频")
+        if content_type == "resource":
+            resource = part.resource
+            if getattr(resource, "text", None) is not None:
+                return f"[资源 {resource.uri}]\n{resource.text}"
+            return self._binary(getattr(resource, "blob", ""), resource.mimeType or "application/octet-stream",
+                                f"资源 {resource.uri}")
+        if content_type == "resource_link":
+            return f"[资源链接 {getattr(part, 'uri', '')}]"
+        return str(part)
+
+    def _binary(self, data: Any, media_type: str, label: str) -> str:
+        """二进制内容（base64 字符串或 bytes）只保留引用"""
+        if isinstance(data, str):
+            try:
+                data = base64.b64decode(data, validate=False)
+            except (binascii.Error, ValueError):
+                data = data.encode("utf-8")
+        size = f"{len(data) / 1024:.1f}KB"
+        if self.blob_store is None:
+            return f"[{label} {media_type} {size}，内容已省略]"
+        blob_id = self.blob_store.put(data, media_type)
+        return f"[{label} {media_type} {size}，blob_id={blob_id}]"
+
+    def _value(self, value: Any, limit: int) -> str:
+        """本地工具返回的普通对象"""
+        if isinstance(value, str):
+            return self._truncate(value, limit)
+        if isinstance(value, (bytes, bytearray)):
+            return self._binary(bytes(value), "application/octet-stream", "二进制数据")
+        if is_table(value) and len(value) > self.table_rows:
+            return self._truncate(self._table_summary(value), limit)
+        if isinstance(value, dict):
+            tables = {key: rows for key, rows in value.items() if is_table(rows) and len(rows) > self.table_rows}
+            if tables:
+                value = {key: (self._table_summary(tables[key]) if key in tables else item)
+                         for key, item in value.items()}
+        if isinstance(value, (dict, list)):
+            try:
+                return self._truncate(json.dumps(value, ensure_ascii=False, default=str), limit)
+            except (TypeError, ValueError):
+                pass
+        return self._truncate(str(value), limit)
+
+    def _table_summary(self, rows: List[Dict[str, Any]]) -> str:
+        """表格摘要：列名、行数、数值列范围和前几行"""
+        columns: List[str] = []
+        for row in rows:
+            for key in row:
+                if key not in columns:
+                    columns.append(key)
+        lines = [f"[表格] 共 {len(rows)} 行，列: {', '.join(map(str, columns))}"]
+        for column in columns:
+            numbers = [row[column] for row in rows
+                       if isinstance(row.get(column), (int, float)) and not isinstance(row.get(column), bool)]
+            if len(numbers) == len(rows):
+                lines.append(f"- {column}: 最小 {min(numbers)}，最大 {max(numbers)}，平均 {sum(numbers) / len(numbers):.4g}")
+        lines.append(f"前 {self.table_rows} 行:")
+        lines.extend(json.dumps(row, ensure_ascii=False, default=str) for row in rows[:self.table_rows])
+        if self.blob_store is not None:
+            data = "\n".join(json.dumps(row, ensure_ascii=False, default=str) for row in rows)
+            blob_id = self.blob_store.put(data, "text/plain")
+            lines.append(f"完整数据（每行一条 JSON）: fetch_blob(blob_id=\"{blob_id}\")")
+        return "\n".join(lines)
+
+    def _truncate(self, text: str, limit: int) -> str:
+        """超过上限时保留开头和结尾，中间部分存入 blob 存储"""
+        if len(text) <= limit:
+            return text
+        if self.blob_store is not None:
+            blob_id = self.blob_store.put(text, "text/plain")
+            marker = f"\n...（省略 {{}} 字符，完整内容 {len(text)} 字符: fetch_blob(blob_id=\"{blob_id}\")）...\n"
+        else:
+            marker = "\n...（省略 {} 字符）...\n"
+        keep = max(limit - len(marker) - 8, 0)
+        head = int(keep * self.head_ratio)
+        tail = keep - head
+        omitted = len(text) - head - tail
+        return text[:head] + marker.format(omitted) + (text[-tail:] if tail else "")
@@ -0,0 +1,123 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/10 21:20
+# @Author  : afish
+# @File    : usage.py
+"""
+每轮对话的 token 用量与延迟统计
+
+一轮对话（一次 response 调用）可能包含多次接口请求（工具调用轮次），
+TurnMetrics 汇总每次请求的 token 数、首字节时间（TTFB）和耗时，在一轮结束时写入全局指标。
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import httpx
+
+from aiframework.utils.metrics import TOKEN_BUCKETS, metrics
+
+REQUEST_LATENCY = metrics.histogram("llm_request_latency_seconds", "单次接口请求耗时")
+REQUEST_TTFB = metrics.histogram("llm_request_ttfb_seconds", "单次接口请求首字节时间")
+TURN_LATENCY = metrics.histogram("llm_turn_latency_seconds", "每轮对话总耗时")
+TURN_PROMPT_TOKENS = metrics.histogram("llm_turn_prompt_tokens", "每轮对话输入 token 数", TOKEN_BUCKETS)
+TURN_COMPLETION_TOKENS = metrics.histogram("llm_turn_completion_tokens", "每轮对话输出 token 数", TOKEN_BUCKETS)
+TURN_TOOL_ROUNDS = metrics.histogram("llm_turn_tool_rounds", "每轮对话的工具调用轮数", (0, 1, 2, 3, 5, 8, 13))
+TOKENS = metrics.counter("llm_tokens_total", "累计 token 数")
+TURNS = metrics.counter("llm_turns_total", "对话轮数")
+
+
+class TTFBProbe:
+    """
+    通过 httpx 事件钩子测量首字节时间
+
+    request 钩子在发送请求前记录时间，response 钩子在收到响应头（读取响应体之前）时计算耗时，
+    结果按线程保存，供同一线程中的调用方读取。
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def on_request(self, request: httpx.Request):
+        self._local.start = time.perf_counter()
+        self._local.ttfb = None
+
+    def on_response(self, response: httpx.Response):
+        start = getattr(self._local, "start", None)
+        if start is not None:
+            self._local.ttfb = time.perf_counter() - start
+
+    def event_hooks(self) -> Dict[str, list]:
+        return {"request": [self.on_request], "response": [self.on_response]}
+
+    def reset(self):
+        self._local.ttfb = None
+
+    def record(self, ttfb: Optional[float]):
+        """记录当前线程的首字节时间（由自行计时的异步客户端调用）"""
+        self._local.ttfb = ttfb
+
+    @property
+    def last(self) -> Optional[float]:
+        """当前线程最近一次请求的首字节时间"""
+        return getattr(self._local, "ttfb", None)
+
+
+@dataclass
+class TurnMetrics:
+    """一轮对话的统计"""
+    model: Optional[str] = None
+    started_at: float = field(default_factory=time.perf_counter)
+    requests: int = 0
+    tool_rounds: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    ttfb: Optional[float] = None  # 第一次请求的首字节时间
+    cache_hit: bool = False
+    latency: Optional[float] = None
+
+    def record_request(self, elapsed: float, usage: Any = None, ttfb: Optional[float] = None):
+        """记录一次接口请求"""
+        self.requests += 1
+        labels = {"model": self.model or ""}
+        REQUEST_LATENCY.observe(elapsed, labels)
+        if ttfb is not None:
+            REQUEST_TTFB.observe(ttfb, labels)
+            if self.ttfb is None:
+                self.ttfb = ttfb
+        if usage is None:
+            return
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        self.cached_tokens += (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+
+    def finish(self) -> "TurnMetrics":
+        """一轮结束，写入全局指标"""
+        self.latency = time.perf_counter() - self.started_at
+        labels = {"model": self.model or ""}
+        TURNS.inc(labels={**labels, "cache": "hit" if self.cache_hit else "miss"})
+        TURN_LATENCY.observe(self.latency, labels)
+        TURN_TOOL_ROUNDS.observe(self.tool_rounds, labels)
+        if self.requests:
+            TURN_PROMPT_TOKENS.observe(self.prompt_tokens, labels)
+            TURN_COMPLETION_TOKENS.observe(self.completion_tokens, labels)
+        for kind, value in (("prompt", self.prompt_tokens), ("completion", self.completion_tokens),
+                            ("cached", self.cached_tokens)):
+            if value:
+                TOKENS.inc(value, {**labels, "kind": kind})
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "tool_rounds": self.tool_rounds,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cached_tokens": self.cached_tokens,
+            "ttfb": self.ttfb,
+            "latency": self.latency,
+            "cache_hit": self.cache_hit,
+        }
@@ -0,0 +1,150 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/17 10:30
+# @Author  : afish
+# @File    : player.py
+"""
+可中断的流式播放
+
+合成的音频边到达边播放，按 chunk_ms 的小块写入声卡，stop() 最多一个小块之后生效，
+用于用户插话（barge-in）时立即停止播报。
+on_chunk 在每块写入前调用，AudioSessionCoordinator 用它获得回声的参考信号。
+"""
+import queue
+import threading
+from typing import Callable, Optional
+
+from aiframework.logger import logger
+
+_END = object()
+
+
+class AudioPlayer:
+    """
+    :param sample_rate: 采样率（16 位单声道 PCM）
+    :param chunk_ms: 每次写入的时长，决定 stop 的响应时间
+    :param output: 写入一块 PCM 的函数（阻塞到可以写下一块），默认使用 pyaudio 输出到扬声器
+    """
+
+    def __init__(self, sample_rate: int = 48000, chunk_ms: int = 40,
+                 output: Optional[Callable[[bytes], None]] = None):
+        self.sample_rate = sample_rate
+        self.chunk_bytes = sample_rate * chunk_ms // 1000 * 2
+        self.output = output
+        self.on_start: Optional[Callable[[], None]] = None
+        self.on_end: Optional[Callable[[bool], None]] = None  # 参数为是否被中断
+        self.on_chunk: Optional[Callable[[bytes], None]] = None
+        self.interrupted = False  # 上一段语音是否被 stop 中断
+        self._queue: queue.Queue = queue.Queue()
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pyaudio = None
+        self._stream = None
+
+    @property
+    def is_playing(self) -> bool:
+        return not self._idle.is_set()
+
+    def feed(self, pcm: bytes):
+        """追加一段要播放的 PCM，没有在播放时开始播放"""
+        if not pcm:
+            return
+        with self._lock:
+            if self._idle.is_set():
+                self._stop.clear()
+                self._idle.clear()
+                if self.on_start:
+                    self.on_start()
+            self._queue.put(pcm)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._play_loop, name="audio-player", daemon=True)
+                self._thread.start()
+
+    def finish(self):
+        """当前这段语音已全部 feed，播放完后结束"""
+        with self._lock:
+            if not self._idle.is_set():
+                self._queue.put(_END)
+
+    def play(self, pcm: bytes) -> bool:
+        """播放一段 PCM 并等待结束，返回是否完整播放（未被 stop）"""
+        self.feed(pcm)
+        self.finish()
+        self.wait()
+        return not self.interrupted
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._idle.wait(timeout)
+
+    def stop(self):
+        """立即停止播放并丢弃未播放的音频"""
+        with self._lock:
+            if self._idle.is_set():
+                return
+            self._stop.set()
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._queue.put(_END)
+
+    def close(self):
+        self.stop()
+        self._idle.wait(1.0)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        if self._stream is not None:
+            try:
+                self._stream.stop_stream()
+                self._stream.close()
+                self._pyaudio.terminate()
+            except Exception as e:
+                logger.error(f"关闭音频输出失败: {str(e)}")
+            self._stream = self._pyaudio = None
+
+    def _write(self, chunk: bytes):
+        if self.output is not None:
+            self.output(chunk)
+            return
+        if self._stream is None:
+            import pyaudio
+
+            self._pyaudio = pyaudio.PyAudio()
+            self._stream = self._pyaudio.open(format=pyaudio.paInt16, channels=1, rate=self.sample_rate, output=True,
+                                              frames_per_buffer=self.chunk_bytes // 2)
+        self._stream.write(chunk)
+
+    def _play_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if item is _END:
+                with self._lock:
+                    # stop 之后 feed 的新语音排在 _END 之后，不受影响
+                    interrupted = self.interrupted = self._stop.is_set()
+                    self._stop.clear()
+                    if self._queue.empty():
+                        self._idle.set()
+                if self.on_end:
+                    self.on_end(interrupted)
+                continue
+            view = memoryview(item)
+            for offset in range(0, len(view), self.chunk_bytes):
+                if self._stop.is_set():
+                    break
+                chunk = bytes(view[offset:offset + self.chunk_bytes])
+                if self.on_chunk:
+                    self.on_chunk(chunk)
+                try:
+                    self._write(chunk)
+                except Exception as e:
+                    logger.error(f"播放音频失败: {e}")
+                    self._stop.set()
+                    break
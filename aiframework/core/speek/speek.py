@@ -1,12 +1,15 @@
 import os
+import threading
 import wave
 from abc import ABC, abstractmethod
+from typing import Optional
 
 import dashscope
 from dashscope.audio.tts import SpeechSynthesizer, ResultCallback, SpeechSynthesisResult
 from pydub import AudioSegment
 from pydub.playback import play
 
+from aiframework.core.speek.player import AudioPlayer
 from aiframework.logger import logger
 
 
@@ -51,23 +54,42 @@ class RealTimeSpeechSynthesis(SpeechSynthesis):
     Implementation of real-time speech synthesis using OpenAI TTS.
     """
 
-    def __init__(self, api_key=None, model='sambert-zhichu-v1', sample_rate=48000, voice='zhitian'):
+    def __init__(self, api_key=None, model='sambert-zhichu-v1', sample_rate=48000, voice='zhitian',
+                 player: Optional[AudioPlayer] = None):
         super().__init__(api_key, model, sample_rate, voice)
+        # speak() 边合成边播放使用的播放器
+        self.player = player
+        self._callback: Optional["RealTimeSpeechSynthesis.Callback"] = None
 
     class Callback(ResultCallback):
         """
         Callback class for handling synthesis events.
         """
 
-        def __init__(self, output_file):
+        def __init__(self, output_file, player: Optional[AudioPlayer] = None):
             self.output_file = output_file
+            self.player = player  # 设置后音频帧直接送去播放，不保存文件
             self.audio_frames = []  # Store audio frames
+            self.cancelled = threading.Event()
+            self.failed = False
+            self._finished = False
+
+        def finish_playback(self):
+            """通知播放器这段语音已全部送出（只通知一次），合成出错时也要调用，否则 speak 会一直等待"""
+            if self.player is not None and not self._finished:
+                self._finished = True
+                self.player.finish()
 
         def on_open(self):
             # print('语音合成已启动.')
             pass
 
         def on_complete(self):
+            if self.cancelled.is_set():
+                return
+            if self.player is not None:
+                self.finish_playback()
+                return
             with wave.open(str(self.output_file) + r"\speek.wav", 'wb') as wf:
                 wf.setnchannels(1)  # Mono channel
                 wf.setsampwidth(2)  # 16-bit PCM
@@ -76,28 +98,78 @@ class RealTimeSpeechSynthesis(SpeechSynthesis):
 
         def on_error(self, response):
             logger.error(f"语音合成失败: {response}")
+            self.failed = True
+            # 已送出的音频照常播完
+            self.finish_playback()
 
         def on_close(self):
             logger.info('语音合成已关闭.')
 
         def on_event(self, result: SpeechSynthesisResult):
+            if self.cancelled.is_set():
+                # 已取消：服务端仍在推送，剩余的音频帧直接丢弃
+                return
             if result.get_audio_frame() is not None:
-                self.audio_frames.append(result.get_audio_frame())  # Save audio frame
+                if self.player is not None:
+                    self.player.feed(result.get_audio_frame())
+                else:
+                    self.audio_frames.append(result.get_audio_frame())  # Save audio frame
 
     def synthesize(self, text, output_file="output.wav"):
         """
         Synthesize text to audio and save it to a file.
         """
-        callback = self.Callback(output_file)
-        SpeechSynthesizer.call(
-            model=self.model,
-            text=text,
-            sample_rate=self.sample_rate,
-            callback=callback,
-            voice=self.voice,  # Specify the voice (e.g., 'zhitian', 'zhixia')
-            word_timestamp_enabled=True,
-            phoneme_timestamp_enabled=True
-        )
+        self._call(text, self.Callback(output_file))
+
+    def speak(self, text, timeout: Optional[float] = 120.0) -> bool:
+        """
+        边合成边播放，返回是否完整播放（被 cancel 打断、合成失败或超时时返回 False）
+
+        :param timeout: 最多等待播放结束的时长（秒），超时后停止播放
+        """
+        if self.player is None:
+            self.player = AudioPlayer(sample_rate=self.sample_rate)
+        callback = self.Callback(None, self.player)
+        try:
+            self._call(text, callback, format='pcm')  # 播放器需要裸 PCM
+        finally:
+            # 合成异常结束时没有 on_complete，也要让播放器结束这段语音
+            callback.finish_playback()
+        if callback.cancelled.is_set():
+            return False
+        if not self.player.wait(timeout):
+            logger.warning(f"播放超过 {timeout}s 仍未结束，停止播放")
+            self.player.stop()
+            return False
+        return not callback.cancelled.is_set() and not callback.failed and not self.player.interrupted
+
+    def cancel(self):
+        """取消正在进行的合成与播放"""
+        callback = self._callback
+        if callback is not None:
+            callback.cancelled.set()
+        if self.player is not None:
+            self.player.stop()
+
+    @property
+    def is_speaking(self) -> bool:
+        return self._callback is not None or (self.player is not None and self.player.is_playing)
+
+    def _call(self, text, callback: "RealTimeSpeechSynthesis.Callback", **options):
+        self._callback = callback
+        try:
+            SpeechSynthesizer.call(
+                model=self.model,
+                text=text,
+                sample_rate=self.sample_rate,
+                callback=callback,
+                voice=self.voice,  # Specify the voice (e.g., 'zhitian', 'zhixia')
+                word_timestamp_enabled=True,
+                phoneme_timestamp_enabled=True,
+                **options
+            )
+        finally:
+            self._callback = None
 
 
 # synthesizer = RealTimeSpeechSynthesis(api_key=Config().api_key, voice="zhitian")
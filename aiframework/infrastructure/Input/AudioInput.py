@@ -3,42 +3,77 @@
 # @Time    : 2025/7/6 16:51
 # @Author  : afish
 # @File    : AudioInput.py
-from aiframework.core.listen.dashcope.listen import RealTimeSpeechRecognition
-from aiframework.infrastructure.Input.InputHandler import InputHandlerBase
+import queue
+from typing import Optional
 
-import time
 from aiframework.core.listen.dashcope.listen import RealTimeSpeechRecognition
 from aiframework.infrastructure.Input.InputHandler import InputHandlerBase
+from aiframework.logger import logger
 
 
 class AudioInputHandler(InputHandlerBase):
-    def __init__(self, api_key: str, model: str = 'paraformer-realtime-v2'):
-        self.recognizer = RealTimeSpeechRecognition(api_key=api_key, model=model)
+    """
+    :param api_key: 语音识别服务的 API 密钥
+    :param model: 识别模型
+    :param timeout: 每次 read_input 最多等待的秒数，None 表示一直等待
+    :param max_pending: 处理指令期间最多缓存的识别结果数，超出时丢弃最早的一条
+    :param recognizer_options: 传给 RealTimeSpeechRecognition 的其他参数（如 vad、source）
+    """
+
+    def __init__(self, api_key: str, model: str = 'paraformer-realtime-v2', timeout: Optional[float] = 5.0,
+                 max_pending: int = 8, **recognizer_options):
+        self.recognizer = RealTimeSpeechRecognition(api_key=api_key, model=model, **recognizer_options)
         self.text = ""
+        self.timeout = timeout
+        # 识别线程通过队列把结果交给读取方，正在处理上一条指令时到达的结果会排队而不是丢失
+        self._results: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max(max_pending, 1))
         self.is_listening = False
         # 初始化识别器但不启动
         self.recognizer.on_result(self._on_result)
         self.recognizer.start_recognition()
 
     def _on_result(self, text: str):
-        """识别结果回调"""
-        self.text = text
+        """识别结果回调（识别线程中调用）"""
+        while True:
+            try:
+                self._results.put_nowait(text)
+                return
+            except queue.Full:
+                try:
+                    dropped = self._results.get_nowait()
+                    logger.warning(f"待处理的语音指令过多，丢弃: {dropped}")
+                except queue.Empty:
+                    pass
 
-    def read_input(self) -> None:
-        """读取音频输入，等待语音识别结果"""
-        self.text = ""
-        timeout = 5  # 5秒超时
-        start_time = time.time()
+    @property
+    def pending(self) -> int:
+        """尚未读取的识别结果数"""
+        return self._results.qsize()
 
-        # 等待识别到文本或超时
-        while not self.text and (time.time() - start_time) < timeout:
-            time.sleep(0.1)  # 避免过度占用CPU
+    def read_input(self, timeout: Optional[float] = ...) -> str:
+        """等待下一条识别结果，超时返回空字符串（之后到达的结果留在队列中，下次读取）"""
+        if timeout is ...:
+            timeout = self.timeout
+        try:
+            text = self._results.get(timeout=timeout)
+        except queue.Empty:
+            return ""
+        return text or ""
 
     def process(self) -> str:
         """处理输入并返回识别结果"""
-        self.read_input()
+        self.text = self.read_input()
         return self.text
 
+    def close(self):
+        """停止识别器，并唤醒正在等待的读取方"""
+        if self.recognizer:
+            self.recognizer.stop_recognition()
+        try:
+            self._results.put_nowait(None)
+        except queue.Full:
+            pass
+
     def __del__(self):
         """析构时停止识别器"""
         if self.recognizer:
@@ -0,0 +1,21 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/12 14:18
+# @Author  : afish
+# @File    : console_handler.py
+import sys
+from typing import List, Optional, TextIO
+
+
+class ConsoleWriter:
+    """控制台输出，一次写入一批日志"""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream or sys.stdout
+
+    def write_batch(self, lines: List[str]):
+        self.stream.write("".join(lines))
+        self.stream.flush()
+
+    def close(self):
+        pass
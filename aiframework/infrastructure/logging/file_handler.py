@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/12 14:26
+# @Author  : afish
+# @File    : file_handler.py
+import os
+import re
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional, Union
+
+_SIZE = re.compile(r"^\s*([\d.]+)\s*([kmg]?i?b?)?\s*$", re.IGNORECASE)
+_TIME = re.compile(r"^\s*(\d{1,2}):(\d{2})(?::(\d{2}))?\s*$")
+_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(value: Union[int, str]) -> int:
+    """解析 '10 MB' 这类大小配置，返回字节数"""
+    if isinstance(value, int):
+        return value
+    match = _SIZE.match(str(value))
+    if not match:
+        raise ValueError(f"无法解析的大小: {value}")
+    number, unit = match.groups()
+    return int(float(number) * _UNITS[(unit or "")[:1].lower()])
+
+
+def parse_time(value: Union[int, str]) -> Optional[tuple]:
+    """解析 '00:00' 这类每日滚动时刻，返回 (时, 分, 秒)；不是时刻时返回 None"""
+    match = _TIME.match(str(value))
+    if not match:
+        return None
+    hour, minute, second = (int(part or 0) for part in match.groups())
+    if hour > 23 or minute > 59 or second > 59:
+        raise ValueError(f"无法解析的时刻: {value}")
+    return hour, minute, second
+
+
+def is_time_rotation(value: Union[int, str, None]) -> bool:
+    return value is not None and not isinstance(value, int) and parse_time(value) is not None
+
+
+class RotatingFileWriter:
+    """
+    按大小或每日时刻滚动的日志文件，一次写入一批日志
+
+    文件超过 max_bytes 或到达 at 指定的时刻（如 '00:00'）后重命名为 name.1、name.2 ...，
+    最多保留 backup_count 个备份。max_bytes 为 0 时不按大小滚动。
+    """
+
+    def __init__(self, path: Union[str, Path], max_bytes: Union[int, str] = "10 MB",
+                 backup_count: int = 5, encoding: str = "utf-8", at: Optional[str] = None):
+        self.path = Path(path)
+        self.max_bytes = parse_size(max_bytes)
+        self.backup_count = backup_count
+        self.encoding = encoding
+        self.at = parse_time(at) if at is not None else None
+        if at is not None and self.at is None:
+            raise ValueError(f"无法解析的时刻: {at}")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = None
+        self._size = 0
+        self._rollover_at: Optional[float] = None
+        self._open()
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding=self.encoding)
+        self._size = self._file.tell()
+        if self.at is not None:
+            # 已有的文件从最后修改时间算起，程序停止期间错过的滚动在下一次写入时补上
+            start = os.path.getmtime(self.path) if self._size else time.time()
+            self._rollover_at = self._next_rollover(start)
+
+    def _next_rollover(self, after: float) -> float:
+        hour, minute, second = self.at
+        moment = datetime.fromtimestamp(after).replace(hour=hour, minute=minute, second=second, microsecond=0)
+        if moment.timestamp() <= after:
+            moment += timedelta(days=1)
+        return moment.timestamp()
+
+    def write_batch(self, lines: List[str]):
+        """写入一批日志并只 flush 一次"""
+        data = "".join(lines)
+        if self._rollover_at is not None and time.time() >= self._rollover_at:
+            if self._size:
+                self._rotate()
+            else:
+                self._rollover_at = self._next_rollover(time.time())
+        if self.max_bytes and self._size and self._size + len(data.encode(self.encoding)) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data.encode(self.encoding))
+
+    def _rotate(self):
+        self._file.close()
+        if self.backup_count > 0:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self.path.with_name(f"{self.path.name}.{index}")
+                if source.exists():
+                    os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink(missing_ok=True)
+        self._open()
+
+    def close(self):
+        if self._file and not self._file.closed:
+            self._file.close()
@@ -0,0 +1,163 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/12 14:40
+# @Author  : afish
+# @File    : queue_handler.py
+"""
+非阻塞的日志 sink
+
+日志先放入有界队列，由后台线程按批写出，调用线程不做任何 I/O。
+队列满时按策略处理：drop_new 丢弃新日志，drop_old 丢弃最旧的日志，block 等待队列空出。
+"""
+import json
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, List, Optional
+
+DROP_POLICIES = ("drop_new", "drop_old", "block")
+
+
+def json_line(message: Any) -> str:
+    """把 loguru 消息格式化为一行 JSON"""
+    record = message.record
+    data = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "thread": record["thread"].name,
+        "message": record["message"],
+    }
+    if record["extra"]:
+        data["extra"] = record["extra"]
+    if record["exception"] is not None:
+        exc_type, exc_value, _ = record["exception"]
+        data["exception"] = {"type": getattr(exc_type, "__name__", str(exc_type)), "value": str(exc_value)}
+    return json.dumps(data, ensure_ascii=False, default=str) + "\n"
+
+
+class _Notice(str):
+    """
+    sink 自身产生的日志（如丢弃提示）
+
+    与 loguru 的消息一样是带 record 的字符串，可以交给同一个 formatter，JSON 输出时仍是一行合法的 JSON
+    """
+
+    def __init__(self, text: str, level: str = "WARNING"):
+        now = datetime.now().astimezone()
+        self.record = {
+            "time": now,
+            "level": SimpleNamespace(name=level),
+            "name": __name__,
+            "function": "_write",
+            "line": 0,
+            "thread": threading.current_thread(),
+            "message": text,
+            "extra": {},
+            "exception": None,
+        }
+
+    def __new__(cls, text: str, level: str = "WARNING"):
+        return super().__new__(cls, f"{time.strftime('%Y-%m-%d %H:%M:%S')} | {level: <8} | {text}\n")
+
+
+class QueueSink:
+    """
+    :param writer: 提供 write_batch(lines) 和 close() 的输出对象
+    :param formatter: 把消息转为字符串，默认使用 loguru 已格式化的文本
+    :param queue_size: 队列容量
+    :param drop_policy: 队列满时的处理策略
+    :param batch_size: 每批最多写出的条数
+    :param flush_interval: 等待新日志的最长时间（秒），到时写出已收集的日志
+    """
+
+    def __init__(self, writer, formatter: Optional[Callable[[Any], str]] = None, queue_size: int = 10000,
+                 drop_policy: str = "drop_new", batch_size: int = 256, flush_interval: float = 0.5,
+                 name: str = "log-sink"):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"不支持的丢弃策略: {drop_policy}，可选 {DROP_POLICIES}")
+        self.writer = writer
+        self.formatter = formatter or str
+        self.drop_policy = drop_policy
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self._reported_drops = 0
+        self._drop_lock = threading.Lock()  # dropped 由各个记录日志的线程累加
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def __call__(self, message):
+        """loguru sink 入口，只做入队"""
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            if self.drop_policy == "block":
+                self._queue.put(message)
+            elif self.drop_policy == "drop_old":
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._count_drop()
+                try:
+                    self._queue.put_nowait(message)
+                except queue.Full:
+                    self._count_drop()
+            else:
+                self._count_drop()
+
+    def _count_drop(self):
+        with self._drop_lock:
+            self.dropped += 1
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+    def _write(self, batch: List[Any]):
+        lines = []
+        with self._drop_lock:
+            dropped, self._reported_drops = self.dropped - self._reported_drops, self.dropped
+        if dropped:
+            lines.append(self._format_notice(_Notice(f"日志队列已满，已丢弃 {dropped} 条日志")))
+        for message in batch:
+            try:
+                lines.append(self.formatter(message))
+            except Exception as e:
+                lines.append(self._format_notice(_Notice(f"日志格式化失败: {e}", "ERROR")))
+        try:
+            self.writer.write_batch(lines)
+            self.written += len(batch)
+        except Exception as e:
+            sys.stderr.write(f"写出日志失败: {e}\n")
+
+    def _format_notice(self, notice: _Notice) -> str:
+        try:
+            return self.formatter(notice)
+        except Exception:
+            return str(notice)
+
+    def stop(self, timeout: float = 2.0):
+        """写出队列中剩余的日志并停止后台线程"""
+        self._stopping.set()
+        self._thread.join(timeout=timeout)
+        self.writer.close()
@@ -1,10 +1,17 @@
 #! /usr/bin/env python
 # -*- coding: utf-8 -*-
+import atexit
+import json
+import random
 import sys
 from pathlib import Path
 
 from loguru import logger as _logger
-from typing import Any
+from typing import Any, Callable, Optional, Union
+
+from aiframework.infrastructure.logging.console_handler import ConsoleWriter
+from aiframework.infrastructure.logging.file_handler import RotatingFileWriter, is_time_rotation
+from aiframework.infrastructure.logging.queue_handler import QueueSink, json_line
 
 # 默认日志配置
 DEFAULT_LOGGING_CONFIG = {
@@ -19,6 +26,21 @@ DEFAULT_LOGGING_CONFIG = {
     'FILE': False,  # 默认不保存到文件
     'ERROR_FILE': False,  # 默认不单独保存错误日志
     'COLORED': True,  # 默认启用彩色控制台输出
+    # 大对象（接口参数、响应等）日志，只有启用时才会序列化
+    'PAYLOAD': False,  # 默认不记录
+    'PAYLOAD_LEVEL': 'DEBUG',
+    'PAYLOAD_MAX_CHARS': 2000,  # 单条最大字符数，超出部分从中间截断，0 表示不截断
+    'PAYLOAD_SAMPLE_RATE': 1.0,  # 采样率（0~1）
+    'PAYLOAD_FILE': True,  # 写入单独的 payload.log
+    'PAYLOAD_CONSOLE': False,  # 同时输出到控制台
+    # 非阻塞输出：日志放入有界队列，由后台线程批量写出
+    'ASYNC': False,
+    'QUEUE_SIZE': 10000,  # 队列容量
+    'DROP_POLICY': 'drop_new',  # 队列满时的策略 drop_new/drop_old/block
+    'BATCH_SIZE': 256,  # 每批最多写出的条数
+    'FLUSH_INTERVAL': 0.5,  # 最长等待时间（秒）
+    'JSON': False,  # 文件日志使用 JSON Lines 格式
+    'JSON_CONSOLE': False,  # 控制台日志使用 JSON Lines 格式
 }
 
 
@@ -42,7 +64,9 @@ class ProjectLogger:
 
         # 应用默认配置
         self._config = dict(DEFAULT_LOGGING_CONFIG)
+        self._queue_sinks = []
         self._setup_handlers()
+        atexit.register(self._stop_queue_sinks)
 
         self._initialized = True
 
@@ -50,7 +74,7 @@ class ProjectLogger:
         """配置日志系统"""
         if config is None:
             config = {}
-        merged_config = {**config, **DEFAULT_LOGGING_CONFIG}
+        merged_config = {**DEFAULT_LOGGING_CONFIG, **config}
         # 转换 logging 格式字符串为 loguru 格式字符串
         if 'LOG_FORMAT' in merged_config and '%(asctime)s' in merged_config['LOG_FORMAT']:
             # 简单转换 logging 格式到 loguru 格式
@@ -75,19 +99,25 @@ class ProjectLogger:
         """配置日志处理器"""
         # 移除所有现有的处理器
         _logger.remove()
+        self._stop_queue_sinks()
+        self._payload_enabled = False
 
         # 如果日志被禁用，添加一个空的sink
         if not self._config.get('ENABLED', False):
             _logger.add(sys.stderr, level="CRITICAL")
             return
 
+        # payload 日志默认只写入单独的文件
+        payload_console = self._config.get('PAYLOAD_CONSOLE', False)
+        console_filter = None if payload_console else self._not_payload
+
         # 控制台处理器
         if self._config.get('CONSOLE', DEFAULT_LOGGING_CONFIG['CONSOLE']):
-            _logger.add(
-                sys.stdout,
+            self._add_console(
                 format=self._config.get('LOG_FORMAT'),
                 level=self._config.get('LEVEL', 'INFO'),
-                colorize=self._config.get('COLORED', True)
+                colorize=self._config.get('COLORED', True),
+                filter=console_filter
                 )
 
         # 文件处理器
@@ -98,31 +128,156 @@ class ProjectLogger:
                 log_file = log_dir / "app.log"
 
                 # 文件处理器（按大小滚动）
-                _logger.add(
+                self._add_file(
                     log_file,
                     format=self._config.get('LOG_FORMAT'),
                     level="DEBUG",
-                    rotation=self._config.get('MAX_BYTES', '10 MB'),
-                    retention=self._config.get('BACKUP_COUNT', 5),
-                    encoding="utf-8"
+                    filter=self._not_payload
                 )
 
                 # 错误日志处理器（按时间滚动）
                 if self._config.get('ERROR_FILE', DEFAULT_LOGGING_CONFIG['ERROR_FILE']):
                     error_file = log_dir / "error.log"
-                    _logger.add(
+                    self._add_file(
                         error_file,
-                        format=self._config.get('LOG_FORMAT'),
-                        level="ERROR",
                         rotation=self._config.get('ROTATION_TIME', '00:00'),
-                        retention=self._config.get('BACKUP_COUNT', 5),
-                        encoding="utf-8"
+                        format=self._config.get('LOG_FORMAT'),
+                        level="ERROR"
                     )
 
             except Exception as e:
                 # 回退到控制台输出错误
                 sys.stderr.write(f"无法创建日志文件: {str(e)}\n")
 
+        self._setup_payload_handler(payload_console)
+
+    def _setup_payload_handler(self, payload_console: bool):
+        """配置 payload 日志的单独文件"""
+        if not self._config.get('PAYLOAD', False):
+            return
+        if self._config.get('PAYLOAD_FILE', True):
+            log_dir = Path(self._config.get('LOG_DIR')) if self._config.get('LOG_DIR') else Path.cwd() / 'logs'
+            try:
+                log_dir.mkdir(parents=True, exist_ok=True)
+                self._add_file(
+                    log_dir / "payload.log",
+                    format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {name}:{function}:{line}  {message}",
+                    level=self._config.get('PAYLOAD_LEVEL', 'DEBUG'),
+                    filter=self._is_payload
+                )
+                self._payload_enabled = True
+            except Exception as e:
+                sys.stderr.write(f"无法创建 payload 日志文件: {str(e)}\n")
+        if payload_console and self._config.get('CONSOLE', True):
+            self._payload_enabled = True
+
+    def _queue_sink(self, writer, json_output: bool, name: str) -> QueueSink:
+        """创建非阻塞的 sink"""
+        sink = QueueSink(
+            writer,
+            formatter=json_line if json_output else None,
+            queue_size=self._config.get('QUEUE_SIZE', 10000),
+            drop_policy=self._config.get('DROP_POLICY', 'drop_new'),
+            batch_size=self._config.get('BATCH_SIZE', 256),
+            flush_interval=self._config.get('FLUSH_INTERVAL', 0.5),
+            name=name
+        )
+        self._queue_sinks.append(sink)
+        return sink
+
+    def _add_console(self, **kwargs):
+        """添加控制台输出"""
+        if not self._config.get('ASYNC', False):
+            _logger.add(sys.stdout, **kwargs)
+            return
+        json_output = self._config.get('JSON_CONSOLE', False)
+        if json_output:
+            kwargs['colorize'] = False
+        _logger.add(self._queue_sink(ConsoleWriter(sys.stdout), json_output, "log-console"), **kwargs)
+
+    def _add_file(self, path: Path, rotation: Optional[str] = None, **kwargs):
+        """添加文件输出"""
+        json_output = self._config.get('JSON', False)
+        if not self._config.get('ASYNC', False):
+            _logger.add(
+                path,
+                rotation=rotation or self._config.get('MAX_BYTES', '10 MB'),
+                retention=self._config.get('BACKUP_COUNT', 5),
+                encoding="utf-8",
+                serialize=json_output,
+                **kwargs
+            )
+            return
+        if is_time_rotation(rotation):
+            writer = RotatingFileWriter(path, 0, self._config.get('BACKUP_COUNT', 5), at=rotation)
+        else:
+            writer = RotatingFileWriter(path, rotation or self._config.get('MAX_BYTES', '10 MB'),
+                                        self._config.get('BACKUP_COUNT', 5))
+        _logger.add(self._queue_sink(writer, json_output, f"log-{path.stem}"), **kwargs)
+
+    def _stop_queue_sinks(self):
+        """写出剩余日志并停止后台线程"""
+        sinks, self._queue_sinks = self._queue_sinks, []
+        for sink in sinks:
+            sink.stop()
+
+    @staticmethod
+    def _is_payload(record) -> bool:
+        return record["extra"].get("payload", False)
+
+    @staticmethod
+    def _not_payload(record) -> bool:
+        return not record["extra"].get("payload", False)
+
+    @property
+    def payload_enabled(self) -> bool:
+        return self._payload_enabled
+
+    def payload(self, label: str, obj: Union[Any, Callable[[], Any]], level: Optional[str] = None,
+                max_chars: Optional[int] = None, sample_rate: Optional[float] = None):
+        """
+        记录大对象（接口参数、响应、消息历史等）
+
+        未启用 PAYLOAD 或未被采样时直接返回，不做任何序列化；obj 可以是返回对象的函数，只在需要输出时调用。
+
+        :param label: 日志标题
+        :param obj: 要记录的对象或返回对象的函数
+        :param level: 日志级别，默认使用 PAYLOAD_LEVEL
+        :param max_chars: 最大字符数，默认使用 PAYLOAD_MAX_CHARS
+        :param sample_rate: 采样率，默认使用 PAYLOAD_SAMPLE_RATE
+        """
+        if not self._payload_enabled:
+            return
+        rate = self._config.get('PAYLOAD_SAMPLE_RATE', 1.0) if sample_rate is None else sample_rate
+        if rate < 1.0 and random.random() >= rate:
+            return
+        if max_chars is None:
+            max_chars = self._config.get('PAYLOAD_MAX_CHARS', 2000)
+        text = self._truncate(self._render(obj() if callable(obj) else obj), max_chars)
+        _logger.bind(payload=True).opt(depth=1).log(
+            level or self._config.get('PAYLOAD_LEVEL', 'DEBUG'), "{}: {}", label, text
+        )
+
+    @staticmethod
+    def _render(obj: Any) -> str:
+        if isinstance(obj, str):
+            return obj
+        if hasattr(obj, 'model_dump'):
+            # pydantic 对象（如 ChatCompletion）
+            obj = obj.model_dump(exclude_none=True)
+        try:
+            return json.dumps(obj, ensure_ascii=False, default=str)
+        except (TypeError, ValueError):
+            return repr(obj)
+
+    @staticmethod
+    def _truncate(text: str, max_chars: int) -> str:
+        if not max_chars or len(text) <= max_chars:
+            return text
+        head = max_chars * 2 // 3
+        tail = max_chars - head
+        return f"{text[:head]} ...(省略 {len(text) - max_chars} 字符)... {text[-tail:]}"
+
     def __getattr__(self, name):
         """将日志方法委托给loguru logger"""
         return getattr(_logger, name)
@@ -3,6 +3,8 @@ import threading
 from aiframework.conf.PackageSettingsLoader import SettingsLoader
 from aiframework.core.listen.LLMProcessor import register_llm_processor
 from aiframework.core.mcp.client import MCPClientManager
+from aiframework.core.mcp.registry import ToolRegistry
+from aiframework.core.mcp.server import MCPServerManager
 from aiframework.core.seek.seek import LLMClientBase
 from aiframework.infrastructure.Input.InputHandler import InputHandlerBase
 from aiframework.logger import logger
@@ -23,10 +25,15 @@ class MainController:
         self.running = False
         self.main_thread = None
         self.manager = MCPClientManager(self.package.settings.MCP_CONFIG)
+        # 合并本地工具与远程MCP工具，本地工具在进程内直接执行
+        tool_paths = self.package.settings.to_dict().get('MCP_TOOL_PATHS') or []
+        index_file = self.package.settings.to_dict().get('MCP_TOOL_INDEX')
+        self.tools = ToolRegistry(remote=self.manager,
+                                  local=MCPServerManager(tool_paths=tool_paths, index_file=index_file))
         self.llm_client.set(
             api_key=self.package.API_KEY,
             baseurl=self.package.LLM_MODEL,
-            mcp=self.manager,
+            mcp=self.tools,
             model=self.package.MODEL
         )
         register_llm_processor(self.event_bus, self.llm_client)
@@ -49,6 +56,7 @@ class MainController:
                 self.main_thread.join()
             self.manager.disconnect_all()
             self.manager.stop()
+            self.tools.stop()
             logger.info("AI已停止")
 
     def _main_loop(self):
@@ -0,0 +1,36 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/8 21:16
+# @Author  : afish
+# @File    : fakellm.py
+from __future__ import annotations
+
+import asyncio
+
+from aiframework.logger import logger
+from aiframework.management.base import Command
+
+
+class FakeLLMCommand(Command):
+    help = '启动本地模拟的 OpenAI 兼容接口，用于测试路由与回退'
+    aliases = ['fakellm']
+    category = 'server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='监听地址')
+        parser.add_argument('--port', type=int, default=8800, help='监听端口')
+        parser.add_argument('--model', type=str, default=None, help='返回的模型名称')
+        parser.add_argument('--latency', type=float, default=0.05, help='响应延迟（秒）')
+        parser.add_argument('--tps', type=float, default=0, help='模拟生成速度（tokens/s）')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='返回错误的概率')
+        parser.add_argument('--reply', type=str, default=None, help='固定回复，默认回显用户消息')
+
+    def handle(self, host, port, model, latency, tps, failure_rate, reply):
+        from aiframework.core.seek.OpenAI.fake_server import FakeOpenAIServer
+
+        server = FakeOpenAIServer(host=host, port=port, model=model, latency=latency,
+                                  tokens_per_second=tps, failure_rate=failure_rate, reply=reply)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            logger.info("模拟 OpenAI 服务已关闭")
@@ -0,0 +1,46 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/9/30 21:10
+# @Author  : afish
+# @File    : mcpserver.py
+from __future__ import annotations
+
+import asyncio
+
+from aiframework.conf.PackageSettingsLoader import SettingsLoader
+from aiframework.logger import logger
+from aiframework.management.base import Command
+
+
+class MCPServerCommand(Command):
+    help = '以 Streamable HTTP 方式对外提供本地 MCP 工具'
+    aliases = ['mcpserver', 'mcp']
+    category = 'server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', type=str, default='127.0.0.1', help='监听地址')
+        parser.add_argument('--port', type=int, default=8765, help='监听端口')
+        parser.add_argument('--timeout', type=float, default=30.0, help='单次工具调用超时（秒）')
+        parser.add_argument('--concurrency', type=int, default=8, help='单个工具最大并发数')
+        parser.add_argument('--project-path', type=str, default=None, help='项目路径')
+
+    def handle(self, host, port, timeout, concurrency, project_path):
+        from aiframework.core.mcp.server import MCPServer, MCPServerManager
+
+        tool_paths, index_file = [], None
+        if project_path:
+            settings = SettingsLoader(project_path)
+            tool_paths = settings.settings.to_dict().get('MCP_TOOL_PATHS') or []
+            index_file = settings.settings.to_dict().get('MCP_TOOL_INDEX')
+
+        async def serve():
+            manager = MCPServerManager(tool_paths=tool_paths, index_file=index_file)
+            await manager.initialize()
+            server = MCPServer(host=host, port=port, request_timeout=timeout, max_concurrency=concurrency)
+            server.register_manager_tools(manager)
+            await server.serve_forever()
+
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            logger.info("MCP 服务器已关闭")
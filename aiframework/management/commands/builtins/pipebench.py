@@ -0,0 +1,77 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/15 20:40
+# @Author  : afish
+# @File    : pipebench.py
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from aiframework.management.base import Command
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class PipeBenchCommand(Command):
+    help = '端到端语音链路基准：音频回放 → 本地识别 → 模拟大模型，无需麦克风和云端服务'
+    aliases = ['pipebench']
+    category = 'benchmark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', nargs='?', default=None, help='16 位 PCM WAV 文件，不指定时使用合成的测试音频')
+        parser.add_argument('--realtime', action='store_true', help='按音频实际时长回放（默认尽快回放）')
+        parser.add_argument('--asr-latency', type=float, default=0.1, help='模拟的识别耗时（秒）')
+        parser.add_argument('--llm-latency', type=float, default=0.2, help='模拟大模型的首字延迟（秒）')
+        parser.add_argument('--tps', type=float, default=0, help='模拟大模型的生成速度（tokens/s）')
+        parser.add_argument('--text', action='append', default=None, help='各段语音的识别结果，可重复指定')
+
+    def handle(self, file, realtime, asr_latency, llm_latency, tps, text):
+        from aiframework.core.listen.local.LocalSpeechRecognition import LocalSpeechRecognition
+        from aiframework.core.listen.source import SignalSource, WavFileSource
+        from aiframework.core.mcp.registry import ToolRegistry
+        from aiframework.core.seek.OpenAI.fake_server import FakeOpenAIServer
+        from aiframework.core.seek.OpenAI.seek import OpenAIClient
+        from aiframework.message.message import MessageManager
+
+        source = WavFileSource(file, realtime=realtime) if file else SignalSource(realtime=realtime)
+        recognizer = LocalSpeechRecognition(source, transcripts=text, latency=asr_latency)
+        done = {}
+
+        with FakeOpenAIServer(latency=llm_latency, tokens_per_second=tps) as server:
+            client = OpenAIClient("你是语音助手", MessageManager())
+            client.set("sk-bench", server.url, ToolRegistry(), model="fake-model", max_retries=0)
+
+            def respond(index: int, command: str):
+                client.response(command)
+                done[index] = time.perf_counter()
+
+            # 大模型在单独的线程中处理，识别线程继续读取音频，与实际运行时一致
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                recognizer.on_result(lambda command: executor.submit(respond, len(recognizer.utterances) - 1, command))
+                started = time.perf_counter()
+                recognizer.start_recognition()
+                recognizer.wait()
+                recognizer.stop_recognition()
+            elapsed = time.perf_counter() - started
+
+        utterances = recognizer.utterances
+        print(f"音频 {source.duration:.1f}s，{'实时' if realtime else '快速'}回放耗时 {elapsed:.2f}s，"
+              f"识别到 {len(utterances)} 段语音")
+        if getattr(source, 'segments', None):
+            print(f"标注的语音段 {len(source.segments)} 段")
+        if not utterances:
+            return
+        asr, total = [], []
+        for index, utterance in enumerate(utterances):
+            end_to_end = done.get(index, utterance.result_time) - utterance.speech_end
+            asr.append(utterance.asr_latency)
+            total.append(end_to_end)
+            print(f"[{index}] {utterance.text!r} 语音 {utterance.audio_seconds:.2f}s，"
+                  f"识别 {utterance.asr_latency * 1000:.0f}ms，端到端 {end_to_end * 1000:.0f}ms")
+        print(f"识别延迟 p50 {percentile(asr, 0.5) * 1000:.0f}ms，最大 {max(asr) * 1000:.0f}ms")
+        print(f"端到端延迟 p50 {percentile(total, 0.5) * 1000:.0f}ms，最大 {max(total) * 1000:.0f}ms")
@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/15 14:05
+# @Author  : afish
+# @File    : vadbench.py
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+from aiframework.management.base import Command
+
+CHUNK_SAMPLES = 3200  # 与实时识别每次读取的大小一致
+
+
+class VADBenchCommand(Command):
+    help = '评估本地语音活动检测：节省的上传字节数与增加的延迟'
+    aliases = ['vadbench']
+    category = 'benchmark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='16 位 PCM WAV 文件，不指定时使用合成的测试音频')
+        parser.add_argument('--frame-ms', type=int, default=20, help='帧长（毫秒）')
+        parser.add_argument('--hangover-ms', type=int, default=300, help='拖尾时长（毫秒）')
+        parser.add_argument('--preroll-ms', type=int, default=200, help='预录时长（毫秒）')
+        parser.add_argument('--margin-db', type=float, default=10.0, help='能量高于噪声底多少 dB 判为语音')
+
+    def handle(self, files, frame_ms, hangover_ms, preroll_ms, margin_db):
+        from aiframework.core.listen.source import SignalSource, read_wav
+
+        fixtures = []
+        for path in files:
+            data, sample_rate = read_wav(path)
+            fixtures.append((path, data, sample_rate, None))
+        if not fixtures:
+            source = SignalSource(realtime=False)
+            fixtures.append(("<合成音频>", source.data, source.sample_rate, source.segments))
+
+        for name, data, sample_rate, segments in fixtures:
+            self.run_fixture(name, data, sample_rate, segments,
+                             frame_ms=frame_ms, hangover_ms=hangover_ms, preroll_ms=preroll_ms, margin_db=margin_db)
+
+    @staticmethod
+    def run_fixture(name: str, data: bytes, sample_rate: int, segments: Optional[List[Tuple[float, float]]],
+                    **options):
+        from aiframework.core.listen.vad import VoiceActivityDetector
+
+        vad = VoiceActivityDetector(sample_rate=sample_rate, **options)
+        chunk_bytes = CHUNK_SAMPLES * 2
+        onsets: List[float] = []
+        position = [0.0]
+        vad.on_speech_start = lambda: onsets.append(position[0])
+        chunks = 0
+        for offset in range(0, len(data), chunk_bytes):
+            chunk = data[offset:offset + chunk_bytes]
+            position[0] = (offset + len(chunk)) / 2 / sample_rate  # 该块读取完成的时间
+            vad.process(chunk)
+            chunks += 1
+        vad.flush()
+
+        stats = vad.stats
+        duration = len(data) / 2 / sample_rate
+        print(f"== {name}")
+        print(f"时长 {duration:.1f}s，语音段 {stats.segments}，语音帧占比 {stats.speech_frames / max(stats.frames, 1):.1%}")
+        print(f"上传 {stats.bytes_out} / {stats.bytes_in} 字节，节省 {stats.saved_ratio:.1%}")
+        print(f"处理耗时 {stats.process_time / max(chunks, 1) * 1e6:.0f}µs/块，"
+              f"实时率 {stats.process_time / duration:.4f}")
+        if segments:
+            chunk_seconds = CHUNK_SAMPLES / sample_rate
+            delays = []
+            for start, _ in segments:
+                detected = [onset for onset in onsets if onset >= start]
+                if detected:
+                    # 不做 VAD 时语音开头所在的块读取完成即发送，额外延迟为检测需要多等的时间
+                    baseline = (int(start / chunk_seconds) + 1) * chunk_seconds
+                    delays.append(max(detected[0] - baseline, 0.0))
+            if delays:
+                print(f"检测到 {len(delays)}/{len(segments)} 段语音，"
+                      f"语音开头的额外延迟 平均 {sum(delays) / len(delays) * 1000:.0f}ms，最大 {max(delays) * 1000:.0f}ms")
+            else:
+                print(f"未检测到语音（共 {len(segments)} 段）")
@@ -37,6 +37,12 @@ class MessageManagerBase(ABC, metaclass=SingletonABCMeta):
         添加工具调用结果
         """
 
+    def set_system_message(self, content: str):
+        """
+        设置模型初始角色，默认直接添加；可恢复历史的实现应替换已有的系统消息
+        """
+        self.add_system_message(content)
+
     @property
     def messages(self) -> list:
         """
@@ -0,0 +1,136 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/14 10:15
+# @Author  : afish
+# @File    : compaction.py
+"""
+对话历史压缩
+
+工具较多的长对话中，旧的工具输出（如页面快照）每轮都会重新发送给模型。
+消息总长度超过 max_chars 后，把较早的大段工具输出保存到 blob 存储，
+上下文中只保留摘要和 blob_id，模型需要时通过 fetch_blob 工具取回。
+
+一次压缩到 target_chars 以下，而不是每轮只压缩刚好超出的部分：
+压缩会改变历史消息，使服务端的提示词前缀缓存失效，批量压缩可以减少失效次数。
+"""
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from aiframework.backend.blob_store import FileBlobStore
+from aiframework.logger import logger
+
+COMPACT_MARKER = "[已压缩]"
+
+def content_length(message: Dict[str, Any]) -> int:
+    content = message.get("content")
+    if isinstance(content, str):
+        return len(content)
+    return len(str(content)) if content else 0
+
+
+def head_summary(content: str, max_chars: int = 300) -> str:
+    """默认摘要：压缩空白后保留开头部分"""
+    lines = content.count("\n") + 1
+    text = re.sub(r"\s+", " ", content).strip()
+    if len(text) > max_chars:
+        text = text[:max_chars] + "..."
+    return f"{text}（共 {lines} 行）"
+
+
+class ConversationCompactor:
+    """
+    :param blob_store: 保存原始内容的 blob 存储
+    :param max_chars: 消息总字符数超过该值时开始压缩
+    :param target_chars: 压缩到该字符数以下，默认为 max_chars 的一半
+    :param keep_recent: 最近的多少条消息不压缩
+    :param min_chars: 只压缩长度超过该值的工具输出
+    :param summary_chars: 默认摘要保留的字符数
+    :param summarizer: 自定义摘要函数，输入原始内容返回摘要
+    """
+
+    def __init__(self, blob_store: FileBlobStore, max_chars: int = 60000, target_chars: Optional[int] = None,
+                 keep_recent: int = 6, min_chars: int = 1000, summary_chars: int = 300,
+                 summarizer: Optional[Callable[[str], str]] = None):
+        self.blob_store = blob_store
+        self.max_chars = max_chars
+        self.target_chars = target_chars if target_chars is not None else max_chars // 2
+        self.keep_recent = keep_recent
+        self.min_chars = min_chars
+        self.summary_chars = summary_chars
+        self.summarizer = summarizer
+        self.compacted = 0
+        self.saved_chars = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compactor")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def summarize(self, content: str) -> str:
+        if self.summarizer is not None:
+            try:
+                return self.summarizer(content)
+            except Exception as e:
+                logger.warning(f"生成摘要失败，使用默认摘要: {e}")
+        return head_summary(content, self.summary_chars)
+
+    def plan(self, messages: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """返回需要替换的消息（下标 -> 新消息），不需要压缩时返回空字典"""
+        total = sum(content_length(message) for message in messages)
+        if total <= self.max_chars:
+            return {}
+        updates = {}
+        for index, message in enumerate(messages[:max(len(messages) - self.keep_recent, 0)]):
+            if total <= self.target_chars:
+                break
+            content = message.get("content")
+            if message.get("role") != "tool" or not isinstance(content, str):
+                continue
+            if len(content) < self.min_chars or content.startswith(COMPACT_MARKER):
+                continue
+            blob_id = self.blob_store.put(content, "text/plain")
+            replacement = (f"{COMPACT_MARKER} {self.summarize(content)}\n"
+                           f"（完整输出 {len(content)} 字符已移出上下文，"
+                           f"需要时调用 fetch_blob(blob_id=\"{blob_id}\") 获取）")
+            updates[index] = {**message, "content": replacement}
+            total -= len(content) - len(replacement)
+        return updates
+
+    def compact(self, manager) -> int:
+        """压缩消息管理器中的历史，返回被压缩的消息数"""
+        messages = manager.messages
+        updates = self.plan(messages)
+        if not updates:
+            return 0
+        saved = sum(content_length(messages[index]) - content_length(message) for index, message in updates.items())
+        applied = manager.update_messages(updates, {index: messages[index] for index in updates})
+        if applied:
+            self.compacted += applied
+            self.saved_chars += saved
+            logger.info(f"已压缩 {applied} 条工具输出，减少约 {saved} 字符")
+        return applied
+
+    def submit(self, manager) -> Optional[Future]:
+        """在后台线程中压缩，同一个消息管理器同时只有一个任务"""
+        key = id(manager)
+        with self._lock:
+            if key in self._pending:
+                return None
+            self._pending.add(key)
+        return self._executor.submit(self._run, manager, key)
+
+    def _run(self, manager, key: int) -> int:
+        try:
+            return self.compact(manager)
+        except Exception as e:
+            logger.error(f"压缩对话历史失败: {e}")
+            return 0
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"compacted": self.compacted, "saved_chars": self.saved_chars}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
@@ -4,10 +4,11 @@
 # @Author  : afish
 # @File    : message.py
 import threading
-from typing import Union
+from typing import Dict, Optional, Union
 
 from openai.types.chat import ChatCompletionMessage
 
+from aiframework.backend.HistoryBackendABC import HistoryBackend
 from aiframework.logger import logger
 from aiframework.message.MessageABC import MessageManagerBase
 
@@ -21,22 +22,68 @@ class MessageManager(MessageManagerBase):
             if not MessageManager._initialized:
                 self._messages = []
                 self._instance_lock = threading.Lock()  # 实例级操作锁
+                self._store: Optional[HistoryBackend] = None  # 持久化存储
+                self._session = "default"
+                self._loaded = True
                 MessageManager._initialized = True
 
+    def attach_store(self, store: HistoryBackend, session: str = "default"):
+        """
+        绑定持久化存储，之后的消息会增量写入存储
 
+        会话内容在第一次访问消息时才从存储中读取。
+        """
+        with self._instance_lock:
+            self._store = store
+            self._session = session
+            self._messages = []
+            self._loaded = False
+
+    def switch_session(self, session: str):
+        """切换到另一个会话（在第一次访问时加载）"""
+        with self._instance_lock:
+            self._session = session
+            self._messages = []
+            self._loaded = self._store is None
+
+    @property
+    def session(self) -> str:
+        return self._session
+
+    def sessions(self) -> list:
+        """返回存储中的所有会话名"""
+        return self._store.sessions() if self._store is not None else [self._session]
+
+    def _ensure_loaded(self):
+        """调用方需持有实例锁"""
+        if not self._loaded:
+            self._messages = self._store.load(self._session)
+            self._loaded = True
+            if self._messages:
+                logger.info(f"已恢复会话 {self._session}，共 {len(self._messages)} 条消息")
+
+    def _persist(self, messages: list):
+        """调用方需持有实例锁"""
+        if self._store is None:
+            return
+        try:
+            self._store.append(self._session, messages)
+        except Exception as e:
+            logger.error(f"保存对话历史失败: {e}")
 
     def add_message(self, role: str, content: str):
         """添加角色信息"""
-        with self._instance_lock:
-            self._messages.append({
-                    "role": role,
-                    "content": content
-                })
+        self.add_dict_message({
+            "role": role,
+            "content": content
+        })
 
     def add_dict_message(self, content):
         """保存对话历史或上下文信息"""
         with self._instance_lock:
+            self._ensure_loaded()
             self._messages.append(content)
+            self._persist([content])
 
     def add_user_message(self, content: str):
         """添加角色信息"""
@@ -87,21 +134,67 @@ class MessageManager(MessageManagerBase):
             }
         )
 
+    def set_system_message(self, content: str):
+        """设置系统信息，恢复的会话中已有系统信息时替换它"""
+        with self._instance_lock:
+            self._ensure_loaded()
+            if self._messages and self._messages[0].get('role') == 'system':
+                if self._messages[0].get('content') == content:
+                    return
+                self._messages[0] = {'role': 'system', 'content': content}
+                self._rewrite()
+                return
+        self.add_system_message(content)
+
+    def update_messages(self, updates: Dict[int, dict], expected: Optional[Dict[int, dict]] = None) -> int:
+        """
+        替换指定下标的消息，返回实际替换的条数
+
+        :param updates: 下标 -> 新消息
+        :param expected: 下标 -> 原消息，消息已被修改（与原消息不同）时跳过该下标
+        """
+        with self._instance_lock:
+            self._ensure_loaded()
+            applied = 0
+            for index, message in updates.items():
+                if index >= len(self._messages):
+                    continue
+                if expected is not None and self._messages[index] != expected.get(index):
+                    continue
+                self._messages[index] = message
+                applied += 1
+            if applied:
+                self._rewrite()
+            return applied
+
+    def _rewrite(self):
+        """已有消息被修改后整体写回存储，调用方需持有实例锁"""
+        if self._store is None:
+            return
+        try:
+            self._store.replace(self._session, self._messages)
+        except Exception as e:
+            logger.error(f"保存对话历史失败: {e}")
 
     def get_messages(self):
         """获取信息"""
         with self._instance_lock:
+            self._ensure_loaded()
             return self._messages.copy()
 
     def reset_messages(self):
         """清空信息"""
         with self._instance_lock:
             self._messages.clear()
+            self._loaded = True
+            if self._store is not None:
+                self._store.delete(self._session)
 
     @property
     def messages(self):
         """返回信息列表"""
         with self._instance_lock:
+            self._ensure_loaded()
             return self._messages.copy()
 
 
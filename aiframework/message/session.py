@@ -0,0 +1,234 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/10/13 16:10
+# @Author  : afish
+# @File    : session.py
+"""
+按会话隔离的消息存储
+
+MessageManager 是进程级单例，整个进程只有一段对话。SessionMessageStore 按会话 ID 管理多个 MessageSession：
+- 每个会话有自己的锁，不同会话可以并发处理
+- 常驻内存的会话数和消息总大小有上限，超出时按 LRU 把空闲会话移出内存
+- 配置了持久化存储时消息增量写入磁盘，被移出的会话在下次访问时重新加载；
+  未配置时不会移出会话（否则会丢失消息），上限只用于告警
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from aiframework.backend.HistoryBackendABC import HistoryBackend
+from aiframework.logger import logger
+from aiframework.message.message import MessageManager
+
+
+def message_size(message: Dict[str, Any]) -> int:
+    """估算一条消息占用的字节数"""
+    return len(json.dumps(message, ensure_ascii=False, default=str)) + 64
+
+
+class MessageSession(MessageManager):
+    """
+    单个会话的消息，接口与 MessageManager 相同
+
+    不要直接创建，通过 SessionMessageStore.get 获取。
+    """
+
+    def __init__(self, session_id: str, store: "SessionMessageStore"):
+        self.session_id = session_id
+        self.lock = threading.RLock()  # 会话锁，一轮对话期间持有，保证同一会话的请求按顺序处理
+        self._instance_lock = self.lock
+        self._owner = store
+        self._messages: Optional[List[Dict[str, Any]]] = None  # None 表示不在内存中
+        self.size = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def resident(self) -> bool:
+        return self._messages is not None
+
+    @property
+    def session(self) -> str:
+        return self.session_id
+
+    def sessions(self) -> list:
+        return self._owner.sessions()
+
+    def _ensure_loaded(self):
+        """调用方需持有会话锁"""
+        self.last_used = time.monotonic()
+        if self._messages is None:
+            self._messages = self._owner.load_messages(self.session_id)
+            self.size = sum(message_size(message) for message in self._messages)
+            self._owner.touch(self)
+
+    def attach_store(self, store: HistoryBackend, session: str = "default"):
+        raise TypeError("会话的持久化存储由 SessionMessageStore 统一配置")
+
+    def switch_session(self, session: str):
+        raise TypeError("会话对象不能切换会话，请通过 SessionMessageStore.get 获取其他会话")
+
+    def add_dict_message(self, content):
+        """保存对话历史或上下文信息"""
+        with self.lock:
+            self._ensure_loaded()
+            self._messages.append(content)
+            self.size += message_size(content)
+            self._owner.persist(self.session_id, [content])
+        self._owner.touch(self)
+
+    def set_system_message(self, content: str):
+        """设置系统信息，已有系统信息时替换它"""
+        with self.lock:
+            self._ensure_loaded()
+            if self._messages and self._messages[0].get('role') == 'system':
+                if self._messages[0].get('content') != content:
+                    self._messages[0] = {'role': 'system', 'content': content}
+                    self._rewrite()
+                return
+        self.add_system_message(content)
+
+    def _rewrite(self):
+        """调用方需持有会话锁"""
+        self.size = sum(message_size(message) for message in self._messages)
+        self._owner.rewrite(self.session_id, self._messages)
+
+    def reset_messages(self):
+        """清空信息"""
+        with self.lock:
+            self._messages = []
+            self.size = 0
+            self._owner.rewrite(self.session_id, None)
+
+    def evict(self) -> bool:
+        """会话空闲时移出内存，返回是否成功"""
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            self._messages = None
+            self.size = 0
+            return True
+        finally:
+            self.lock.release()
+
+
+class SessionMessageStore:
+    """
+    :param backend: 持久化存储，为空时会话只保存在内存中且不会被移出
+    :param max_resident: 最多常驻内存的会话数
+    :param max_memory: 常驻会话的消息总大小上限（字节）
+    :param idle_timeout: 会话空闲超过该时间（秒）后移出内存，None 表示不按时间移出
+    """
+
+    def __init__(self, backend: Optional[HistoryBackend] = None, max_resident: int = 256,
+                 max_memory: int = 256 * 1024 * 1024, idle_timeout: Optional[float] = None):
+        self.backend = backend
+        self.max_resident = max_resident
+        self.max_memory = max_memory
+        self.idle_timeout = idle_timeout
+        self._sessions: Dict[str, MessageSession] = {}
+        self._resident: "OrderedDict[str, MessageSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._warned = False
+
+    def get(self, session_id: str) -> MessageSession:
+        """获取会话（不存在时创建），消息在第一次访问时加载"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = MessageSession(session_id, self)
+            return session
+
+    def load_messages(self, session_id: str) -> List[Dict[str, Any]]:
+        if self.backend is None:
+            return []
+        messages = self.backend.load(session_id)
+        if messages:
+            logger.debug(f"已加载会话 {session_id}，共 {len(messages)} 条消息")
+        return messages
+
+    def persist(self, session_id: str, messages: List[Dict[str, Any]]):
+        if self.backend is None:
+            return
+        try:
+            self.backend.append(session_id, messages)
+        except Exception as e:
+            logger.error(f"保存会话 {session_id} 失败: {e}")
+
+    def rewrite(self, session_id: str, messages: Optional[List[Dict[str, Any]]]):
+        """整体替换会话内容，messages 为 None 时删除会话"""
+        if self.backend is None:
+            return
+        try:
+            if messages is None:
+                self.backend.delete(session_id)
+            else:
+                self.backend.replace(session_id, messages)
+        except Exception as e:
+            logger.error(f"保存会话 {session_id} 失败: {e}")
+
+    def touch(self, session: MessageSession):
+        """标记会话最近被使用，并在超出上限时移出最久未使用的会话"""
+        with self._lock:
+            if not session.resident:
+                return
+            self._resident[session.session_id] = session
+            self._resident.move_to_end(session.session_id)
+            self._enforce_limits(session)
+
+    def _enforce_limits(self, current: MessageSession):
+        """调用方需持有存储锁"""
+        now = time.monotonic()
+        memory = sum(session.size for session in self._resident.values())
+        for session_id, session in list(self._resident.items()):
+            over = len(self._resident) > self.max_resident or memory > self.max_memory
+            idle = self.idle_timeout is not None and now - session.last_used > self.idle_timeout
+            if not (over or idle):
+                break
+            if session is current:
+                continue
+            if self.backend is None:
+                if over and not self._warned:
+                    logger.warning("会话占用超出上限，但未配置持久化存储，无法移出内存")
+                    self._warned = True
+                return
+            size = session.size
+            if session.evict():
+                del self._resident[session_id]
+                memory -= size
+                self.evictions += 1
+                self.backend.release(session_id)
+                logger.debug(f"会话 {session_id} 已移出内存")
+
+    def sessions(self) -> List[str]:
+        """返回所有会话 ID（包括只在磁盘中的会话）"""
+        with self._lock:
+            names = set(self._sessions)
+        if self.backend is not None:
+            names.update(self.backend.sessions())
+        return sorted(names)
+
+    def drop(self, session_id: str):
+        """删除会话及其持久化内容"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            self._resident.pop(session_id, None)
+        if session is not None:
+            with session.lock:
+                session._messages = None
+        self.rewrite(session_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "resident": len(self._resident),
+                "memory": sum(session.size for session in self._resident.values()),
+                "evictions": self.evictions,
+            }
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
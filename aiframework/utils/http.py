@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2025/9/30 19:48
+# @Author  : afish
+# @File    : http.py
+"""基于 asyncio streams 的最小 HTTP/1.1 工具函数，供内置服务端使用"""
+import asyncio
+import json
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Dict, Optional, Any
+from urllib.parse import urlsplit, parse_qs
+
+MAX_HEADER_LINES = 100
+
+
+class HTTPError(Exception):
+    """请求格式错误等需要直接返回状态码的异常"""
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or HTTPStatus(status).phrase)
+        self.status = status
+
+
+@dataclass
+class HTTPRequest:
+    """HTTP 请求"""
+    method: str
+    target: str
+    version: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def path(self) -> str:
+        return urlsplit(self.target).path
+
+    @property
+    def query(self) -> Dict[str, list]:
+        return parse_qs(urlsplit(self.target).query)
+
+    @property
+    def keep_alive(self) -> bool:
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode("utf-8"))
+
+    def accepts(self, media_type: str) -> bool:
+        accept = self.headers.get("accept", "")
+        return not accept or media_type in accept or "*/*" in accept
+
+
+async def read_request(reader: asyncio.StreamReader, max_body: int = 4 * 1024 * 1024) -> Optional[HTTPRequest]:
+    """读取一个请求，连接关闭时返回 None"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, version = request_line.decode("latin-1").strip().split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, sep, value = line.decode("latin-1").partition(":")
+        if not sep:
+            raise HTTPError(400, "Malformed header")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(431)
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        body = await _read_chunked(reader, max_body)
+    else:
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > max_body:
+            raise HTTPError(413)
+        body = await reader.readexactly(length) if length else b""
+    return HTTPRequest(method.upper(), target, version, headers, body)
+
+
+async def _read_chunked(reader: asyncio.StreamReader, max_body: int) -> bytes:
+    body = bytearray()
+    while True:
+        size_line = await reader.readline()
+        try:
+            size = int(size_line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise HTTPError(400, "Invalid chunk size")
+        if size == 0:
+            # 跳过 trailer
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return bytes(body)
+        if len(body) + size > max_body:
+            raise HTTPError(413)
+        body += await reader.readexactly(size)
+        await reader.readexactly(2)
+
+
+def _status_line(status: int) -> bytes:
+    return f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n".encode("latin-1")
+
+
+def _header_block(headers: Dict[str, str]) -> bytes:
+    return "".join(f"{k}: {v}\r\n" for k, v in headers.items()).encode("latin-1") + b"\r\n"
+
+
+async def write_response(writer: asyncio.StreamWriter, status: int, body: bytes = b"",
+                         headers: Dict[str, str] = None, keep_alive: bool = True):
+    """写出完整响应"""
+    all_headers = {"Content-Length": str(len(body)), "Connection": "keep-alive" if keep_alive else "close"}
+    all_headers.update(headers or {})
+    writer.write(_status_line(status) + _header_block(all_headers) + body)
+    await writer.drain()
+
+
+async def write_json(writer: asyncio.StreamWriter, status: int, payload: Any,
+                     headers: Dict[str, str] = None, keep_alive: bool = True):
+    """以 JSON 格式写出响应"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    await write_response(writer, status, body, {"Content-Type": "application/json", **(headers or {})}, keep_alive)
+
+
+async def start_sse(writer: asyncio.StreamWriter, headers: Dict[str, str] = None):
+    """写出 SSE 响应头，之后通过 send_sse 推送事件，结束时关闭连接"""
+    all_headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache", "Connection": "close"}
+    all_headers.update(headers or {})
+    writer.write(_status_line(200) + _header_block(all_headers))
+    await writer.drain()
+
+
+async def send_sse(writer: asyncio.StreamWriter, data: Any, event: str = "message"):
+    """推送一条 SSE 事件"""
+    if not isinstance(data, str):
+        data = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    writer.write(f"event: {event}\n{lines}\n".encode("utf-8"))
+    await writer.drain()